@@ -0,0 +1,70 @@
+# books/authors.py - Normalized author resolution
+from .identifier_index import normalize_text
+
+# Keep IN clauses well below SQLite's bound parameter limit
+RESOLVE_BATCH_SIZE = 500
+
+
+def normalize_author_name(name):
+    """Matching key for an author, so "J.K. Rowling" and "J. K. Rowling" collide"""
+    return normalize_text(name)
+
+
+def split_author_names(authors_string):
+    """Split a comma-separated author string into clean names"""
+    if not authors_string:
+        return []
+    return [' '.join(name.split()) for name in authors_string.split(',') if name.strip()]
+
+
+def resolve_authors(names):
+    """
+    Resolve author names to Author rows using the normalized_name index.
+
+    Existing authors are fetched with one query per batch and missing ones are
+    inserted with bulk_create. Returns authors in input order, without
+    duplicates. Concurrent imports may still race to create the same author;
+    the merge_duplicate_authors command cleans those up.
+    """
+    from .models import Author
+
+    wanted = {}
+    for name in names:
+        name = ' '.join(str(name).split())
+        key = normalize_author_name(name)
+        if key and key not in wanted:
+            wanted[key] = name
+
+    if not wanted:
+        return []
+
+    keys = list(wanted)
+    resolved = {}
+    for start in range(0, len(keys), RESOLVE_BATCH_SIZE):
+        batch = keys[start:start + RESOLVE_BATCH_SIZE]
+        for author in Author.objects.filter(normalized_name__in=batch).order_by('pk'):
+            # Oldest record wins until duplicates are merged
+            resolved.setdefault(author.normalized_name, author)
+
+    missing = [
+        Author(name=wanted[key], normalized_name=key)
+        for key in keys if key not in resolved
+    ]
+    if missing:
+        created = Author.objects.bulk_create(missing, batch_size=RESOLVE_BATCH_SIZE)
+        if any(author.pk is None for author in created):
+            # Backend did not return primary keys, fetch them back
+            created_keys = [author.normalized_name for author in created]
+            for start in range(0, len(created_keys), RESOLVE_BATCH_SIZE):
+                batch = created_keys[start:start + RESOLVE_BATCH_SIZE]
+                for author in Author.objects.filter(normalized_name__in=batch).order_by('pk'):
+                    resolved.setdefault(author.normalized_name, author)
+        else:
+            for author in created:
+                resolved[author.normalized_name] = author
+
+    return [resolved[key] for key in keys]
+
+
+def resolve_authors_from_string(authors_string):
+    return resolve_authors(split_author_names(authors_string))
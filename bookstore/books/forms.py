@@ -2,6 +2,7 @@
 from django import forms
 from django.utils.text import slugify
 from .models import Book, Category, Author, Publisher
+from .authors import resolve_authors_from_string
 
 class BookForm(forms.ModelForm):
     authors = forms.CharField(
@@ -108,12 +109,7 @@ class BookForm(forms.ModelForm):
             # Handle authors
             authors_string = self.cleaned_data.get('authors', '')
             if authors_string:
-                author_names = [name.strip() for name in authors_string.split(',') if name.strip()]
-                authors = []
-                for author_name in author_names:
-                    author, created = Author.objects.get_or_create(name=author_name)
-                    authors.append(author)
-                book.authors.set(authors)
+                book.authors.set(resolve_authors_from_string(authors_string))
         
         return book
 
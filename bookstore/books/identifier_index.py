@@ -0,0 +1,215 @@
+# books/identifier_index.py - In-process index of known book identifiers
+import hashlib
+import math
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+# Bloom filter room per loaded key, for books added before the next rebuild
+BLOOM_HEADROOM = 2
+BLOOM_MIN_CAPACITY = 1024
+
+
+def normalize_text(value):
+    """Lowercase, strip accents/punctuation and collapse whitespace"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    value = re.sub(r'[^\w\s]', ' ', value.lower())
+    return ' '.join(value.split())
+
+
+def normalize_isbn(value):
+    """Strip separators from an ISBN so '978-0-14' and '978014' match"""
+    if not value:
+        return ''
+    return re.sub(r'[^0-9X]', '', str(value).upper())
+
+
+def book_fingerprint(title, author):
+    """Fingerprint used for title + author duplicate detection"""
+    return f"{normalize_text(title)}|{normalize_text(author)}"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter backed by a bytearray"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class BookIdentifierIndex:
+    """
+    Bloom filter in front of a hashed key -> book id map for google_books_id,
+    isbn, isbn13 and normalized title/author fingerprints.
+
+    Negative lookups (the common case while browsing Google Books results)
+    are answered without touching the database. The index is loaded lazily,
+    kept warm by the Book signals and rebuilt after BOOK_IDENTIFIER_INDEX_TTL
+    seconds so that writes from other worker processes are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._bloom = None
+        self._keys = {}
+        self._book_keys = {}
+        self._book_authors = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'BOOK_IDENTIFIER_INDEX_TTL', 300)
+
+    @property
+    def is_loaded(self):
+        return self._loaded_at is not None
+
+    def _is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    @staticmethod
+    def _identifier_keys(google_books_id=None, isbn=None, isbn13=None):
+        keys = []
+        if google_books_id:
+            keys.append(f"gid:{google_books_id.strip()}")
+        if normalize_isbn(isbn):
+            keys.append(f"isbn:{normalize_isbn(isbn)}")
+        if normalize_isbn(isbn13):
+            keys.append(f"isbn13:{normalize_isbn(isbn13)}")
+        return keys
+
+    def _book_index_keys(self, google_books_id, isbn, isbn13, title, author_names):
+        keys = self._identifier_keys(google_books_id, isbn, isbn13)
+        if normalize_text(title):
+            keys.extend(f"fp:{book_fingerprint(title, name)}" for name in author_names)
+        return keys
+
+    def load(self):
+        """Rebuild the whole index with two queries"""
+        from .models import Book
+
+        rows = list(Book.objects.values_list('pk', 'google_books_id', 'isbn', 'isbn13', 'title'))
+        authors = {}
+        for book_id, name in Book.authors.through.objects.values_list('book_id', 'author__name'):
+            authors.setdefault(book_id, []).append(name)
+
+        entries = [
+            (pk, self._book_index_keys(google_books_id, isbn, isbn13, title, authors.get(pk, [])), authors.get(pk, []))
+            for pk, google_books_id, isbn, isbn13, title in rows
+        ]
+        # Books with many authors carry a fingerprint per author, so size by keys, not books
+        key_count = sum(len(keys) for pk, keys, author_names in entries)
+
+        with self._lock:
+            self._bloom = BloomFilter(capacity=max(key_count * BLOOM_HEADROOM, BLOOM_MIN_CAPACITY))
+            self._keys = {}
+            self._book_keys = {}
+            self._book_authors = {}
+            for pk, keys, author_names in entries:
+                self._store(pk, keys, author_names)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def ensure_loaded(self):
+        if self._is_stale():
+            self.load()
+
+    def _store(self, pk, keys, author_names):
+        for key in keys:
+            self._keys[key] = pk
+            self._bloom.add(key)
+        self._book_keys[pk] = keys
+        self._book_authors[pk] = list(author_names)
+
+        # Keep the false positive rate bounded as books are added
+        if self._bloom.count > self._bloom.capacity:
+            self.invalidate()
+
+    def _forget(self, pk):
+        for key in self._book_keys.pop(pk, []):
+            if self._keys.get(key) == pk:
+                del self._keys[key]
+        return self._book_authors.pop(pk, [])
+
+    def index_book(self, book, author_names=None):
+        """Add or refresh a book; keeps the known authors when not given"""
+        if not self.is_loaded:
+            return
+        with self._lock:
+            previous_authors = self._forget(book.pk)
+            if author_names is None:
+                author_names = previous_authors
+            keys = self._book_index_keys(book.google_books_id, book.isbn, book.isbn13, book.title, author_names)
+            self._store(book.pk, keys, author_names)
+
+    def discard_book(self, pk):
+        if not self.is_loaded:
+            return
+        with self._lock:
+            self._forget(pk)
+
+    def _get(self, key):
+        # Bloom filter answers most misses without a dict probe
+        if key not in self._bloom:
+            return None
+        return self._keys.get(key)
+
+    def lookup(self, google_books_id=None, isbn=None, isbn13=None, title=None, author=None):
+        """Return the id of a matching book, or None. Never queries on a miss."""
+        self.ensure_loaded()
+        with self._lock:
+            for key in self._identifier_keys(google_books_id, isbn, isbn13):
+                book_id = self._get(key)
+                if book_id is not None:
+                    return book_id
+            if title and author:
+                return self._get(f"fp:{book_fingerprint(title, author)}")
+        return None
+
+    def contains(self, **identifiers):
+        return self.lookup(**identifiers) is not None
+
+    def find_book(self, **identifiers):
+        """Resolve a lookup to a Book instance (one query on a hit only)"""
+        from .models import Book
+
+        book_id = self.lookup(**identifiers)
+        if book_id is None:
+            return None
+        book = Book.objects.filter(pk=book_id).first()
+        if book is None:
+            self.discard_book(book_id)
+        return book
+
+
+book_index = BookIdentifierIndex()
@@ -0,0 +1,139 @@
+# books/management/commands/merge_duplicate_authors.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from books.models import Author, Book
+from books.authors import normalize_author_name
+
+# Blank fields on the surviving author are filled from its duplicates
+MERGEABLE_FIELDS = ['biography', 'image', 'birth_date', 'nationality', 'website']
+
+class Command(BaseCommand):
+    help = 'Backfill Author.normalized_name and merge authors whose names normalize to the same key'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be merged without changing anything',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk_update while backfilling (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes will be made'))
+
+        backfilled, authors_by_key = self.backfill_normalized_names(options['batch_size'], dry_run)
+        self.stdout.write(f'Normalized names to update: {backfilled}')
+
+        if dry_run:
+            # Nothing was written, so group by the keys the backfill computed
+            duplicate_groups = [
+                authors for key, authors in sorted(authors_by_key.items()) if key and len(authors) > 1
+            ]
+        else:
+            duplicate_groups = self.duplicate_groups()
+
+        if not duplicate_groups:
+            self.stdout.write(self.style.SUCCESS('No duplicate authors found!'))
+            return
+
+        merged_count = 0
+        for authors in duplicate_groups:
+            keeper, duplicates = authors[0], authors[1:]
+
+            self.stdout.write(
+                f'"{keeper.name}" (#{keeper.id}) <- ' +
+                ', '.join(f'"{author.name}" (#{author.id})' for author in duplicates)
+            )
+
+            if not dry_run:
+                self.merge_authors(keeper, duplicates)
+            merged_count += len(duplicates)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Would merge {merged_count} duplicate authors'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Successfully merged {merged_count} duplicate authors'))
+
+    def backfill_normalized_names(self, batch_size, dry_run):
+        """
+        Recompute normalized_name for rows created before the column existed.
+        Returns the number of rows updated and, for a dry run, which writes
+        nothing, {key: authors in id order} from the computed keys.
+        """
+        pending = []
+        updated = 0
+        authors_by_key = {}
+
+        authors = Author.objects.only('id', 'name', 'normalized_name').order_by('id')
+        for author in authors.iterator(chunk_size=batch_size):
+            key = normalize_author_name(author.name)
+            if dry_run:
+                authors_by_key.setdefault(key, []).append(author)
+            if author.normalized_name != key:
+                author.normalized_name = key
+                pending.append(author)
+
+            if len(pending) >= batch_size:
+                updated += self.flush(pending, dry_run)
+
+        updated += self.flush(pending, dry_run)
+        return updated, authors_by_key
+
+    def duplicate_groups(self):
+        """Lists of authors, in id order, sharing a normalized_name"""
+        keys = Author.objects.exclude(normalized_name='').values('normalized_name').annotate(
+            author_count=Count('id')
+        ).filter(author_count__gt=1).order_by('normalized_name').values_list('normalized_name', flat=True)
+        return [list(Author.objects.filter(normalized_name=key).order_by('id')) for key in keys]
+
+    def flush(self, pending, dry_run):
+        count = len(pending)
+        if pending and not dry_run:
+            Author.objects.bulk_update(pending, ['normalized_name'])
+        pending.clear()
+        return count
+
+    @transaction.atomic
+    def merge_authors(self, keeper, duplicates):
+        """Point every book of the duplicates at the keeper, then delete them"""
+        through = Book.authors.through
+        duplicate_ids = [author.id for author in duplicates]
+
+        # Links the keeper already has would become duplicate rows
+        keeper_books = list(through.objects.filter(author_id=keeper.id).values_list('book_id', flat=True))
+        through.objects.filter(author_id__in=duplicate_ids, book_id__in=keeper_books).delete()
+
+        # A book may also be linked to several duplicates; move only one link
+        moved, redundant, seen_books = [], [], set()
+        for link_id, book_id in through.objects.filter(author_id__in=duplicate_ids).values_list('id', 'book_id'):
+            if book_id in seen_books:
+                redundant.append(link_id)
+            else:
+                seen_books.add(book_id)
+                moved.append(link_id)
+        through.objects.filter(id__in=redundant).delete()
+        through.objects.filter(id__in=moved).update(author_id=keeper.id)
+
+        changed_fields = []
+        for field in MERGEABLE_FIELDS:
+            if getattr(keeper, field):
+                continue
+            for duplicate in duplicates:
+                if getattr(duplicate, field):
+                    setattr(keeper, field, getattr(duplicate, field))
+                    changed_fields.append(field)
+                    break
+        if changed_fields:
+            keeper.save(update_fields=changed_fields + ['normalized_name'])
+
+        Author.objects.filter(id__in=duplicate_ids).delete()
@@ -5,6 +5,7 @@ from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 import uuid
+from .authors import normalize_author_name
 User = get_user_model()
 
 class Category(models.Model):
@@ -75,6 +76,8 @@ class SubSubCategory(models.Model):
 
 class Author(models.Model):
     name = models.CharField(max_length=200)
+    normalized_name = models.CharField(max_length=200, blank=True, db_index=True, editable=False,
+                                       help_text="Lookup key used to match author name variants")
     biography = models.TextField(blank=True)
     image = models.ImageField(upload_to='authors/', blank=True, null=True)
     birth_date = models.DateField(blank=True, null=True)
@@ -83,6 +86,10 @@ class Author(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_author_name(self.name)
+        super().save(*args, **kwargs)
 
 class Publisher(models.Model):
     name = models.CharField(max_length=200)
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from .models import Book
+from .identifier_index import book_index
+
+INDEXED_BOOK_FIELDS = {'title', 'google_books_id', 'isbn', 'isbn13'}
 
 @receiver(post_save, sender=Book)
 def create_book_stock(sender, instance, created, **kwargs):
@@ -14,4 +17,31 @@ def create_book_stock(sender, instance, created, **kwargs):
                 'reorder_level': 5,
                 'max_stock_level': 100,
             }
-        )
\ No newline at end of file
+        )
+
+@receiver(post_save, sender=Book)
+def index_book_identifiers(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the identifier index warm; status-only saves are skipped"""
+    if update_fields and not INDEXED_BOOK_FIELDS.intersection(update_fields):
+        return
+    book_index.index_book(instance)
+
+@receiver(post_delete, sender=Book)
+def discard_book_identifiers(sender, instance, **kwargs):
+    book_index.discard_book(instance.pk)
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def reindex_book_authors(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """Refresh title/author fingerprints when a book's authors change"""
+    if action not in ('post_add', 'post_remove', 'post_clear') or not book_index.is_loaded:
+        return
+    if not reverse:
+        books = [instance]
+    elif pk_set:
+        books = list(Book.objects.filter(pk__in=pk_set))
+    else:
+        # Reverse clear from the author side: rebuild on next lookup
+        book_index.invalidate()
+        return
+    for book in books:
+        book_index.index_book(book, author_names=list(book.authors.values_list('name', flat=True)))
@@ -1,3 +1,34 @@
 from django.test import TestCase
+from .identifier_index import BookIdentifierIndex, BLOOM_HEADROOM, BLOOM_MIN_CAPACITY
+from .models import Author, Book, Category
 
-# Create your tests here.
+
+class BookIdentifierIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        authors = [Author.objects.create(name=f'Author {i}') for i in range(6)]
+        cls.books = []
+        for i in range(300):
+            book = Book.objects.create(
+                title=f'Book {i}', slug=f'book-{i}', category=category, price=10, description='A book',
+                google_books_id=f'gid{i}', isbn=f'00000{i:05d}', isbn13=f'978000{i:07d}',
+            )
+            book.authors.set(authors)
+            cls.books.append(book)
+
+    def test_filter_is_sized_from_the_loaded_keys(self):
+        index = BookIdentifierIndex()
+        index.load()
+        # gid, isbn, isbn13 and one fingerprint per author for every book
+        key_count = 300 * (3 + 6)
+        self.assertEqual(len(index._keys), key_count)
+        self.assertEqual(index._bloom.capacity, max(key_count * BLOOM_HEADROOM, BLOOM_MIN_CAPACITY))
+        self.assertLessEqual(index._bloom.count, index._bloom.capacity)
+
+        book = self.books[7]
+        self.assertEqual(index.lookup(isbn13=book.isbn13), book.pk)
+        self.assertEqual(index.lookup(title='Book 7', author='Author 5'), book.pk)
+        self.assertIsNone(index.lookup(google_books_id='missing'))
+        misses = sum(f'gid:missing{i}' in index._bloom for i in range(2000))
+        self.assertLess(misses, 60)
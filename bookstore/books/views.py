@@ -15,6 +15,8 @@ import json
 import requests
 from .models import Book, Category, Cart, CartItem, Author, Publisher, SubCategory, SubSubCategory
 from .forms import BookForm, BookFilterForm
+from .identifier_index import book_index
+from .authors import resolve_authors_from_string
 from warehouse.models import Stock
 from django.contrib.admin.views.decorators import staff_member_required
 from coupons.models import BookSale, BookSaleItem
@@ -309,19 +311,17 @@ def check_book_exists(request):
     if not google_books_id and not (title and author):
         return JsonResponse({'error': 'Missing required parameters'}, status=400)
     
+    # Misses are answered from the in-memory index without a DB hit
     existing_book = None
     
     # First check by Google Books ID
     if google_books_id:
-        existing_book = Book.objects.filter(google_books_id=google_books_id).first()
+        existing_book = book_index.find_book(google_books_id=google_books_id)
     
     # If not found by Google Books ID, check by title and author
     if not existing_book and title and author:
         first_author = author.split(',')[0].strip()
-        existing_book = Book.objects.filter(
-            title__iexact=title.strip(),
-            authors__name__iexact=first_author
-        ).first()
+        existing_book = book_index.find_book(title=title, author=first_author)
     
     if existing_book:
         return JsonResponse({
@@ -336,19 +336,7 @@ def check_book_exists(request):
 
 def create_authors_from_string(authors_string):
     """Helper function to create authors from comma-separated string"""
-    if not authors_string:
-        return []
-    
-    authors = []
-    author_names = [name.strip() for name in authors_string.split(',') if name.strip()]
-    
-    for author_name in author_names:
-        author, created = Author.objects.get_or_create(
-            name=author_name
-        )
-        authors.append(author)
-    
-    return authors
+    return resolve_authors_from_string(authors_string)
 
 def book_detail(request, slug):
     book = get_object_or_404(Book, slug=slug, status='available')
@@ -615,7 +603,7 @@ def add_book(request):
         if google_books_id:
             # Handle Google Books API submission (existing logic)
             try:
-                existing_book = Book.objects.filter(google_books_id=google_books_id).first()
+                existing_book = book_index.find_book(google_books_id=google_books_id)
                 if existing_book:
                     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                         return JsonResponse({
@@ -633,10 +621,7 @@ def add_book(request):
                 
                 if title and authors_string:
                     first_author = authors_string.split(',')[0].strip()
-                    title_author_duplicate = Book.objects.filter(
-                        title__iexact=title,
-                        authors__name__iexact=first_author
-                    ).first()
+                    title_author_duplicate = book_index.find_book(title=title, author=first_author)
                     
                     if title_author_duplicate:
                         if not title_author_duplicate.google_books_id:
@@ -689,6 +674,10 @@ def add_book(request):
                         elif identifier.get('type') == 'ISBN_13':
                             isbn_13 = identifier.get('identifier')
                     
+                    isbn_duplicate = book_index.find_book(isbn=isbn_10, isbn13=isbn_13)
+                    if isbn_duplicate:
+                        raise ValueError(f'Book with this ISBN already exists: "{isbn_duplicate.title}"')
+                    
                     pages = volume_info.get('pageCount')
                     publisher_name = volume_info.get('publisher')
                     publication_date = volume_info.get('publishedDate')
@@ -905,7 +894,7 @@ def search_google_books(request):
                                 google_books_id = item.get('id')
                                 
                                 # Skip if already in database
-                                if Book.objects.filter(google_books_id=google_books_id).exists():
+                                if book_index.contains(google_books_id=google_books_id):
                                     continue
                                 
                                 # Get best quality cover image
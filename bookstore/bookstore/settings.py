@@ -94,6 +94,48 @@ CACHES = {
     }
 }
 
+# Seconds before the in-process book identifier index is rebuilt from the DB
+BOOK_IDENTIFIER_INDEX_TTL = 300
+
+# Seconds a pending order holds its stock before the sweeper releases it
+STOCK_RESERVATION_HOLD_SECONDS = 30 * 60
+
+# Demand forecasting (see warehouse/forecasting.py)
+DEMAND_FORECAST = {
+    'HISTORY_DAYS': 90,
+    'SMOOTHING': 0.2,        # Exponential smoothing factor per day
+    'LEAD_TIME_DAYS': 7,     # Vendor offer to stock receipt
+    'REVIEW_DAYS': 14,       # Stock covered by one order
+    'SERVICE_LEVEL_Z': 1.65, # ~95% cycle service level
+}
+
+# Pickup route planning (see logistics/routing.py)
+PICKUP_ROUTING = {
+    'DEPOT_LATITUDE': 19.0760,   # Main warehouse, Mumbai
+    'DEPOT_LONGITUDE': 72.8777,
+    'ROAD_FACTOR': 1.3,          # Road distance / straight-line distance
+    'VEHICLE_CAPACITY': {'bike': 20, 'car': 100, 'van': 400, 'truck': 2000},  # Books per trip
+    'TRIPS_PER_PARTNER': 2,
+    'MAX_TRIP_HOURS': 5,         # Driving and loading time per trip
+    'AVERAGE_SPEED_KMPH': 25,
+    'STOP_MINUTES': 15,
+    'DAY_START_HOUR': 9,
+}
+
+# Delivery time estimates (see delivery/eta.py; refit with the fit_delivery_eta command)
+DELIVERY_ETA = {
+    'HISTORY_DAYS': 180,
+    'PREFIX_LENGTH': 3,          # Pincode digits grouped together
+    'MIN_SAMPLES': 10,           # Deliveries needed before a group gets its own estimate
+    'DEFAULT_DAYS': 4,           # Estimate when there is no history
+}
+
+# Partner and vendor rating averages (see reviews/ratings.py). With a half-life
+# set, recent ratings count for more; run rebuild_rating_aggregates after changing it
+RATING_AGGREGATES = {
+    'HALF_LIFE_DAYS': None,      # e.g. 180; None weighs every rating the same
+}
+
 # Update your TEMPLATES configuration
 TEMPLATES = [
     {
@@ -118,25 +160,27 @@ TEMPLATES = [
     },
 ]
 
-# Also update your CHANNEL_LAYERS to not use Redis for now
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
-
 WSGI_APPLICATION = 'bookstore.wsgi.application'
 ASGI_APPLICATION = 'bookstore.asgi.application'
 
-# Channels
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+# Channels (vendor notification and delivery tracking push, see vendors/consumers.py, delivery/consumers.py)
+# CHANNEL_LAYER=memory uses the in-process layer for local runs and tests;
+# it only reaches sockets served by the same process.
+if config('CHANNEL_LAYER', default='redis') == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
         },
-    },
-}
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                "hosts": [('127.0.0.1', 6379)],
+            },
+        },
+    }
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -133,22 +133,18 @@ class Coupon(models.Model):
         """Get cart items that this coupon applies to"""
         applicable_items = []
         
+        # Restrictions are read once, then matched in memory
+        book_ids = set(self.applicable_books.values_list('id', flat=True))
+        category_ids = set(self.applicable_categories.values_list('id', flat=True))
+        
         # If no specific restrictions, applies to all items
-        if not self.applicable_categories.exists() and not self.applicable_books.exists():
+        if not book_ids and not category_ids:
             return cart_items
         
         for item in cart_items:
-            book = item.book
-            
-            # Check if book is specifically included
-            if self.applicable_books.filter(id=book.id).exists():
-                applicable_items.append(item)
-                continue
-            
-            # Check if book's category is included
-            if self.applicable_categories.filter(id=book.category.id).exists():
+            # Check if book is specifically included, or its category is
+            if item.book_id in book_ids or item.book.category_id in category_ids:
                 applicable_items.append(item)
-                continue
         
         return applicable_items
     
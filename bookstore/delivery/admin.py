@@ -1,11 +1,13 @@
 from django.contrib import admin
-from .models import DeliveryPartner, Delivery, DeliveryUpdate, DeliveryLocation
+from .models import DeliveryPartner, Delivery, DeliveryUpdate, DeliveryLocation, PartnerServiceArea, TransitTimeEstimate
 
 @admin.register(DeliveryPartner)
 class DeliveryPartnerAdmin(admin.ModelAdmin):
-    list_display = ['name', 'contact_person', 'phone', 'status', 'rating']
+    list_display = ['name', 'contact_person', 'phone', 'status', 'rating', 'rating_count', 'current_load', 'daily_load']
     list_filter = ['status']
     search_fields = ['name', 'contact_person', 'phone']
+    # Kept up to date by rating and delivery signals; saves never write them
+    readonly_fields = ['rating', 'rating_count', 'current_load', 'daily_load', 'daily_load_date']
 
 class DeliveryUpdateInline(admin.TabularInline):
     model = DeliveryUpdate
@@ -18,4 +20,16 @@ class DeliveryAdmin(admin.ModelAdmin):
     search_fields = ['order__order_id', 'tracking_id']
     inlines = [DeliveryUpdateInline]
 
-admin.site.register(DeliveryLocation)
\ No newline at end of file
+admin.site.register(DeliveryLocation)
+
+@admin.register(PartnerServiceArea)
+class PartnerServiceAreaAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'partner']
+    list_filter = ['partner']
+    search_fields = ['prefix', 'partner__name']
+
+@admin.register(TransitTimeEstimate)
+class TransitTimeEstimateAdmin(admin.ModelAdmin):
+    list_display = ['partner', 'prefix', 'sample_count', 'p50_hours', 'p90_hours', 'fitted_at']
+    list_filter = ['partner']
+    search_fields = ['prefix', 'partner__name']
\ No newline at end of file
@@ -0,0 +1,130 @@
+# delivery/assignment.py - In-memory, capacity-aware assignment of delivery partners
+from django.db import transaction
+from django.utils import timezone
+from .loads import ACTIVE_DELIVERY_STATUSES, adjust_partner_loads
+from .models import Delivery, DeliveryPartner, DeliveryUpdate
+from .serviceability import service_area_index
+from .tracking import expire_tracking
+
+ASSIGNMENT_BATCH_SIZE = 500
+
+
+class PartnerPool:
+    """
+    Active delivery partners with what is left of today's capacity, read
+    from their load counters in one query; pincodes are matched through
+    the service area trie.
+    choose() picks the least loaded partner (by share of daily capacity
+    used, then rating) for a pincode, falling back to any partner with
+    capacity, and books the delivery against it so later choices see the
+    new load.
+    """
+
+    def __init__(self, partners, loads, index):
+        self.partners = {partner.pk: partner for partner in partners}
+        self.loads = {partner.pk: loads.get(partner.pk, 0) for partner in partners}
+        self.index = index  # Read once: checking its version is a query
+
+    @classmethod
+    def load(cls, lock=False):
+        partners = DeliveryPartner.objects.filter(status='active').order_by('pk')
+        if lock:
+            partners = partners.select_for_update()  # Concurrent bulk runs would book the same capacity
+        partners = list(partners)
+        return cls(partners, {partner.pk: partner.todays_load for partner in partners}, service_area_index())
+
+    def has_capacity(self, partner):
+        return self.loads[partner.pk] < partner.max_daily_deliveries
+
+    def _least_loaded(self, partners):
+        best = None
+        best_key = None
+        for partner in partners:
+            if not self.has_capacity(partner):
+                continue
+            key = (self.loads[partner.pk] / partner.max_daily_deliveries, -partner.rating, partner.pk)
+            if best_key is None or key < best_key:
+                best, best_key = partner, key
+        return best
+
+    def choose(self, pincode=None):
+        partner = None
+        if pincode:
+            partner = self._least_loaded(
+                self.partners[partner_id] for partner_id in self.index.partners_for(pincode) if partner_id in self.partners
+            )
+        if partner is None:
+            partner = self._least_loaded(self.partners.values())
+        if partner is not None:
+            self.loads[partner.pk] += 1
+        return partner
+
+
+class AssignmentResult:
+    def __init__(self):
+        self.assigned = 0
+        self.unassigned = 0
+        self.per_partner = {}  # partner name -> deliveries assigned
+
+
+@transaction.atomic
+def assign_unassigned_deliveries(deliveries=None):
+    """
+    Give every unassigned delivery a partner in one pass: capacities, today's
+    loads and shipping pincodes are read up front, choices are made in
+    memory, and the results are written with bulk_update plus one
+    bulk_create of DeliveryUpdate rows. bulk_update sends no signals, so
+    the partners' load counters are moved here, one UPDATE per partner,
+    and the deliveries' cached tracking payloads are expired.
+    """
+    if deliveries is None:
+        deliveries = Delivery.objects.filter(delivery_partner__isnull=True, status='assigned')
+    deliveries = list(
+        deliveries.select_for_update(of=('self',)).select_related('order').only(
+            'id', 'status', 'tracking_id', 'delivery_partner', 'handed_over_at', 'delivery_cost', 'updated_at',
+            'order__shipping_pincode',
+        ).order_by('created_at', 'pk')
+    )
+
+    result = AssignmentResult()
+    if not deliveries:
+        return result
+
+    pool = PartnerPool.load(lock=True)
+    now = timezone.now()
+    assigned = []
+    updates = []
+    for delivery in deliveries:
+        partner = pool.choose(delivery.order.shipping_pincode)
+        if partner is None:
+            result.unassigned += 1
+            continue
+        delivery.delivery_partner = partner
+        delivery.handed_over_at = now
+        if partner.cost_per_delivery > 0:
+            delivery.delivery_cost = partner.cost_per_delivery
+        delivery.updated_at = now
+        assigned.append(delivery)
+        updates.append(DeliveryUpdate(
+            delivery=delivery,
+            status='assigned',
+            description=f"Auto-assigned to {partner.name}"
+        ))
+        result.per_partner[partner.name] = result.per_partner.get(partner.name, 0) + 1
+
+    Delivery.objects.bulk_update(
+        assigned, ['delivery_partner', 'handed_over_at', 'delivery_cost', 'updated_at'], batch_size=ASSIGNMENT_BATCH_SIZE
+    )
+    DeliveryUpdate.objects.bulk_create(updates, batch_size=ASSIGNMENT_BATCH_SIZE)
+    handed_over = {}
+    active = {}
+    for delivery in assigned:
+        partner_id = delivery.delivery_partner_id
+        handed_over[partner_id] = handed_over.get(partner_id, 0) + 1
+        if delivery.status in ACTIVE_DELIVERY_STATUSES:
+            active[partner_id] = active.get(partner_id, 0) + 1
+    adjust_partner_loads(current=active, daily=handed_over)
+    tracking_ids = [delivery.tracking_id for delivery in assigned]
+    transaction.on_commit(lambda: expire_tracking(tracking_ids))
+    result.assigned = len(assigned)
+    return result
@@ -0,0 +1,43 @@
+# delivery/consumers.py
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .tracking import tracking_entry, tracking_group
+
+
+class DeliveryTrackingConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes a delivery's tracking payload to its customer's open tracking pages"""
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.tracking_id = self.scope['url_route']['kwargs']['tracking_id']
+        entry = await self.get_entry()
+        if entry is None or not (user.pk == entry['user_id'] or getattr(user, 'user_type', None) in ['staff', 'admin']):
+            await self.close()
+            return
+
+        self.group_name = tracking_group(self.tracking_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json({'type': 'tracking', 'tracking': entry['payload']})
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def tracking_update(self, event):
+        await self.send_json({'type': 'tracking', 'tracking': event['tracking']})
+
+    async def tracking_changed(self, event):
+        entry = await self.get_entry()
+        if entry is not None:
+            await self.send_json({'type': 'tracking', 'tracking': entry['payload']})
+
+    @database_sync_to_async
+    def get_entry(self):
+        return tracking_entry(self.tracking_id)
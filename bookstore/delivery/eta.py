@@ -0,0 +1,211 @@
+# delivery/eta.py - Delivery time estimates fitted from past deliveries
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Delivery, TransitTimeEstimate
+from .versions import VersionedData
+
+ETA_DEFAULTS = {
+    'HISTORY_DAYS': 180,
+    'PREFIX_LENGTH': 3,
+    'MIN_SAMPLES': 10,
+    'DEFAULT_DAYS': 4,
+}
+
+QUANTILES = (0.5, 0.9)
+NO_PARTNER = -1
+
+
+def eta_settings():
+    return {**ETA_DEFAULTS, **getattr(settings, 'DELIVERY_ETA', {})}
+
+
+def pincode_prefix(pincode, length):
+    pincode = str(pincode or '').strip()
+    return pincode[:length] if len(pincode) >= length and pincode[:length].isdigit() else ''
+
+
+def group_quantiles(groups, values, quantiles=QUANTILES):
+    """
+    (counts, quantiles) of values per dense group code, as one sort: each
+    group's values are a contiguous run of the sorted array and every
+    quantile is read off its run with linear interpolation, like np.quantile.
+    """
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups)
+    starts = np.cumsum(counts) - counts
+    positions = starts[:, None] + np.asarray(quantiles)[None, :] * (counts - 1)[:, None]
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.ceil(positions).astype(np.intp)
+    weight = positions - lower
+    return counts, values[lower] * (1 - weight) + values[upper] * weight
+
+
+def delivery_history(since):
+    """
+    Delivered deliveries since a date as arrays: partner ids (NO_PARTNER
+    when unassigned), shipping pincodes, hours from assignment to delivery
+    and hours from pickup to delivery (NaN when pickup was not recorded).
+    """
+    rows = list(
+        Delivery.objects.filter(status='delivered', delivered_at__isnull=False, delivered_at__gte=since)
+        .values_list('delivery_partner_id', 'order__shipping_pincode', 'assigned_at', 'picked_up_at', 'delivered_at')
+    )
+    partners = np.array([partner_id or NO_PARTNER for partner_id, *_ in rows], dtype=np.int64)
+    pincodes = [pincode for _, pincode, *_ in rows]
+    assigned = np.array([row[2].timestamp() for row in rows], dtype=np.float64)
+    picked_up = np.array([row[3].timestamp() if row[3] else np.nan for row in rows], dtype=np.float64)
+    delivered = np.array([row[4].timestamp() for row in rows], dtype=np.float64)
+    return partners, pincodes, (delivered - assigned) / 3600, (delivered - picked_up) / 3600
+
+
+def fit_transit_estimates(now=None, history_days=None):
+    """
+    Fit delivery time quantiles for every (partner, pincode prefix),
+    prefix, partner and overall group with at least MIN_SAMPLES deliveries;
+    returns unsaved TransitTimeEstimate rows. Blank partner/prefix means
+    the row covers all of them.
+    """
+    config = eta_settings()
+    now = now or timezone.now()
+    since = now - timedelta(days=history_days or config['HISTORY_DAYS'])
+    partners, pincodes, total_hours, after_pickup_hours = delivery_history(since)
+    if not len(partners):
+        return []
+
+    usable = total_hours >= 0  # Rows with clocks out of order say nothing about transit time
+    prefixes = np.array([pincode_prefix(pincode, config['PREFIX_LENGTH']) for pincode in pincodes], dtype=object)
+    prefix_names, prefix_codes = np.unique(prefixes, return_inverse=True)
+
+    estimates = []
+    for by_partner, by_prefix in ((True, True), (False, True), (True, False), (False, False)):
+        rows = usable.copy()
+        if by_partner:
+            rows &= partners != NO_PARTNER
+        if by_prefix:
+            rows &= prefixes != ''
+        if not rows.any():
+            continue
+
+        keys = np.stack([
+            partners[rows] if by_partner else np.zeros(rows.sum(), dtype=np.int64),
+            prefix_codes[rows] if by_prefix else np.full(rows.sum(), -1, dtype=np.int64),
+        ], axis=1)
+        groups, group_of_row = np.unique(keys, axis=0, return_inverse=True)
+        group_of_row = group_of_row.reshape(-1)
+        counts, totals = group_quantiles(group_of_row, total_hours[rows])
+
+        after_pickup = np.full((len(groups), len(QUANTILES)), np.nan)
+        legs = after_pickup_hours[rows]
+        has_leg = legs >= 0  # False for NaN too
+        if has_leg.any():
+            leg_groups, leg_group_of_row = np.unique(group_of_row[has_leg], return_inverse=True)
+            after_pickup[leg_groups] = group_quantiles(leg_group_of_row.reshape(-1), legs[has_leg])[1]
+
+        for group in np.flatnonzero(counts >= config['MIN_SAMPLES']):
+            partner_id, prefix_code = groups[group].tolist()
+            estimates.append(TransitTimeEstimate(
+                partner_id=partner_id if by_partner else None,
+                prefix=prefix_names[prefix_code] if by_prefix else '',
+                sample_count=int(counts[group]),
+                p50_hours=round(float(totals[group, 0]), 2),
+                p90_hours=round(float(totals[group, 1]), 2),
+                after_pickup_p50_hours=None if np.isnan(after_pickup[group, 0]) else round(float(after_pickup[group, 0]), 2),
+                after_pickup_p90_hours=None if np.isnan(after_pickup[group, 1]) else round(float(after_pickup[group, 1]), 2),
+                fitted_at=now,
+            ))
+    return estimates
+
+
+@transaction.atomic
+def store_transit_estimates(estimates):
+    """Replace the lookup table with a new fit"""
+    TransitTimeEstimate.objects.all().delete()
+    TransitTimeEstimate.objects.bulk_create(estimates)
+    transaction.on_commit(invalidate_eta_table)
+    return len(estimates)
+
+
+class EtaTable:
+    """
+    Fitted quantiles keyed by (partner id or None, prefix); a lookup tries
+    partner and prefix, then prefix, partner and the overall row, so every
+    estimate is a few dictionary probes.
+    """
+
+    def __init__(self, rows, prefix_length):
+        self.prefix_length = prefix_length
+        self.rows = {
+            (partner_id, prefix): (p50, p90, after_p50, after_p90)
+            for partner_id, prefix, p50, p90, after_p50, after_p90 in rows
+        }
+
+    def quantiles(self, pincode=None, partner_id=None):
+        """(p50, p90, after pickup p50, after pickup p90) hours, or None when nothing was fitted"""
+        prefix = pincode_prefix(pincode, self.prefix_length)
+        for key in ((partner_id, prefix), (None, prefix), (partner_id, ''), (None, '')):
+            if key in self.rows:
+                return self.rows[key]
+        return None
+
+
+def build_eta_table():
+    return EtaTable(
+        TransitTimeEstimate.objects.values_list(
+            'partner_id', 'prefix', 'p50_hours', 'p90_hours', 'after_pickup_p50_hours', 'after_pickup_p90_hours'
+        ),
+        eta_settings()['PREFIX_LENGTH'],
+    )
+
+
+_eta_table = VersionedData('delivery_eta', lambda version: build_eta_table())
+
+
+def invalidate_eta_table():
+    _eta_table.invalidate()
+
+
+def eta_table():
+    """The lookup table, reloaded with one query after each refit"""
+    return _eta_table.get()
+
+
+def estimate_delivery(pincode=None, partner_id=None, start=None):
+    """
+    (expected, latest) delivery times for a delivery handed over at start
+    (default now): the median and 90th percentile of similar deliveries,
+    or DEFAULT_DAYS for both when there is no history yet.
+    """
+    start = start or timezone.now()
+    fitted = eta_table().quantiles(pincode, partner_id)
+    if fitted is None:
+        default = start + timedelta(days=eta_settings()['DEFAULT_DAYS'])
+        return default, default
+    return start + timedelta(hours=fitted[0]), start + timedelta(hours=fitted[1])
+
+
+def estimated_delivery_date(pincode=None, partner_id=None, start=None):
+    """The date to promise for a new order: the day of the latest estimate"""
+    return timezone.localdate(estimate_delivery(pincode, partner_id, start)[1])
+
+
+def delivery_eta(delivery):
+    """
+    (expected, latest) for a delivery in progress, counted from pickup when
+    it has been picked up and that leg was fitted, else from assignment;
+    None once delivered.
+    """
+    if delivery.status == 'delivered' or delivery.delivered_at:
+        return None
+    pincode = delivery.order.shipping_pincode
+    fitted = eta_table().quantiles(pincode, delivery.delivery_partner_id)
+    if delivery.picked_up_at and fitted and fitted[2] is not None:
+        return (
+            delivery.picked_up_at + timedelta(hours=fitted[2]),
+            delivery.picked_up_at + timedelta(hours=fitted[3]),
+        )
+    return estimate_delivery(pincode, delivery.delivery_partner_id, delivery.assigned_at)
@@ -1,14 +1,15 @@
 # delivery/forms.py
 from django import forms
 from .models import DeliveryPartner, Delivery, DeliveryUpdate
+from .serviceability import partners_serving, split_service_areas
 
 class DeliveryPartnerForm(forms.ModelForm):
     service_areas = forms.CharField(
         widget=forms.Textarea(attrs={
             'rows': 3,
-            'placeholder': 'Enter pincodes separated by commas (e.g., 400001, 400002, 400003)'
+            'placeholder': 'Enter pincodes separated by commas (e.g., 400001, 400002, 4000*)'
         }),
-        help_text="Enter pincodes separated by commas"
+        help_text="Enter pincodes separated by commas; end a prefix with * to cover a range"
     )
     
     class Meta:
@@ -30,11 +31,10 @@ class DeliveryPartnerForm(forms.ModelForm):
     
     def clean_service_areas(self):
         service_areas_str = self.cleaned_data.get('service_areas', '')
-        if service_areas_str:
-            # Split by comma and clean up
-            areas = [area.strip() for area in service_areas_str.split(',') if area.strip()]
-            return areas
-        return []
+        areas, invalid = split_service_areas(service_areas_str or '')
+        if invalid:
+            raise forms.ValidationError(f"Not a pincode or pincode prefix: {', '.join(invalid)}")
+        return areas
 
 class DeliveryStatusUpdateForm(forms.ModelForm):
     class Meta:
@@ -65,7 +65,7 @@ class AssignPartnerForm(forms.Form):
             pincode = delivery.order.shipping_pincode
             available_partners = DeliveryPartner.objects.filter(
                 status='active',
-                service_areas__contains=[pincode]
+                pk__in=partners_serving(pincode)
             )
             
             if available_partners.exists():
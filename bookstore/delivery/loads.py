@@ -0,0 +1,92 @@
+# delivery/loads.py - Live delivery partner load counters
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import DeliveryPartner
+
+# Deliveries a partner is still working on; they make up DeliveryPartner.current_load
+ACTIVE_DELIVERY_STATUSES = ['assigned', 'picked_up', 'in_transit', 'out_for_delivery']
+
+
+def adjust_partner_loads(current=None, daily=None):
+    """
+    Apply {partner_id: delta} changes to current_load and to today's
+    daily_load with F() expressions, one UPDATE per partner. The daily
+    counter starts again from the delta when it was last written on an
+    earlier day, so a missed reset never leaks into today's capacity.
+    """
+    current = {pk: delta for pk, delta in (current or {}).items() if pk and delta}
+    daily = {pk: delta for pk, delta in (daily or {}).items() if pk and delta}
+    today = timezone.localdate()
+
+    for partner_id in set(current) | set(daily):
+        changes = {}
+        if partner_id in current:
+            changes['current_load'] = Greatest(F('current_load') + current[partner_id], Value(0))
+        if partner_id in daily:
+            delta = daily[partner_id]
+            changes['daily_load'] = Case(
+                When(daily_load_date=today, then=Greatest(F('daily_load') + delta, Value(0))),
+                default=Value(max(delta, 0)),
+            )
+            changes['daily_load_date'] = today
+        DeliveryPartner.objects.filter(pk=partner_id).update(**changes)
+
+
+def handed_over_today(handed_over_at):
+    return handed_over_at is not None and timezone.localdate(handed_over_at) == timezone.localdate()
+
+
+def load_changes(old, new):
+    """
+    (current, daily) deltas for one delivery moving between partners and/or
+    statuses; old and new are (partner_id, status, handed_over_at).
+    """
+    old_partner_id, old_status, old_handed_over_at = old
+    new_partner_id, new_status, new_handed_over_at = new
+    current = {}
+    daily = {}
+    if old_partner_id and old_status in ACTIVE_DELIVERY_STATUSES:
+        current[old_partner_id] = current.get(old_partner_id, 0) - 1
+    if new_partner_id and new_status in ACTIVE_DELIVERY_STATUSES:
+        current[new_partner_id] = current.get(new_partner_id, 0) + 1
+    if old_partner_id != new_partner_id:
+        # A delivery counts against the day it was handed to its partner only
+        if old_partner_id and handed_over_today(old_handed_over_at):
+            daily[old_partner_id] = -1
+        if new_partner_id and handed_over_today(new_handed_over_at):
+            daily[new_partner_id] = 1
+    return current, daily
+
+
+@transaction.atomic
+def reconcile_partner_loads():
+    """
+    Recount every partner's counters from the deliveries: current_load from
+    active deliveries, daily_load from the deliveries handed to the partner
+    today. The partners are locked first, so an assignment that commits
+    meanwhile waits and then applies its increment on top of the recount.
+    Returns (partner, (old current, old today), (new current, new today))
+    for each partner whose counters had drifted.
+    """
+    today = timezone.localdate()
+    partners = list(DeliveryPartner.objects.select_for_update().order_by('pk'))
+    counts = {
+        pk: (active_count, today_count)
+        for pk, active_count, today_count in DeliveryPartner.objects.annotate(
+            active_count=Count('deliveries', filter=Q(deliveries__status__in=ACTIVE_DELIVERY_STATUSES)),
+            today_count=Count('deliveries', filter=Q(deliveries__handed_over_at__date=today)),
+        ).values_list('pk', 'active_count', 'today_count')
+    }
+
+    drifted = []
+    for partner in partners:
+        old = (partner.current_load, partner.todays_load)
+        new = counts.get(partner.pk, (0, 0))
+        if old != new:
+            drifted.append((partner, old, new))
+        partner.current_load, partner.daily_load = new
+        partner.daily_load_date = today
+    DeliveryPartner.objects.bulk_update(partners, ['current_load', 'daily_load', 'daily_load_date'])
+    return drifted
@@ -0,0 +1,35 @@
+# delivery/management/commands/fit_delivery_eta.py
+
+from django.core.management.base import BaseCommand
+from delivery.eta import fit_transit_estimates, store_transit_estimates
+
+class Command(BaseCommand):
+    help = 'Refit delivery time estimates (per partner and pincode prefix) from delivered orders (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=None,
+            help='Days of deliveries to fit on (default: DELIVERY_ETA["HISTORY_DAYS"])'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Fit and summarize estimates without saving them',
+        )
+
+    def handle(self, *args, **options):
+        estimates = fit_transit_estimates(history_days=options['history_days'])
+        for estimate in sorted(estimates, key=lambda e: -e.sample_count)[:10]:
+            self.stdout.write(
+                f'  {estimate.partner_id or "any partner"} / {estimate.prefix or "any pincode"}: '
+                f'{estimate.p50_hours:.1f}h median, {estimate.p90_hours:.1f}h p90 ({estimate.sample_count} deliveries)'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'DRY RUN - {len(estimates)} estimates not saved'))
+            return
+
+        store_transit_estimates(estimates)
+        self.stdout.write(self.style.SUCCESS(f'Saved {len(estimates)} delivery time estimates'))
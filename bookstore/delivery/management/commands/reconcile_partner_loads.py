@@ -0,0 +1,15 @@
+# delivery/management/commands/reconcile_partner_loads.py
+
+from django.core.management.base import BaseCommand
+from delivery.loads import reconcile_partner_loads
+
+class Command(BaseCommand):
+    help = "Recount delivery partners' current and daily load counters from their deliveries (run daily after midnight)"
+
+    def handle(self, *args, **options):
+        drifted = reconcile_partner_loads()
+        for partner, (old_current, old_today), (current, today) in drifted:
+            self.stdout.write(self.style.WARNING(
+                f'  {partner.name}: current {old_current} -> {current}, today {old_today} -> {today}'
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Partner loads reconciled; {len(drifted)} had drifted'))
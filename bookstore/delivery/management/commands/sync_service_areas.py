@@ -0,0 +1,21 @@
+# delivery/management/commands/sync_service_areas.py
+
+from django.core.management.base import BaseCommand
+from delivery.models import DeliveryPartner
+from delivery.serviceability import invalidate_service_areas, parse_service_area, sync_service_areas
+
+class Command(BaseCommand):
+    help = "Rebuild the pincode service area table from every delivery partner's service_areas list"
+
+    def handle(self, *args, **options):
+        changed = 0
+        for partner in DeliveryPartner.objects.all():
+            invalid = [area for area in partner.service_areas or [] if not parse_service_area(area)]
+            if invalid:
+                self.stdout.write(self.style.WARNING(
+                    f'  {partner.name}: skipped {", ".join(map(str, invalid))} (not a pincode or pincode prefix)'
+                ))
+            if sync_service_areas(partner):
+                changed += 1
+        invalidate_service_areas()
+        self.stdout.write(self.style.SUCCESS(f'Service areas updated for {changed} partners'))
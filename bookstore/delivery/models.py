@@ -2,13 +2,15 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from orders.models import Order
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from reviews.ratings import RatedModel, move_rating
 from datetime import datetime, timedelta
 
 User = get_user_model()
 
-class DeliveryPartner(models.Model):
+class DeliveryPartner(RatedModel):
     PARTNER_STATUS = (
         ('active', 'Active'),
         ('inactive', 'Inactive'),
@@ -24,53 +26,59 @@ class DeliveryPartner(models.Model):
     service_areas = models.JSONField(default=list, help_text="List of pincodes they serve")
     
     status = models.CharField(max_length=20, choices=PARTNER_STATUS, default='active')
+    # Average customer rating; maintained from Delivery.customer_rating (see reviews.ratings)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     
     cost_per_delivery = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     
     # Capacity management
     max_daily_deliveries = models.PositiveIntegerField(default=50)
-    current_load = models.PositiveIntegerField(default=0)
+    # Maintained by delivery.loads; recount with the reconcile_partner_loads command
+    current_load = models.PositiveIntegerField(default=0, help_text="Active deliveries")
+    daily_load = models.PositiveIntegerField(default=0, help_text="Deliveries handed over on daily_load_date")
+    daily_load_date = models.DateField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    MAINTAINED_FIELDS = RatedModel.MAINTAINED_FIELDS + ('current_load', 'daily_load', 'daily_load_date')
+    
     def __str__(self):
         return self.name
     
     def serves_pincode(self, pincode):
-        return pincode in self.service_areas
+        from .serviceability import partners_serving
+        return self.pk in partners_serving(pincode)
+    
+    @property
+    def todays_load(self):
+        """Deliveries handed over today; the counter is stale (zero) once the date has moved on"""
+        from django.utils import timezone
+        return self.daily_load if self.daily_load_date == timezone.localdate() else 0
     
     def can_take_delivery(self):
         """Check if partner can take more deliveries today"""
-        from datetime import date
-        today_deliveries = self.deliveries.filter(
-            assigned_at__date=date.today(),
-            status__in=['assigned', 'picked_up', 'in_transit', 'out_for_delivery']
-        ).count()
-        return today_deliveries < self.max_daily_deliveries
+        return self.todays_load < self.max_daily_deliveries
     
     @classmethod
     def get_default_partner(cls, pincode=None):
-        """Get default partner for auto-assignment"""
-        # Try to find a partner that serves the pincode and has capacity
-        if pincode:
-            partners = cls.objects.filter(
-                status='active',
-                service_areas__contains=[pincode]
-            )
-            for partner in partners:
-                if partner.can_take_delivery():
-                    return partner
-        
-        # Fallback: get any active partner with capacity
-        partners = cls.objects.filter(status='active')
-        for partner in partners:
-            if partner.can_take_delivery():
-                return partner
-        
-        # If no partners available, return None (will be manually assigned)
-        return None
+        """Get default partner for auto-assignment: the least loaded one serving the pincode, else any with capacity"""
+        from .assignment import PartnerPool
+        return PartnerPool.load().choose(pincode)
+
+class PartnerServiceArea(models.Model):
+    """A pincode, or pincode prefix, a partner serves; rows mirror DeliveryPartner.service_areas"""
+    partner = models.ForeignKey(DeliveryPartner, on_delete=models.CASCADE, related_name='service_area_entries')
+    prefix = models.CharField(
+        max_length=10, db_index=True,
+        help_text="A full pincode, or the leading digits of every pincode served (\"4000\" = 400000-400099)"
+    )
+    
+    class Meta:
+        unique_together = ['partner', 'prefix']
+    
+    def __str__(self):
+        return f"{self.partner.name} - {self.prefix}"
 
 class Delivery(models.Model):
     DELIVERY_STATUS = (
@@ -96,6 +104,8 @@ class Delivery(models.Model):
     delivery_address = models.TextField()
     
     assigned_at = models.DateTimeField(auto_now_add=True)
+    # When the current partner was given the delivery; daily loads count from this
+    handed_over_at = models.DateTimeField(null=True, blank=True, editable=False)
     picked_up_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
     
@@ -121,6 +131,12 @@ class Delivery(models.Model):
         if not self.tracking_id:
             import uuid
             self.tracking_id = f"TRK{str(uuid.uuid4())[:10].upper()}"
+        if self._state.adding or self.delivery_partner_id != self._load_state[0]:
+            from django.utils import timezone
+            self.handed_over_at = timezone.now() if self.delivery_partner_id else None
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and {'delivery_partner', 'delivery_partner_id'} & set(update_fields):
+                kwargs['update_fields'] = {*update_fields, 'handed_over_at'}
         super().save(*args, **kwargs)
 
 class DeliveryUpdate(models.Model):
@@ -152,6 +168,128 @@ class DeliveryLocation(models.Model):
     def __str__(self):
         return f"{self.name} - {self.city}"
 
+class TransitTimeEstimate(models.Model):
+    """Delivery time quantiles for a partner and pincode prefix, refitted by the fit_delivery_eta command"""
+    partner = models.ForeignKey(
+        DeliveryPartner, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='transit_estimates', help_text="Blank for deliveries by any partner"
+    )
+    prefix = models.CharField(max_length=10, blank=True, help_text="Leading digits of the shipping pincode; blank for any pincode")
+    sample_count = models.PositiveIntegerField(default=0)
+    p50_hours = models.FloatField(help_text="Median hours from assignment to delivery")
+    p90_hours = models.FloatField(help_text="90th percentile hours from assignment to delivery")
+    after_pickup_p50_hours = models.FloatField(null=True, blank=True)
+    after_pickup_p90_hours = models.FloatField(null=True, blank=True)
+    fitted_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['partner', 'prefix']
+    
+    def __str__(self):
+        return f"{self.partner or 'Any partner'} - {self.prefix or 'any pincode'}: {self.p50_hours:.0f}h"
+
+class DataVersion(models.Model):
+    """Current token of data every process keeps loaded in memory, see delivery.versions"""
+    name = models.CharField(max_length=50, unique=True)
+    token = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.updated_at}"
+
+@receiver(post_save, sender=DeliveryPartner)
+def sync_partner_service_areas(sender, instance, created, update_fields=None, **kwargs):
+    """Keep PartnerServiceArea rows and the pincode index in step with the partner"""
+    if update_fields and not {'service_areas', 'status'}.intersection(update_fields):
+        return
+    from .serviceability import sync_service_areas, invalidate_service_areas
+    changed = sync_service_areas(instance)
+    # Only active partners are indexed, so a status change matters too
+    if changed or update_fields is None or 'status' in update_fields:
+        transaction.on_commit(invalidate_service_areas)
+
+@receiver(post_delete, sender=DeliveryPartner)
+def drop_partner_service_areas(sender, instance, **kwargs):
+    from .serviceability import invalidate_service_areas
+    transaction.on_commit(invalidate_service_areas)
+
+@receiver(post_init, sender=Delivery)
+def remember_delivery_load_state(sender, instance, **kwargs):
+    """Partner, status and handover time as loaded, to tell what a save changes (deferred fields are left unknown)"""
+    instance._load_state = (
+        instance.__dict__.get('delivery_partner_id'),
+        instance.__dict__.get('status'),
+        instance.__dict__.get('handed_over_at'),
+    )
+
+@receiver(post_save, sender=Delivery)
+def update_partner_loads(sender, instance, created, **kwargs):
+    """Move the delivery between partners' load counters on assignment and status changes"""
+    from .loads import adjust_partner_loads, load_changes
+    old_state = (None, None, None) if created else instance._load_state
+    new_state = (instance.delivery_partner_id, instance.status, instance.handed_over_at)
+    if not created and old_state[1] is None:
+        instance._load_state = new_state
+        return  # Loaded with status deferred; reconcile_partner_loads catches anything missed
+    current, daily = load_changes(old_state, new_state)
+    adjust_partner_loads(current, daily)
+    instance._load_state = new_state
+
+@receiver(post_delete, sender=Delivery)
+def release_partner_load(sender, instance, **kwargs):
+    from .loads import adjust_partner_loads, load_changes
+    current, daily = load_changes(
+        (instance.delivery_partner_id, instance.status, instance.handed_over_at), (None, None, None)
+    )
+    adjust_partner_loads(current, daily)
+
+@receiver(post_init, sender=Delivery)
+def remember_delivery_rating(sender, instance, **kwargs):
+    """(partner, rating, rated at) as loaded; None when the rating was deferred"""
+    if 'customer_rating' not in instance.__dict__:
+        instance._rating_state = None
+        return
+    instance._rating_state = delivery_rating(instance)
+
+def delivery_rating(delivery):
+    return (
+        delivery.__dict__.get('delivery_partner_id'),
+        delivery.customer_rating,
+        delivery.__dict__.get('delivered_at') or delivery.__dict__.get('assigned_at'),
+    )
+
+@receiver(post_save, sender=Delivery)
+def update_partner_rating(sender, instance, created, **kwargs):
+    """Fold a new or changed customer rating into the partner's running average"""
+    old_state = (None, None, None) if created else instance._rating_state
+    new_state = delivery_rating(instance)
+    instance._rating_state = new_state
+    if old_state is not None:  # Loaded with the rating deferred; rebuild_rating_aggregates catches anything missed
+        move_rating(DeliveryPartner, old_state, new_state)
+
+@receiver(post_delete, sender=Delivery)
+def drop_partner_rating(sender, instance, **kwargs):
+    move_rating(DeliveryPartner, delivery_rating(instance), (None, None, None))
+
+@receiver(post_save, sender=Delivery)
+def refresh_tracking_on_delivery_change(sender, instance, **kwargs):
+    from .tracking import refresh_tracking
+    tracking_id = instance.tracking_id
+    transaction.on_commit(lambda: refresh_tracking(tracking_id))
+
+@receiver(post_save, sender=DeliveryUpdate)
+def refresh_tracking_on_update(sender, instance, created, **kwargs):
+    """Tracking payloads are rebuilt only when the delivery or its updates are written"""
+    from .tracking import refresh_tracking
+    tracking_id = instance.delivery.tracking_id
+    transaction.on_commit(lambda: refresh_tracking(tracking_id))
+
+@receiver(post_delete, sender=Delivery)
+def expire_tracking_on_delete(sender, instance, **kwargs):
+    from .tracking import expire_tracking
+    tracking_id = instance.tracking_id
+    transaction.on_commit(lambda: expire_tracking([tracking_id]))
+
 # Signal to automatically create delivery when order is confirmed
 @receiver(post_save, sender=Order)
 def create_delivery_for_order(sender, instance, created, **kwargs):
@@ -172,12 +310,19 @@ def create_delivery_for_order(sender, instance, created, **kwargs):
         # Create delivery address from order shipping info
         delivery_address = f"{instance.shipping_address}, {instance.shipping_city}, {instance.shipping_state} - {instance.shipping_pincode}"
         
-        # Calculate estimated delivery time (3-5 business days)
-        estimated_delivery = datetime.now() + timedelta(days=4)
-        
         # Try to get a delivery partner
         delivery_partner = DeliveryPartner.get_default_partner(instance.shipping_pincode)
         
+        # Estimated delivery time (90th percentile of past deliveries by this partner to this area)
+        from django.utils import timezone
+        from .eta import estimate_delivery
+        estimated_delivery = estimate_delivery(
+            instance.shipping_pincode, delivery_partner.pk if delivery_partner else None
+        )[1]
+        if not instance.estimated_delivery_date:
+            instance.estimated_delivery_date = timezone.localdate(estimated_delivery)
+            Order.objects.filter(pk=instance.pk).update(estimated_delivery_date=instance.estimated_delivery_date)
+        
         # Calculate delivery cost (you can make this more sophisticated)
         delivery_cost = 50.00  # Default delivery cost
         if delivery_partner:
@@ -242,4 +387,4 @@ def update_delivery_status(sender, instance, **kwargs):
                     delivery=delivery,
                     status=new_delivery_status,
                     description=f"Status updated from {old_status} to {new_delivery_status} based on order status change."
-                )
\ No newline at end of file
+                )
\ No newline at end of file
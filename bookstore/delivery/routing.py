@@ -0,0 +1,7 @@
+# delivery/routing.py
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/delivery/track/<str:tracking_id>/', consumers.DeliveryTrackingConsumer.as_asgi()),
+]
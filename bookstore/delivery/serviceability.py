@@ -0,0 +1,106 @@
+# delivery/serviceability.py - Which delivery partners serve a pincode
+import re
+
+from django.db import transaction
+from .models import PartnerServiceArea
+from .versions import VersionedData
+
+PINCODE_LENGTH = 6
+
+# "400001" is one pincode; "4000*" is every pincode starting with 4000
+SERVICE_AREA = re.compile(r'^(\d{%d}|\d{1,%d}\*)$' % (PINCODE_LENGTH, PINCODE_LENGTH - 1))
+
+
+def parse_service_area(value):
+    """The stored prefix for a service area entry, or None if it is not a pincode or pincode prefix"""
+    value = str(value).strip()
+    if not SERVICE_AREA.match(value):
+        return None
+    return value.rstrip('*')
+
+
+def split_service_areas(text):
+    """Comma separated entries from the partner forms -> (valid entries, invalid entries)"""
+    areas = []
+    invalid = []
+    for entry in text.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        (areas if parse_service_area(entry) else invalid).append(entry)
+    return areas, invalid
+
+
+class PincodeTrie:
+    """
+    Digit trie over service area prefixes of active partners. A lookup
+    walks at most PINCODE_LENGTH nodes and collects the partners of every
+    prefix of the pincode on the way, so exact pincodes and prefix ranges
+    are answered together.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, prefix, partner_id):
+        node = self.root
+        for digit in prefix:
+            node = node.setdefault(digit, {})
+        node.setdefault(None, set()).add(partner_id)  # None holds the partners ending here
+
+    def partners_for(self, pincode):
+        partner_ids = set()
+        node = self.root
+        for digit in str(pincode or '').strip()[:PINCODE_LENGTH]:
+            node = node.get(digit)
+            if node is None:
+                break
+            partner_ids.update(node.get(None, ()))
+        return partner_ids
+
+
+def build_service_area_index():
+    trie = PincodeTrie()
+    for prefix, partner_id in PartnerServiceArea.objects.filter(
+        partner__status='active'
+    ).values_list('prefix', 'partner_id'):
+        trie.insert(prefix, partner_id)
+    return trie
+
+
+_service_areas = VersionedData('delivery_service_areas', lambda version: build_service_area_index())
+
+
+def invalidate_service_areas():
+    _service_areas.invalidate()
+
+
+def service_area_index():
+    """The pincode trie, rebuilt with one query after any service area or partner status change"""
+    return _service_areas.get()
+
+
+def partners_serving(pincode):
+    """Ids of the active partners that serve a pincode"""
+    return service_area_index().partners_for(pincode)
+
+
+def is_serviceable(pincode):
+    return bool(partners_serving(pincode))
+
+
+def sync_service_areas(partner):
+    """
+    Make the PartnerServiceArea rows of a partner match its service_areas
+    list; returns True when rows were added or removed.
+    """
+    wanted = {prefix for prefix in map(parse_service_area, partner.service_areas or []) if prefix}
+    existing = set(partner.service_area_entries.values_list('prefix', flat=True))
+    if wanted == existing:
+        return False
+    with transaction.atomic():
+        partner.service_area_entries.filter(prefix__in=existing - wanted).delete()
+        PartnerServiceArea.objects.bulk_create([
+            PartnerServiceArea(partner=partner, prefix=prefix) for prefix in sorted(wanted - existing)
+        ])
+    return True
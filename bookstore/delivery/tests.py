@@ -1,3 +1,314 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from orders.models import Order
+from .assignment import assign_unassigned_deliveries
+from .eta import estimate_delivery, fit_transit_estimates, group_quantiles, store_transit_estimates
+from .loads import reconcile_partner_loads
+from .models import Delivery, DeliveryPartner, DeliveryUpdate, PartnerServiceArea, TransitTimeEstimate
+from .serviceability import (
+    PincodeTrie, build_service_area_index, parse_service_area, split_service_areas, partners_serving, service_area_index,
+)
+from .tracking import expire_tracking, tracking_entry
+from .versions import VersionedData
+
+User = get_user_model()
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class DeliveryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass')
+
+    def partner(self, name, **fields):
+        # Run the service area sync's on_commit hook so the pincode trie is rebuilt
+        with self.captureOnCommitCallbacks(execute=True):
+            return DeliveryPartner.objects.create(
+                name=name, contact_person='Contact', phone='1234567890', email=f'{name.lower()}@example.com',
+                address='Depot', **fields
+            )
+
+    def confirm_order(self, pincode='400001'):
+        """A confirmed order; its delivery is created and assigned by the Order receivers"""
+        order = Order.objects.create(
+            user=self.user, subtotal=0, total_amount=0, status='confirmed', shipping_pincode=pincode,
+        )
+        return Delivery.objects.get(order=order)
+
+
+class PartnerLoadTests(DeliveryTestCase):
+    def loads(self, partner):
+        partner.refresh_from_db()
+        return partner.current_load, partner.todays_load
+
+    def test_counters_follow_assignment_and_status(self):
+        partner = self.partner('Fast')
+        delivery = self.confirm_order()
+        self.assertEqual(delivery.delivery_partner, partner)
+        self.assertEqual(self.loads(partner), (1, 1))
+
+        delivery.status = 'delivered'
+        delivery.save()
+        # Delivered work no longer counts as active but stays on today's tally
+        self.assertEqual(self.loads(partner), (0, 1))
+
+    def test_reassignment_moves_both_counters(self):
+        first, second = self.partner('First'), self.partner('Second', max_daily_deliveries=10)
+        delivery = self.confirm_order()
+        self.assertEqual(delivery.delivery_partner, first)
+
+        delivery.delivery_partner = second
+        delivery.save()
+        self.assertEqual(self.loads(first), (0, 0))
+        self.assertEqual(self.loads(second), (1, 1))
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        steady, drifted = self.partner('Steady'), self.partner('Drifted')
+        self.confirm_order()
+        DeliveryPartner.objects.filter(pk=drifted.pk).update(current_load=7)
+
+        [(partner, old, new)] = reconcile_partner_loads()
+        self.assertEqual((partner, old, new), (drifted, (7, 0), (0, 0)))
+        self.assertEqual(self.loads(steady), (1, 1))
+        self.assertEqual(self.loads(drifted), (0, 0))
+        self.assertEqual(reconcile_partner_loads(), [])
+
+    def test_reconcile_command_prints_the_old_and_new_counters(self):
+        partner = self.partner('Fast')
+        self.confirm_order()
+        DeliveryPartner.objects.filter(pk=partner.pk).update(current_load=4, daily_load=9)
+
+        out = StringIO()
+        call_command('reconcile_partner_loads', stdout=out)
+        self.assertIn('Fast: current 4 -> 1, today 9 -> 1', out.getvalue())
+
+
+class BulkAssignmentTests(DeliveryTestCase):
+    def unassigned(self, *pincodes):
+        """Deliveries confirmed while no partner was active, oldest first"""
+        return [self.confirm_order(pincode) for pincode in pincodes]
+
+    def test_pincode_partners_first_then_the_least_loaded(self):
+        deliveries = self.unassigned('400001', '400002', '400003', '560001', '110001')
+        self.assertFalse(any(delivery.delivery_partner_id for delivery in deliveries))
+        mumbai = self.partner('Mumbai', service_areas=['4000*'], max_daily_deliveries=2)
+        bangalore = self.partner('Bangalore', service_areas=['560001'], max_daily_deliveries=10)
+        anywhere = self.partner('Anywhere', max_daily_deliveries=10, rating=4.5)
+
+        result = assign_unassigned_deliveries()
+        self.assertEqual((result.assigned, result.unassigned), (5, 0))
+        self.assertEqual(result.per_partner, {'Mumbai': 2, 'Anywhere': 2, 'Bangalore': 1})
+        self.assertEqual(
+            [Delivery.objects.get(pk=delivery.pk).delivery_partner for delivery in deliveries],
+            [mumbai, mumbai, anywhere, bangalore, anywhere],
+        )
+        # bulk_update sends no signals, so the counters are moved by the assignment itself
+        self.assertEqual(
+            [(p.current_load, p.todays_load) for p in DeliveryPartner.objects.order_by('pk')],
+            [(2, 2), (1, 1), (2, 2)],
+        )
+        self.assertEqual(DeliveryUpdate.objects.filter(description__startswith='Auto-assigned').count(), 5)
+        self.assertEqual(reconcile_partner_loads(), [])
+
+    def test_full_partners_leave_deliveries_unassigned(self):
+        self.unassigned('400001', '400002')
+        self.partner('Small', max_daily_deliveries=1)
+
+        result = assign_unassigned_deliveries()
+        self.assertEqual((result.assigned, result.unassigned), (1, 1))
+        self.assertEqual(Delivery.objects.filter(delivery_partner__isnull=True).count(), 1)
+
+    def test_query_count_does_not_grow_with_deliveries(self):
+        deliveries = self.unassigned(*[f'4000{i:02d}' for i in range(14)])
+        self.partner('Mumbai', service_areas=['4000*'], max_daily_deliveries=100)
+        service_area_index()  # Build the trie outside the measured runs
+        with CaptureQueriesContext(connection) as small:
+            assign_unassigned_deliveries(Delivery.objects.filter(pk__in=[d.pk for d in deliveries[:2]]))
+        small_queries = len(small)
+
+        with self.assertNumQueries(small_queries):
+            self.assertEqual(assign_unassigned_deliveries().assigned, 12)
+
+
+class ServiceabilityTests(DeliveryTestCase):
+    def test_service_area_entries_are_pincodes_or_prefixes(self):
+        self.assertEqual(parse_service_area(' 400001 '), '400001')
+        self.assertEqual(parse_service_area('4000*'), '4000')
+        for value in ('4000', '400001*', '*', '40a0*', '4000001'):
+            self.assertIsNone(parse_service_area(value), value)
+        self.assertEqual(split_service_areas('400001, 56*,, nowhere'), (['400001', '56*'], ['nowhere']))
+
+    def test_trie_collects_every_matching_prefix(self):
+        trie = PincodeTrie()
+        trie.insert('4', 1)
+        trie.insert('4000', 2)
+        trie.insert('400001', 3)
+        trie.insert('5600', 4)
+        self.assertEqual(trie.partners_for('400001'), {1, 2, 3})
+        self.assertEqual(trie.partners_for(' 400099'), {1, 2})
+        self.assertEqual(trie.partners_for('410001'), {1})
+        self.assertEqual(trie.partners_for('110001'), set())
+        self.assertEqual(trie.partners_for(None), set())
+
+    def test_index_follows_partner_changes(self):
+        mumbai = self.partner('Mumbai', service_areas=['4000*', '411001'])
+        self.assertEqual(
+            set(mumbai.service_area_entries.values_list('prefix', flat=True)), {'4000', '411001'}
+        )
+        self.assertEqual(partners_serving('400050'), {mumbai.pk})
+        self.assertTrue(mumbai.serves_pincode('411001'))
+        self.assertFalse(mumbai.serves_pincode('411002'))
+
+        # A second copy stands in for another worker process with its own memory
+        other_process = VersionedData('delivery_service_areas', lambda version: build_service_area_index())
+        self.assertEqual(other_process.get().partners_for('400050'), {mumbai.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mumbai.service_areas = ['560001']
+            mumbai.save()
+        self.assertEqual(list(PartnerServiceArea.objects.values_list('prefix', flat=True)), ['560001'])
+        self.assertEqual(partners_serving('400050'), set())
+        self.assertEqual(other_process.get().partners_for('560001'), {mumbai.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mumbai.status = 'inactive'
+            mumbai.save(update_fields=['status'])
+        self.assertEqual(partners_serving('560001'), set())
+
+    def test_warm_lookups_cost_one_version_read(self):
+        self.partner('Mumbai', service_areas=['4000*'])
+        service_area_index()
+        with self.assertNumQueries(1):
+            partners_serving('400001')
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class TrackingCacheTests(DeliveryTestCase):
+    def setUp(self):
+        cache.clear()
+        self.partner('Fast')
+        self.delivery = self.confirm_order()
+        self.client.force_login(self.user)
+
+    def status(self, etag=None, tracking_id=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(
+            reverse('delivery:delivery_status_api', args=[tracking_id or self.delivery.tracking_id]), **headers
+        )
+
+    def test_unchanged_payload_revalidates_with_304(self):
+        response = self.status()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['partner'], 'Fast')
+        etag = response['ETag']
+
+        response = self.status(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DeliveryUpdate.objects.create(delivery=self.delivery, status='picked_up', description='Collected')
+        response = self.status(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['updates'][-1]['description'], 'Collected')
+
+    def test_cached_entries_skip_the_database(self):
+        tracking_entry(self.delivery.tracking_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(tracking_entry(self.delivery.tracking_id)['user_id'], self.user.pk)
+
+        # Unknown ids are remembered too
+        self.assertIsNone(tracking_entry('TRKNOPE'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(tracking_entry('TRKNOPE'))
+
+        expire_tracking([self.delivery.tracking_id])
+        with self.assertNumQueries(2):  # The delivery, then its updates
+            tracking_entry(self.delivery.tracking_id)
+
+    def test_only_the_customer_and_staff_see_a_delivery(self):
+        self.assertEqual(self.status(tracking_id='TRKNOPE').status_code, 404)
+
+        self.client.force_login(User.objects.create_user(username='other', email='other@example.com', password='pass'))
+        self.assertEqual(self.status().status_code, 403)
+
+        self.client.force_login(User.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', user_type='staff'
+        ))
+        self.assertEqual(self.status().status_code, 200)
+
+
+class EtaFitTests(DeliveryTestCase):
+    NOW = datetime(2026, 6, 1, 12, tzinfo=dt_timezone.utc)
+
+    def delivered(self, partner, pincode, hours, picked_up_after=None):
+        """A delivery handed over a week ago and delivered `hours` later"""
+        delivery = self.confirm_order(pincode)
+        assigned_at = self.NOW - timedelta(days=7)
+        Delivery.objects.filter(pk=delivery.pk).update(
+            delivery_partner=partner, status='delivered', assigned_at=assigned_at,
+            picked_up_at=assigned_at + timedelta(hours=picked_up_after) if picked_up_after is not None else None,
+            delivered_at=assigned_at + timedelta(hours=hours),
+        )
+
+    def test_group_quantiles_match_numpy_per_group(self):
+        rng = np.random.default_rng(7)
+        groups = rng.integers(0, 5, size=200)
+        values = rng.gamma(2.0, 20.0, size=200)
+        counts, quantiles = group_quantiles(groups, values, (0.1, 0.5, 0.9))
+        for group in range(5):
+            in_group = values[groups == group]
+            self.assertEqual(counts[group], len(in_group))
+            np.testing.assert_allclose(quantiles[group], np.quantile(in_group, (0.1, 0.5, 0.9)))
+
+    def test_fit_keeps_groups_with_enough_samples(self):
+        fast, slow = self.partner('Fast'), self.partner('Slow')
+        for hours in range(10, 20):
+            self.delivered(fast, '400001', hours, picked_up_after=2)
+        for hours in (30, 40):
+            self.delivered(slow, '560001', hours)
+
+        rows = {
+            (row.partner_id, row.prefix): row
+            for row in fit_transit_estimates(now=self.NOW)
+        }
+        # Slow's two deliveries only count towards the overall row
+        self.assertEqual(set(rows), {(fast.pk, '400'), (None, '400'), (fast.pk, ''), (None, '')})
+        fast_mumbai = rows[fast.pk, '400']
+        self.assertEqual((fast_mumbai.sample_count, fast_mumbai.p50_hours, fast_mumbai.p90_hours), (10, 14.5, 18.1))
+        self.assertEqual((fast_mumbai.after_pickup_p50_hours, fast_mumbai.after_pickup_p90_hours), (12.5, 16.1))
+        overall = rows[None, '']
+        self.assertEqual((overall.sample_count, overall.p50_hours), (12, 15.5))
+
+        self.assertEqual(fit_transit_estimates(now=self.NOW + timedelta(days=365)), [])
+
+    def test_estimates_fall_back_from_partner_and_prefix(self):
+        start = self.NOW
+        # No fit yet: DEFAULT_DAYS for both
+        with self.captureOnCommitCallbacks(execute=True):
+            store_transit_estimates([])
+        self.assertEqual(estimate_delivery('400001', None, start), (start + timedelta(days=4),) * 2)
+
+        fast = self.partner('Fast')
+        for hours in range(10, 20):
+            self.delivered(fast, '400001', hours)
+        with self.captureOnCommitCallbacks(execute=True):
+            store_transit_estimates(fit_transit_estimates(now=self.NOW))
+        self.assertEqual(TransitTimeEstimate.objects.count(), 4)
+
+        expected = (start + timedelta(hours=14.5), start + timedelta(hours=18.1))
+        self.assertEqual(estimate_delivery('400777', fast.pk, start), expected)
+        # Unknown prefix and partner use the overall row
+        self.assertEqual(estimate_delivery('110001', None, start), expected)
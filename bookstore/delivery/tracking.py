@@ -0,0 +1,108 @@
+# delivery/tracking.py - Cached tracking payloads, pushed to open tracking pages
+import hashlib
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from .models import Delivery
+
+logger = logging.getLogger(__name__)
+
+# Short, since refresh_tracking only reaches this process's cache when the
+# cache backend is per process (LocMemCache); other workers catch up by expiry
+TRACKING_CACHE_TIMEOUT = 60
+# Unknown tracking ids are remembered briefly so repeated polls of a bad id stay off the database
+MISSING_TRACKING_TIMEOUT = 60
+MISSING = 'missing'
+
+
+def tracking_key(tracking_id):
+    return f'delivery_tracking_{tracking_id}'
+
+
+def tracking_group(tracking_id):
+    """Channel layer group joined by every open tracking page of a delivery"""
+    return f'delivery_tracking_{tracking_id}'
+
+
+def tracking_payload(delivery):
+    return {
+        'tracking_id': delivery.tracking_id,
+        'status': delivery.status,
+        'status_display': delivery.get_status_display(),
+        'estimated_delivery': delivery.estimated_delivery_time.isoformat() if delivery.estimated_delivery_time else None,
+        'actual_delivery': delivery.actual_delivery_time.isoformat() if delivery.actual_delivery_time else None,
+        'partner': delivery.delivery_partner.name if delivery.delivery_partner else None,
+        'updates': [
+            {
+                'status': update.status,
+                'status_display': update.get_status_display(),
+                'location': update.location,
+                'description': update.description,
+                'timestamp': update.timestamp.isoformat()
+            }
+            for update in delivery.updates.all()
+        ]
+    }
+
+
+def build_tracking_entry(tracking_id):
+    """
+    {'payload', 'etag', 'user_id'} for a delivery, or None if there is no
+    such delivery. user_id is the order's customer, for access checks; it
+    is not part of the payload.
+    """
+    delivery = Delivery.objects.select_related('order', 'delivery_partner').prefetch_related('updates').filter(
+        tracking_id=tracking_id
+    ).first()
+    if delivery is None:
+        cache.set(tracking_key(tracking_id), MISSING, MISSING_TRACKING_TIMEOUT)
+        return None
+
+    payload = tracking_payload(delivery)
+    entry = {
+        'payload': payload,
+        'etag': '"%s"' % hashlib.md5(json.dumps(payload, sort_keys=True).encode()).hexdigest(),
+        'user_id': delivery.order.user_id,
+    }
+    cache.set(tracking_key(tracking_id), entry, TRACKING_CACHE_TIMEOUT)
+    return entry
+
+
+def tracking_entry(tracking_id):
+    """The cached tracking entry, built on a miss; None for unknown tracking ids"""
+    entry = cache.get(tracking_key(tracking_id))
+    if entry is None:
+        return build_tracking_entry(tracking_id)
+    return None if entry == MISSING else entry
+
+
+def _group_send(tracking_id, message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(tracking_group(tracking_id), message)
+    except Exception as e:
+        # Pushing is best effort: tracking pages fall back to polling the status API
+        logger.warning(f"Could not push tracking update for {tracking_id}: {e}")
+
+
+def refresh_tracking(tracking_id):
+    """Rebuild a delivery's cached payload after a change and push it to open tracking pages"""
+    entry = build_tracking_entry(tracking_id)
+    if entry is not None:
+        _group_send(tracking_id, {'type': 'tracking.update', 'tracking': entry['payload']})
+
+
+def expire_tracking(tracking_ids):
+    """
+    Drop cached payloads after bulk writes, which send no signals. Open
+    pages are told to refetch rather than sent a rebuilt payload each.
+    """
+    tracking_ids = [tracking_id for tracking_id in tracking_ids if tracking_id]
+    cache.delete_many([tracking_key(tracking_id) for tracking_id in tracking_ids])
+    for tracking_id in tracking_ids:
+        _group_send(tracking_id, {'type': 'tracking.changed'})
@@ -26,4 +26,5 @@ urlpatterns = [
     
     # API endpoints
     path('api/status/<str:tracking_id>/', views.delivery_status_api, name='delivery_status_api'),
+    path('api/serviceability/<str:pincode>/', views.check_serviceability, name='check_serviceability'),
 ]
\ No newline at end of file
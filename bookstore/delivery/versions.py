@@ -0,0 +1,38 @@
+# delivery/versions.py - Shared versions of data each process keeps loaded in memory
+import uuid
+
+from .models import DataVersion
+
+
+def data_version(name):
+    """The current token for `name`, from the database so every process agrees; '' until it first changes"""
+    return DataVersion.objects.filter(name=name).values_list('token', flat=True).first() or ''
+
+
+def bump_data_version(name):
+    """Give `name` a new, never reused token; every process reloads on its next read"""
+    DataVersion.objects.update_or_create(name=name, defaults={'token': uuid.uuid4().hex})
+
+
+class VersionedData:
+    """
+    Data a process builds from the database and keeps, rebuilt with
+    load(version) whenever the shared version has moved on. Checking the
+    version is one indexed query, so callers in a loop should get() once.
+    """
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self._version = None
+        self._data = None
+
+    def get(self):
+        version = data_version(self.name)
+        if version != self._version:
+            self._data = self.load(version)
+            self._version = version
+        return self._data
+
+    def invalidate(self):
+        bump_data_version(self.name)
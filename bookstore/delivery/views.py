@@ -1,13 +1,21 @@
 # delivery/views.py
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.contrib import messages
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.db import transaction
 from orders.models import Order
 from .models import Delivery, DeliveryPartner, DeliveryUpdate, DeliveryLocation
+from .assignment import assign_unassigned_deliveries
+from .eta import delivery_eta, estimated_delivery_date
+from .serviceability import is_serviceable, split_service_areas
+from .tracking import tracking_entry
+from logistics.distances import pickup_point_estimates
+from logistics.models import LogisticsPartner
 from datetime import datetime, timedelta
 import json
 
@@ -23,7 +31,8 @@ def track_delivery(request, order_id):
         context = {
             'order': order,
             'delivery': delivery,
-            'updates': delivery.updates.all()
+            'updates': delivery.updates.all(),
+            'eta': delivery_eta(delivery),
         }
         return render(request, 'delivery/track_delivery.html', context)
     except Delivery.DoesNotExist:
@@ -52,6 +61,9 @@ def delivery_dashboard(request):
     active_partners = DeliveryPartner.objects.filter(status='active').count()
     total_partners = DeliveryPartner.objects.count()
     
+    # Distance from each pickup point to its nearest warehouse, priced at the cheapest logistics partner
+    pickup_points = pickup_point_estimates(LogisticsPartner.objects.filter(status='active'))
+    
     context = {
         'pending_deliveries': pending_deliveries,
         'in_transit_deliveries': in_transit_deliveries,
@@ -60,6 +72,7 @@ def delivery_dashboard(request):
         'recent_deliveries': recent_deliveries,
         'active_partners': active_partners,
         'total_partners': total_partners,
+        'pickup_points': pickup_points,
     }
     
     return render(request, 'delivery/dashboard.html', context)
@@ -228,15 +241,15 @@ def create_partner(request):
             address = request.POST.get('address')
             max_daily_deliveries = request.POST.get('max_daily_deliveries', 50)
             cost_per_delivery = request.POST.get('cost_per_delivery', 0.00)
-            service_areas = request.POST.get('service_areas', '').split(',')
-            
-            # Clean service areas
-            service_areas = [area.strip() for area in service_areas if area.strip()]
+            service_areas, invalid_areas = split_service_areas(request.POST.get('service_areas', ''))
             
             # Validate required fields
             if not all([name, contact_person, phone, email, address]):
                 messages.error(request, 'Please fill in all required fields.')
                 return render(request, 'delivery/create_partner.html')
+            if invalid_areas:
+                messages.error(request, f"Not a pincode or pincode prefix: {', '.join(invalid_areas)}")
+                return render(request, 'delivery/create_partner.html')
             
             # Create partner
             partner = DeliveryPartner.objects.create(
@@ -288,7 +301,13 @@ def edit_partner(request, partner_id):
             # Handle service areas
             service_areas_str = request.POST.get('service_areas', '')
             if service_areas_str:
-                service_areas = [area.strip() for area in service_areas_str.split(',') if area.strip()]
+                service_areas, invalid_areas = split_service_areas(service_areas_str)
+                if invalid_areas:
+                    messages.error(request, f"Not a pincode or pincode prefix: {', '.join(invalid_areas)}")
+                    return render(request, 'delivery/edit_partner.html', {
+                        'partner': partner,
+                        'service_areas_str': service_areas_str,
+                    })
                 partner.service_areas = service_areas
             
             partner.save()
@@ -350,18 +369,7 @@ def rate_delivery(request, delivery_id):
         if rating and rating.isdigit() and 1 <= int(rating) <= 5:
             delivery.customer_rating = int(rating)
             delivery.customer_feedback = feedback
-            delivery.save()
-            
-            # Update partner's average rating
-            if delivery.delivery_partner:
-                partner = delivery.delivery_partner
-                partner_deliveries = Delivery.objects.filter(
-                    delivery_partner=partner,
-                    customer_rating__isnull=False
-                )
-                avg_rating = sum(d.customer_rating for d in partner_deliveries) / partner_deliveries.count()
-                partner.rating = round(avg_rating, 2)
-                partner.save()
+            delivery.save()  # The partner's running rating is updated on save
             
             messages.success(request, 'Thank you for your feedback!')
         else:
@@ -372,73 +380,44 @@ def rate_delivery(request, delivery_id):
 # API Views for real-time updates
 @login_required
 def delivery_status_api(request, tracking_id):
-    """API endpoint to get delivery status"""
-    try:
-        delivery = Delivery.objects.select_related('order', 'delivery_partner').get(
-            tracking_id=tracking_id
-        )
-        
-        # Check if user can access this delivery
-        if not (request.user == delivery.order.user or 
-                request.user.user_type in ['staff', 'admin']):
-            return JsonResponse({'error': 'Access denied'}, status=403)
-        
-        data = {
-            'tracking_id': delivery.tracking_id,
-            'status': delivery.status,
-            'status_display': delivery.get_status_display(),
-            'estimated_delivery': delivery.estimated_delivery_time.isoformat() if delivery.estimated_delivery_time else None,
-            'actual_delivery': delivery.actual_delivery_time.isoformat() if delivery.actual_delivery_time else None,
-            'partner': delivery.delivery_partner.name if delivery.delivery_partner else None,
-            'updates': [
-                {
-                    'status': update.status,
-                    'status_display': update.get_status_display(),
-                    'location': update.location,
-                    'description': update.description,
-                    'timestamp': update.timestamp.isoformat()
-                }
-                for update in delivery.updates.all()
-            ]
-        }
-        
-        return JsonResponse(data)
-        
-    except Delivery.DoesNotExist:
+    """API endpoint to get delivery status, served from the tracking cache with ETag revalidation"""
+    entry = tracking_entry(tracking_id)
+    if entry is None:
         return JsonResponse({'error': 'Delivery not found'}, status=404)
+    
+    # Check if user can access this delivery
+    if not (request.user.pk == entry['user_id'] or
+            request.user.user_type in ['staff', 'admin']):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    if entry['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(entry['payload'])
+    response['ETag'] = entry['etag']
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def check_serviceability(request, pincode):
+    """Whether any active partner delivers to a pincode, and by when (answered from in-memory lookups)"""
+    serviceable = is_serviceable(pincode)
+    return JsonResponse({
+        'pincode': pincode,
+        'serviceable': serviceable,
+        'estimated_delivery_date': estimated_delivery_date(pincode).isoformat() if serviceable else None,
+    })
 
 @login_required
 @user_passes_test(is_staff_or_admin)
 def bulk_assign_partners(request):
     """Bulk assign partners to unassigned deliveries"""
     if request.method == 'POST':
-        unassigned_deliveries = Delivery.objects.filter(
-            delivery_partner__isnull=True,
-            status='assigned'
-        )
-        
-        assigned_count = 0
-        for delivery in unassigned_deliveries:
-            partner = DeliveryPartner.get_default_partner(
-                delivery.order.shipping_pincode
-            )
-            
-            if partner:
-                delivery.delivery_partner = partner
-                delivery.delivery_cost = float(partner.cost_per_delivery) if partner.cost_per_delivery > 0 else delivery.delivery_cost
-                delivery.save()
-                
-                # Create tracking update
-                DeliveryUpdate.objects.create(
-                    delivery=delivery,
-                    status='assigned',
-                    description=f"Auto-assigned to {partner.name}"
-                )
-                
-                assigned_count += 1
+        result = assign_unassigned_deliveries()
         
-        if assigned_count > 0:
-            messages.success(request, f'{assigned_count} deliveries assigned to partners')
+        if result.assigned > 0:
+            messages.success(request, f'{result.assigned} deliveries assigned to partners')
+            if result.unassigned:
+                messages.warning(request, f'{result.unassigned} deliveries still need a partner: all partners are at capacity')
         else:
             messages.info(request, 'No deliveries could be auto-assigned. Check partner availability.')
     
@@ -2,7 +2,7 @@
 from django.contrib import admin
 from .models import (
     LogisticsPartner, VendorPickup, PickupTracking, VendorLocation,
-    DeliverySchedule, DeliveryTracking, StockReceiptConfirmation
+    DeliverySchedule, DeliveryTracking, StockReceiptConfirmation, PickupRoute
 )
 
 
@@ -11,18 +11,18 @@ class LogisticsPartnerAdmin(admin.ModelAdmin):
     list_display = (
         "name", "contact_person", "phone", "email", 
         "vehicle_type", "vehicle_number", 
-        "status", "rating", "cost_per_km", "base_cost", 
+        "status", "rating", "rating_count", "cost_per_km", "base_cost", 
         "created_at"
     )
     list_filter = ("status", "vehicle_type", "service_areas", "created_at")
     search_fields = ("name", "contact_person", "phone", "email", "vehicle_number", "driver_license")
     ordering = ("-created_at",)
-    readonly_fields = ("created_at", "updated_at")
-    list_editable = ("status", "rating", "cost_per_km", "base_cost")
+    readonly_fields = ("rating", "rating_count", "created_at", "updated_at")
+    list_editable = ("status", "cost_per_km", "base_cost")
 
     fieldsets = (
         ("Basic Info", {
-            "fields": ("name", "contact_person", "phone", "email", "status", "rating")
+            "fields": ("name", "contact_person", "phone", "email", "status", "rating", "rating_count")
         }),
         ("Vehicle Details", {
             "fields": ("vehicle_type", "vehicle_number", "driver_license")
@@ -212,4 +212,10 @@ class VendorLocationAdmin(admin.ModelAdmin):
         ('Status & Coordinates', {
             'fields': ('is_primary', 'is_active', 'latitude', 'longitude')
         })
-    )
\ No newline at end of file
+    )
+
+@admin.register(PickupRoute)
+class PickupRouteAdmin(admin.ModelAdmin):
+    list_display = ['route_date', 'partner', 'trip', 'stop_count', 'total_units', 'total_distance', 'estimated_cost']
+    list_filter = ['route_date', 'partner']
+    date_hierarchy = 'route_date'
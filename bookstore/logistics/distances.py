@@ -0,0 +1,244 @@
+# logistics/distances.py - Cached road distance matrix between all known locations
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from delivery.models import DeliveryLocation
+from delivery.versions import VersionedData
+from .models import VendorLocation
+from .routing import haversine_matrix, routing_settings
+
+DISTANCE_MATRIX_CACHE_KEY = 'logistics_distance_matrix'
+# Arrays are cached per version and useless once it moves on
+DISTANCE_MATRIX_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Location kinds, stored as small integer codes next to the primary keys
+DEPOT = 0
+VENDOR_LOCATION = 1
+DELIVERY_LOCATION = 2
+
+class DistanceMatrix:
+    """
+    Road distances in km (great-circle distance times ROAD_FACTOR) between
+    the warehouse depot, every vendor location and every delivery location
+    with coordinates. Rows are looked up by (kind, pk); all lookups take
+    and return arrays so callers never loop over pairs.
+    """
+
+    def __init__(self, kinds, ids, distances):
+        self.kinds = kinds
+        self.ids = ids
+        self.distances = distances  # float32, (n x n)
+        self._positions = {
+            (int(kind), int(pk)): position
+            for position, (kind, pk) in enumerate(zip(kinds.tolist(), ids.tolist()))
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, kind, pks):
+        """Matrix rows for the given primary keys, -1 where a location has no coordinates"""
+        return np.array([self._positions.get((kind, pk), -1) for pk in pks], dtype=np.int64)
+
+    def pairwise(self, origins, destinations):
+        """Distances between two equally long arrays of rows; NaN where either is unknown"""
+        origins = np.asarray(origins, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        result = self.distances[origins, destinations].astype(np.float64)
+        result[(origins < 0) | (destinations < 0)] = np.nan
+        return result
+
+    def from_depot(self, kind, pks):
+        """Depot -> location distance for each pk, NaN for locations without coordinates"""
+        positions = self.positions(kind, pks)
+        return self.pairwise(np.zeros_like(positions), positions)
+
+    def nearest(self, origins, candidates):
+        """(row of the closest candidate, distance) for every origin row"""
+        block = self.distances[np.ix_(origins, candidates)]
+        closest = block.argmin(axis=1)
+        return np.asarray(candidates)[closest], block[np.arange(len(origins)), closest].astype(np.float64)
+
+    def payload(self):
+        return {'kinds': self.kinds, 'ids': self.ids, 'distances': self.distances}
+
+
+def build_distance_matrix(config=None):
+    """All coordinates in two queries, every pairwise distance in one NumPy pass"""
+    config = config or routing_settings()
+    vendor_points = list(
+        VendorLocation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('pk', 'latitude', 'longitude')
+    )
+    delivery_points = list(
+        DeliveryLocation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('pk', 'latitude', 'longitude')
+    )
+
+    kinds = np.array(
+        [DEPOT] + [VENDOR_LOCATION] * len(vendor_points) + [DELIVERY_LOCATION] * len(delivery_points),
+        dtype=np.int8
+    )
+    points = [(0, config['DEPOT_LATITUDE'], config['DEPOT_LONGITUDE'])] + vendor_points + delivery_points
+    ids = np.array([pk for pk, latitude, longitude in points], dtype=np.int64)
+    latitudes = np.array([float(latitude) for pk, latitude, longitude in points])
+    longitudes = np.array([float(longitude) for pk, latitude, longitude in points])
+
+    distances = (haversine_matrix(latitudes, longitudes) * config['ROAD_FACTOR']).astype(np.float32)
+    return DistanceMatrix(kinds, ids, distances)
+
+
+def _load_distance_matrix(version):
+    """The shared cached arrays for a version, else rebuilt and cached"""
+    key = f'{DISTANCE_MATRIX_CACHE_KEY}:{version}'
+    payload = cache.get(key)
+    if payload is not None:
+        return DistanceMatrix(**payload)
+    matrix = build_distance_matrix()
+    cache.set(key, matrix.payload(), DISTANCE_MATRIX_CACHE_TIMEOUT)
+    return matrix
+
+
+_distance_matrix = VersionedData('logistics_distance_matrix', _load_distance_matrix)
+
+
+def invalidate_distance_matrix():
+    _distance_matrix.invalidate()
+
+
+def distance_matrix():
+    """
+    The current distance matrix: this process's copy while the version is
+    unchanged, else the shared cached arrays, else rebuilt and cached.
+    """
+    return _distance_matrix.get()
+
+
+def transport_costs(distances, partners):
+    """
+    base_cost + cost_per_km * km for every distance and partner, as a
+    (len(distances) x len(partners)) array; NaN distances give NaN costs.
+    """
+    base = np.array([float(partner.base_cost) for partner in partners])
+    per_km = np.array([float(partner.cost_per_km) for partner in partners])
+    return base[None, :] + np.asarray(distances, dtype=np.float64)[:, None] * per_km[None, :]
+
+
+def assigned_costs(distances, assigned_partners):
+    """Cost of each distance with the partner at the same position (None for unassigned) -> NaN"""
+    partners = list({partner.pk: partner for partner in assigned_partners if partner is not None}.values())
+    costs = np.full(len(distances), np.nan)
+    if partners:
+        column = {partner.pk: i for i, partner in enumerate(partners)}
+        assigned = np.array([column[partner.pk] if partner is not None else -1 for partner in assigned_partners])
+        rows = np.flatnonzero(assigned >= 0)
+        costs[rows] = transport_costs(distances[rows], partners)[np.arange(len(rows)), assigned[rows]]
+    return costs
+
+
+def _round(values, places='0.01'):
+    """Decimals for templates, None where the estimate is unknown"""
+    return [None if np.isnan(value) else Decimal(str(float(value))).quantize(Decimal(places)) for value in values]
+
+
+def annotate_delivery_estimates(deliveries):
+    """
+    Set distance_estimate (depot -> vendor location, km) and cost_estimate
+    (for the assigned partner) on a page of DeliverySchedules.
+    """
+    deliveries = list(deliveries)
+    if not deliveries:
+        return deliveries
+    distances = distance_matrix().from_depot(VENDOR_LOCATION, [d.vendor_location_id for d in deliveries])
+    costs = assigned_costs(distances, [d.assigned_partner for d in deliveries])
+
+    for delivery, distance, cost in zip(deliveries, _round(distances), _round(costs)):
+        delivery.distance_estimate = distance
+        delivery.cost_estimate = cost
+    return deliveries
+
+
+def annotate_partner_estimates(partners, vendor_location_id):
+    """Set cost_estimate on each partner for a pickup at one vendor location; returns the distance"""
+    partners = list(partners)
+    distance = distance_matrix().from_depot(VENDOR_LOCATION, [vendor_location_id])
+    costs = transport_costs(distance, partners)[0] if partners else []
+    for partner, cost in zip(partners, _round(costs)):
+        partner.cost_estimate = cost
+    return _round(distance)[0], partners
+
+
+def annotate_pickup_estimates(pickups):
+    """
+    Set distance_estimate and cost_estimate on VendorPickups from the
+    vendor's primary (else first active) location, for pickups whose
+    distance or cost was never entered.
+    """
+    pickups = list(pickups)
+    if not pickups:
+        return pickups
+    locations = {}
+    for vendor_id, location_id in (
+        VendorLocation.objects.filter(vendor_id__in={p.vendor_id for p in pickups}, is_active=True)
+        .order_by('-is_primary', 'pk').values_list('vendor_id', 'pk')
+    ):
+        locations.setdefault(vendor_id, location_id)
+
+    distances = distance_matrix().from_depot(VENDOR_LOCATION, [locations.get(p.vendor_id) for p in pickups])
+    costs = assigned_costs(distances, [p.logistics_partner for p in pickups])
+
+    for pickup, distance, cost in zip(pickups, _round(distances), _round(costs)):
+        pickup.distance_estimate = distance
+        pickup.cost_estimate = cost
+    return pickups
+
+
+def pickup_point_estimates(partners):
+    """
+    For every delivery pickup point: the nearest warehouse location, the
+    distance to it and the cheapest transfer cost among the partners.
+    Warehouses fall back to the depot when none have coordinates.
+    """
+    matrix = distance_matrix()
+    points = list(
+        DeliveryLocation.objects.filter(is_pickup_point=True, latitude__isnull=False, longitude__isnull=False)
+        .order_by('city', 'name')
+    )
+    if not points:
+        return []
+    warehouses = {
+        location.pk: location
+        for location in DeliveryLocation.objects.filter(
+            is_warehouse=True, latitude__isnull=False, longitude__isnull=False
+        )
+    }
+
+    origins = matrix.positions(DELIVERY_LOCATION, [point.pk for point in points])
+    known = origins >= 0  # Added since the matrix was built in another process
+    candidates = matrix.positions(DELIVERY_LOCATION, list(warehouses))
+    candidates = candidates[candidates >= 0]
+    if not len(candidates):
+        candidates = np.array([0])
+
+    nearest_rows = np.full(len(points), -1)
+    distances = np.full(len(points), np.nan)
+    if known.any():
+        nearest_rows[known], distances[known] = matrix.nearest(origins[known], candidates)
+    cheapest = np.full(len(points), np.nan)
+    partners = list(partners)
+    if partners:
+        cheapest = transport_costs(distances, partners).min(axis=1)
+
+    rows = []
+    for point, row, distance, cost in zip(points, nearest_rows.tolist(), _round(distances), _round(cheapest)):
+        warehouse = None
+        if row > 0:
+            warehouse = warehouses.get(int(matrix.ids[row]))
+        rows.append({
+            'location': point,
+            'warehouse': warehouse,
+            'distance': distance,
+            'cost': cost,
+        })
+    return rows
@@ -0,0 +1,84 @@
+# logistics/management/commands/benchmark_pickup_routing.py
+
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from logistics.routing import Vehicle, haversine_matrix, route_length, routing_settings, solve_routes
+
+class Command(BaseCommand):
+    help = 'Time the pickup route solver on random stops around the warehouse (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stops',
+            type=int,
+            default=1000,
+            help='Number of pickup stops (default: 1000)'
+        )
+        parser.add_argument(
+            '--vehicles',
+            type=int,
+            default=200,
+            help='Number of partner trips available (default: 200)'
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=25.0,
+            help='Spread of the stops around the warehouse in km (default: 25)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+        )
+
+    def handle(self, *args, **options):
+        config = routing_settings()
+        rng = np.random.default_rng(options['seed'])
+        stops = options['stops']
+
+        # Uniform points in a disc around the depot (1 degree of latitude ~ 111 km)
+        distance = options['radius'] * np.sqrt(rng.random(stops)) / 111.0
+        angle = rng.random(stops) * 2 * np.pi
+        latitudes = config['DEPOT_LATITUDE'] + distance * np.sin(angle)
+        longitudes = config['DEPOT_LONGITUDE'] + distance * np.cos(angle) / np.cos(np.radians(config['DEPOT_LATITUDE']))
+        loads = rng.integers(5, 60, size=stops)
+
+        capacities = list(config['VEHICLE_CAPACITY'].values())
+        vehicles = [
+            Vehicle(capacities[i % len(capacities)], cost_per_km=8 + i % 5, base_cost=200)
+            for i in range(options['vehicles'])
+        ]
+
+        started = time.perf_counter()
+        distances = haversine_matrix(
+            np.concatenate(([config['DEPOT_LATITUDE']], latitudes)),
+            np.concatenate(([config['DEPOT_LONGITUDE']], longitudes)),
+        ) * config['ROAD_FACTOR']
+        matrix_time = time.perf_counter() - started
+
+        limits = {
+            'speed_kmph': config['AVERAGE_SPEED_KMPH'],
+            'stop_hours': config['STOP_MINUTES'] / 60,
+            'max_hours': config['MAX_TRIP_HOURS'],
+        }
+
+        started = time.perf_counter()
+        greedy, _ = solve_routes(distances, loads, vehicles, improve=False, **limits)
+        greedy_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        routes, unassigned = solve_routes(distances, loads, vehicles, **limits)
+        solve_time = time.perf_counter() - started
+
+        greedy_km = sum(route_length(np.asarray(route) + 1, distances) for vehicle, route in greedy)
+        total_km = sum(route_length(np.asarray(route) + 1, distances) for vehicle, route in routes)
+
+        self.stdout.write(f'Stops: {stops}, vehicles: {len(vehicles)}, routes used: {len(routes)}, unassigned: {len(unassigned)}')
+        self.stdout.write(f'Distance matrix: {matrix_time * 1000:.1f} ms')
+        self.stdout.write(f'Nearest neighbour: {greedy_time * 1000:.1f} ms, {greedy_km:.1f} km')
+        self.stdout.write(self.style.SUCCESS(
+            f'Nearest neighbour + 2-opt: {solve_time * 1000:.1f} ms, {total_km:.1f} km '
+            f'({(1 - total_km / greedy_km) * 100 if greedy_km else 0:.1f}% shorter)'
+        ))
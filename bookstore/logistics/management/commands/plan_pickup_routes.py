@@ -0,0 +1,46 @@
+# logistics/management/commands/plan_pickup_routes.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from logistics.routing import plan_pickup_routes
+
+class Command(BaseCommand):
+    help = "Assign a day's scheduled vendor pickups to logistics partners as capacity-aware routes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Day to plan, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the plan without assigning anything'
+        )
+
+    def handle(self, *args, **options):
+        route_date = timezone.localdate()
+        if options['date']:
+            try:
+                route_date = parse_date(options['date'])
+            except ValueError:  # Well formed but impossible, e.g. 2024-02-30
+                route_date = None
+            if route_date is None:
+                raise CommandError('Use --date YYYY-MM-DD')
+
+        plan = plan_pickup_routes(route_date, dry_run=options['dry_run'])
+
+        for route, stops in plan.routes:
+            self.stdout.write(
+                f'  {route.partner.name} trip {route.trip}: {route.stop_count} stops, {route.total_units} books, '
+                f'{route.total_distance} km, ₹{route.estimated_cost}'
+            )
+        for delivery, reason in plan.unassigned[:20]:
+            self.stdout.write(self.style.WARNING(f'  Delivery #{delivery.pk} not routed: {reason}'))
+
+        verb = 'Would plan' if options['dry_run'] else 'Planned'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(plan.routes)} routes for {plan.routed_count} pickups on {route_date}: '
+            f'{plan.total_distance} km, ₹{plan.total_cost}; {len(plan.unassigned)} not routed'
+        ))
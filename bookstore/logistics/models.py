@@ -1,12 +1,13 @@
 # logistics/models.py
 from django.db import models
 from django.contrib.auth import get_user_model
+from reviews.ratings import RatedModel
 from vendors.models import VendorProfile, StockOffer
 from warehouse.models import Stock
 
 User = get_user_model()
 
-class LogisticsPartner(models.Model):
+class LogisticsPartner(RatedModel):
     PARTNER_STATUS = (
         ('active', 'Active'),
         ('inactive', 'Inactive'),
@@ -31,6 +32,7 @@ class LogisticsPartner(models.Model):
     
     service_areas = models.JSONField(default=list, help_text="List of cities/areas they serve")
     status = models.CharField(max_length=20, choices=PARTNER_STATUS, default='active')
+    # Average condition rating of the stock it delivered; maintained from StockReceiptConfirmation
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     
     cost_per_km = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
@@ -118,6 +120,26 @@ class VendorLocation(models.Model):
 
 # logistics/models.py - Enhanced tracking
 
+class PickupRoute(models.Model):
+    """One trip of a logistics partner collecting scheduled deliveries, planned by logistics.routing"""
+    partner = models.ForeignKey(LogisticsPartner, on_delete=models.CASCADE, related_name='routes')
+    route_date = models.DateField()
+    trip = models.PositiveSmallIntegerField(default=1, help_text="Trip number of the partner on this day")
+    
+    stop_count = models.PositiveIntegerField(default=0)
+    total_units = models.PositiveIntegerField(default=0)
+    total_distance = models.DecimalField(max_digits=8, decimal_places=2, default=0.00, help_text="Distance in KM, back to the warehouse")
+    estimated_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['route_date', 'partner', 'trip']
+        unique_together = ['partner', 'route_date', 'trip']
+    
+    def __str__(self):
+        return f"{self.partner.name} - {self.route_date} trip {self.trip} ({self.stop_count} stops)"
+
 class DeliverySchedule(models.Model):
     DELIVERY_STATUS = (
         ('scheduled', 'Scheduled by Vendor'),
@@ -142,6 +164,9 @@ class DeliverySchedule(models.Model):
     
     # Logistics details
     assigned_partner = models.ForeignKey(LogisticsPartner, on_delete=models.SET_NULL, null=True)
+    pickup_route = models.ForeignKey(PickupRoute, on_delete=models.SET_NULL, null=True, blank=True, related_name='stops')
+    route_sequence = models.PositiveIntegerField(null=True, blank=True, help_text="Stop number on the pickup route")
+    estimated_distance = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, help_text="KM from the previous stop")
     estimated_pickup_time = models.DateTimeField(null=True, blank=True)
     actual_pickup_time = models.DateTimeField(null=True, blank=True)
     estimated_delivery_time = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,450 @@
+# logistics/routing.py - Capacity-aware pickup route planning for DeliverySchedule
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import LogisticsPartner, DeliverySchedule, DeliveryTracking, PickupRoute
+from .summaries import invalidate_logistics_summary
+
+EARTH_RADIUS_KM = 6371.0088
+TWO_OPT_MAX_PASSES = 50
+
+ROUTING_DEFAULTS = {
+    'DEPOT_LATITUDE': 19.0760,
+    'DEPOT_LONGITUDE': 72.8777,
+    'ROAD_FACTOR': 1.3,
+    'VEHICLE_CAPACITY': {'bike': 20, 'car': 100, 'van': 400, 'truck': 2000},
+    'TRIPS_PER_PARTNER': 2,
+    'MAX_TRIP_HOURS': 5,
+    'AVERAGE_SPEED_KMPH': 25,
+    'STOP_MINUTES': 15,
+    'DAY_START_HOUR': 9,
+}
+
+# Deliveries not yet collected can still be (re)planned
+PLANNABLE_STATUSES = ['scheduled', 'confirmed', 'pickup_assigned']
+
+
+def routing_settings():
+    return {**ROUTING_DEFAULTS, **getattr(settings, 'PICKUP_ROUTING', {})}
+
+
+def haversine_matrix(latitudes, longitudes):
+    """
+    Great-circle distances in km between every pair of points, as an (n x n)
+    array. The cosines of all angles come from one matrix product of unit
+    vectors, then sin(angle / 2) = sqrt((1 - cos) / 2) is worked in place,
+    so only a single n x n buffer is ever allocated.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    points = np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+    distances = points @ points.T
+    np.subtract(1.0, distances, out=distances)
+    np.clip(distances, 0.0, 2.0, out=distances)
+    np.multiply(distances, 0.5, out=distances)
+    np.sqrt(distances, out=distances)
+    np.arcsin(distances, out=distances)
+    distances *= 2 * EARTH_RADIUS_KM
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+class Vehicle:
+    """One trip a partner can make: capacity in books, costs, and the stops it may serve"""
+
+    def __init__(self, capacity, cost_per_km=0.0, base_cost=0.0, partner=None, trip=1, eligible=None):
+        self.capacity = capacity
+        self.cost_per_km = float(cost_per_km)
+        self.base_cost = float(base_cost)
+        self.partner = partner
+        self.trip = trip
+        self.eligible = eligible  # boolean mask over stops, None for all
+
+
+def route_length(route, distances):
+    """Length of depot -> stops -> depot, with stops as matrix indices (depot is 0)"""
+    path = np.concatenate(([0], route, [0]))
+    return float(distances[path[:-1], path[1:]].sum())
+
+
+def nearest_neighbour_route(distances, loads, capacity, available, travel_hours=None, stop_hours=0.0, max_hours=None):
+    """
+    Greedy route from the depot: always drive to the closest available
+    stop that still fits in the vehicle and, with max_hours, still leaves
+    time to get back to the depot. Marks the chosen stops as taken in
+    `available` and returns them as matrix indices.
+    """
+    route = []
+    current = 0
+    remaining = capacity
+    elapsed = 0.0
+    while True:
+        # loads/available cover stops only; matrix row 0 is the depot
+        candidates = available & (loads <= remaining)
+        if max_hours is not None:
+            finish = elapsed + travel_hours[current, 1:] + stop_hours + travel_hours[1:, 0]
+            candidates &= finish <= max_hours
+        if not candidates.any():
+            return route
+        next_stop = int(np.argmin(np.where(candidates, distances[current, 1:], np.inf)))
+        available[next_stop] = False
+        remaining -= loads[next_stop]
+        if max_hours is not None:
+            elapsed += travel_hours[current, next_stop + 1] + stop_hours
+        current = next_stop + 1
+        route.append(current)
+
+
+def two_opt(route, distances, max_passes=TWO_OPT_MAX_PASSES):
+    """
+    Improve a route by reversing segments while that shortens it. For each
+    segment start the gain of every possible segment end is computed at
+    once with NumPy, and the best one is applied.
+    """
+    path = np.concatenate(([0], route, [0]))
+    last = len(path) - 2
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, last):
+            ends = np.arange(i + 1, last + 1)
+            gain = (
+                distances[path[i - 1], path[i]] + distances[path[ends], path[ends + 1]]
+                - distances[path[i - 1], path[ends]] - distances[path[i], path[ends + 1]]
+            )
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                j = ends[best]
+                path[i:j + 1] = path[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return path[1:-1].tolist()
+
+
+def solve_routes(distances, loads, vehicles, improve=True, speed_kmph=None, stop_hours=0.0, max_hours=None):
+    """
+    Capacity-aware vehicle routing heuristic.
+
+    `distances` is the (n + 1) x (n + 1) km matrix with the depot at index
+    0, `loads` the books to collect at each of the n stops. Vehicles are
+    filled in the order given with nearest-neighbour routes, limited to
+    max_hours per trip when a speed is given, then each route is shortened
+    with 2-opt (which never adds time). Returns ([(vehicle, stop indices)],
+    unassigned stop indices), stop indices counting from 0.
+    """
+    loads = np.asarray(loads, dtype=np.int64)
+    travel_hours = distances / speed_kmph if speed_kmph else None
+    max_hours = max_hours if travel_hours is not None else None
+    available = np.ones(len(loads), dtype=bool)
+    routes = []
+    for vehicle in vehicles:
+        if not available.any():
+            break
+        allowed = available.copy() if vehicle.eligible is None else available & vehicle.eligible
+        route = nearest_neighbour_route(
+            distances, loads, vehicle.capacity, allowed, travel_hours, stop_hours, max_hours,
+        )
+        if not route:
+            continue
+        available[np.asarray(route) - 1] = False
+        if improve and len(route) > 2:
+            route = two_opt(route, distances)
+        routes.append((vehicle, [stop - 1 for stop in route]))
+    return routes, np.flatnonzero(available).tolist()
+
+
+def _serves(partner, cities):
+    areas = {str(area).strip().lower() for area in partner.service_areas or [] if str(area).strip()}
+    if not areas:
+        return None
+    return np.array([city in areas for city in cities], dtype=bool)
+
+
+def partner_vehicles(partners, cities, config, busy_trips=()):
+    """
+    Vehicles for active partners, cheapest per km first, with trips per
+    partner from settings; (partner id, trip) pairs in busy_trips are
+    already on the road and skipped.
+    """
+    capacities = config['VEHICLE_CAPACITY']
+    partners = sorted(partners, key=lambda p: (p.cost_per_km, -capacities.get(p.vehicle_type, 0), p.pk))
+    vehicles = []
+    for trip in range(1, config['TRIPS_PER_PARTNER'] + 1):
+        for partner in partners:
+            capacity = capacities.get(partner.vehicle_type, 0)
+            if capacity and (partner.pk, trip) not in busy_trips:
+                vehicles.append(Vehicle(
+                    capacity, partner.cost_per_km, partner.base_cost,
+                    partner=partner, trip=trip, eligible=_serves(partner, cities),
+                ))
+    return vehicles
+
+
+def started_routes(route_date):
+    """The day's routes with a stop already collected; they are never replanned"""
+    collected = DeliverySchedule.objects.filter(pickup_route=OuterRef('pk')).exclude(status__in=PLANNABLE_STATUSES)
+    return PickupRoute.objects.filter(Exists(collected), route_date=route_date)
+
+
+def plannable_deliveries(route_date):
+    """
+    The day's deliveries that are not collected yet. Deliveries a partner
+    was assigned to by hand (no pickup route) and the rest of a route that
+    has started are left alone.
+    """
+    return DeliverySchedule.objects.filter(
+        scheduled_delivery_date__date=route_date,
+        status__in=PLANNABLE_STATUSES,
+    ).exclude(
+        assigned_partner__isnull=False, pickup_route__isnull=True,
+    ).exclude(
+        pickup_route__in=started_routes(route_date),
+    ).select_related('vendor_location', 'stock_offer__book', 'assigned_partner')
+
+
+class RoutePlan:
+    def __init__(self, route_date):
+        self.route_date = route_date
+        self.routes = []        # PickupRoute, with the routed deliveries in order
+        self.unassigned = []    # (delivery, reason)
+
+    @property
+    def total_distance(self):
+        return sum((route.total_distance for route, stops in self.routes), Decimal('0'))
+
+    @property
+    def total_cost(self):
+        return sum((route.estimated_cost for route, stops in self.routes), Decimal('0'))
+
+    @property
+    def routed_count(self):
+        return sum(len(stops) for route, stops in self.routes)
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def build_route_plan(route_date, config=None, lock=False):
+    """
+    Plan the day's pickups without writing anything. With lock, inside a
+    transaction, the active partners and then the plannable deliveries are
+    locked first, so concurrent planners queue up and nothing collects a
+    stop until the plan is applied.
+    """
+    config = config or routing_settings()
+    plan = RoutePlan(route_date)
+
+    partners = LogisticsPartner.objects.filter(status='active')
+    candidates = plannable_deliveries(route_date)
+    if lock:
+        partners = list(partners.select_for_update().order_by('pk'))
+        candidates = candidates.select_for_update(of=('self',)).order_by('pk')
+
+    deliveries = []
+    for delivery in candidates:
+        location = delivery.vendor_location
+        if location.latitude is None or location.longitude is None:
+            plan.unassigned.append((delivery, 'Vendor location has no coordinates'))
+        else:
+            deliveries.append(delivery)
+    if not deliveries:
+        return plan
+
+    latitudes = [config['DEPOT_LATITUDE']] + [float(d.vendor_location.latitude) for d in deliveries]
+    longitudes = [config['DEPOT_LONGITUDE']] + [float(d.vendor_location.longitude) for d in deliveries]
+    distances = haversine_matrix(latitudes, longitudes) * config['ROAD_FACTOR']
+    loads = [delivery.stock_offer.quantity for delivery in deliveries]
+    cities = [delivery.vendor_location.city.strip().lower() for delivery in deliveries]
+
+    busy_trips = set(started_routes(route_date).values_list('partner_id', 'trip'))
+    vehicles = partner_vehicles(partners, cities, config, busy_trips)
+    routes, unassigned = solve_routes(
+        distances, loads, vehicles,
+        speed_kmph=config['AVERAGE_SPEED_KMPH'],
+        stop_hours=config['STOP_MINUTES'] / 60,
+        max_hours=config['MAX_TRIP_HOURS'],
+    )
+
+    speed = config['AVERAGE_SPEED_KMPH']
+    stop_time = timedelta(minutes=config['STOP_MINUTES'])
+    day_start = timezone.make_aware(datetime.combine(route_date, time(config['DAY_START_HOUR'])))
+    partner_free_at = {}
+
+    for vehicle, stops in sorted(routes, key=lambda route: (route[0].trip, route[0].partner.pk)):
+        partner = vehicle.partner
+        clock = partner_free_at.get(partner.pk, day_start)
+        previous = 0
+        routed = []
+        for sequence, stop in enumerate(stops, start=1):
+            leg = float(distances[previous, stop + 1])
+            clock += timedelta(hours=leg / speed)
+            delivery = deliveries[stop]
+            delivery.route_sequence = sequence
+            delivery.estimated_distance = _money(leg)
+            delivery.estimated_pickup_time = clock
+            routed.append(delivery)
+            clock += stop_time
+            previous = stop + 1
+        clock += timedelta(hours=float(distances[previous, 0]) / speed)
+        partner_free_at[partner.pk] = clock
+
+        distance = route_length([stop + 1 for stop in stops], distances)
+        plan.routes.append((PickupRoute(
+            partner=partner,
+            route_date=route_date,
+            trip=vehicle.trip,
+            stop_count=len(stops),
+            total_units=sum(loads[stop] for stop in stops),
+            total_distance=_money(distance),
+            estimated_cost=_money(vehicle.base_cost + vehicle.cost_per_km * distance),
+        ), routed))
+
+    for stop in unassigned:
+        plan.unassigned.append((deliveries[stop], 'No partner capacity left for this stop'))
+    return plan
+
+
+def _drop_stale_stops(plan):
+    """
+    Lock the plan's deliveries and take out those that can no longer be
+    planned, e.g. collected since the plan was built. Their routes are
+    recounted and routes left without stops are dropped.
+    """
+    stop_ids = [delivery.pk for route, stops in plan.routes for delivery in stops]
+    current = set(
+        plannable_deliveries(plan.route_date).select_for_update(of=('self',))
+        .filter(pk__in=stop_ids).values_list('pk', flat=True)
+    )
+    routes = []
+    for route, stops in plan.routes:
+        fresh = [delivery for delivery in stops if delivery.pk in current]
+        for delivery in stops:
+            if delivery.pk not in current:
+                plan.unassigned.append((delivery, 'Collected or reassigned while the plan was being made'))
+        if len(fresh) < len(stops):
+            route.stop_count = len(fresh)
+            route.total_units = sum(delivery.stock_offer.quantity for delivery in fresh)
+        if fresh:
+            routes.append((route, fresh))
+    plan.routes = routes
+
+
+@transaction.atomic
+def apply_route_plan(plan, user=None):
+    """
+    Replace the day's planned routes with the plan: routes are inserted
+    with bulk_create and the deliveries updated with bulk_update, with a
+    tracking entry and vendor notification for each new assignment and
+    for each stop of the previous plan that this one drops. Stops that
+    were collected since the plan was built are left alone and reported
+    as unassigned.
+    """
+    from vendors.models import OfferStatusNotification
+    from vendors.summaries import recount_unread_notifications, invalidate_vendor_summary
+    from vendors.notification_push import push_unread_count
+
+    _drop_stale_stops(plan)
+    planned = {delivery.pk for route, stops in plan.routes for delivery in stops}
+
+    # Drop the day's previous plan; stops it had that the new plan leaves
+    # out go back to waiting for a partner
+    previous_routes = PickupRoute.objects.filter(route_date=plan.route_date).exclude(
+        pk__in=started_routes(plan.route_date).values('pk')
+    )
+    dropped = list(
+        DeliverySchedule.objects.select_for_update(of=('self',)).filter(pickup_route__in=previous_routes)
+        .exclude(pk__in=planned).select_related('assigned_partner', 'stock_offer')
+    )
+    DeliverySchedule.objects.filter(pickup_route__in=previous_routes).update(
+        assigned_partner=None, pickup_route=None, route_sequence=None,
+        estimated_distance=None, status='scheduled', updated_at=timezone.now(),
+    )
+    previous_routes.delete()
+
+    routes = PickupRoute.objects.bulk_create([route for route, stops in plan.routes])
+
+    now = timezone.now()
+    tracked_by = {'updated_by': user} if user is not None else {}  # else the field's default
+    updated = []
+    tracking = []
+    notifications = []
+    for delivery in dropped:
+        partner = delivery.assigned_partner
+        tracking.append(DeliveryTracking(
+            delivery=delivery,
+            status='scheduled',
+            notes=f"Removed from {partner.name}'s route by route planning, waiting for a logistics partner",
+            **tracked_by,
+        ))
+        notifications.append(OfferStatusNotification(
+            stock_offer=delivery.stock_offer,
+            status='scheduled',
+            message=f"The pickup by {partner.name} planned for {plan.route_date:%b %d} has been cancelled. "
+                    f"We will let you know when a new pickup is arranged.",
+        ))
+    for route, stops in zip(routes, [stops for _, stops in plan.routes]):
+        for delivery in stops:
+            previous_partner = delivery.assigned_partner
+            delivery.pickup_route = route
+            delivery.assigned_partner = route.partner
+            delivery.status = 'pickup_assigned'
+            delivery.updated_at = now
+            updated.append(delivery)
+            if previous_partner == route.partner:
+                continue
+            tracking.append(DeliveryTracking(
+                delivery=delivery,
+                status='pickup_assigned',
+                notes=f"Logistics partner assigned by route planning: {route.partner.name} (stop {delivery.route_sequence})",
+                **tracked_by,
+            ))
+            notifications.append(OfferStatusNotification(
+                stock_offer=delivery.stock_offer,
+                status='pickup_assigned',
+                message=f"Logistics partner {route.partner.name} will collect your delivery on "
+                        f"{timezone.localtime(delivery.estimated_pickup_time):%b %d} at around "
+                        f"{timezone.localtime(delivery.estimated_pickup_time):%H:%M}.",
+            ))
+
+    DeliverySchedule.objects.bulk_update(
+        updated,
+        ['pickup_route', 'assigned_partner', 'status', 'route_sequence', 'estimated_distance',
+         'estimated_pickup_time', 'updated_at'],
+        batch_size=500,
+    )
+    DeliveryTracking.objects.bulk_create(tracking, batch_size=500)
+    OfferStatusNotification.objects.bulk_create(notifications, batch_size=500)
+
+    # bulk writes send no signals: refresh the vendors' counters ourselves
+    notified = {notification.stock_offer.vendor_id for notification in notifications}
+    if notified:
+        recount_unread_notifications(notified)
+    changed = (
+        {delivery.vendor_id for delivery in updated + dropped}
+        | {delivery.vendor_id for delivery, reason in plan.unassigned}
+    )
+
+    def after_commit():
+        invalidate_logistics_summary()
+        for vendor_id in changed:
+            invalidate_vendor_summary(vendor_id)
+        for vendor_id in notified:
+            push_unread_count(vendor_id)
+
+    transaction.on_commit(after_commit)
+    return routes
+
+
+def plan_pickup_routes(route_date, user=None, dry_run=False):
+    if dry_run:
+        return build_route_plan(route_date)
+    with transaction.atomic():
+        plan = build_route_plan(route_date, lock=True)
+        apply_route_plan(plan, user)
+    return plan
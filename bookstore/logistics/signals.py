@@ -0,0 +1,68 @@
+from django.db.models.signals import pre_save, post_init, post_save, post_delete
+from django.dispatch import receiver
+from delivery.models import DeliveryLocation
+from reviews.ratings import move_rating
+from vendors.models import VendorProfile
+from .models import VendorLocation, LogisticsPartner, StockReceiptConfirmation, VendorPickup, DeliverySchedule
+from .distances import invalidate_distance_matrix
+from .summaries import invalidate_logistics_summary
+
+@receiver(pre_save, sender=VendorLocation)
+@receiver(pre_save, sender=DeliveryLocation)
+def note_coordinate_change(sender, instance, update_fields=None, **kwargs):
+    """Only new coordinates move a location in the distance matrix"""
+    if update_fields is not None and not {'latitude', 'longitude'}.intersection(update_fields):
+        instance._coordinates_changed = False
+        return
+    if instance.pk is None:
+        instance._coordinates_changed = instance.latitude is not None and instance.longitude is not None
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('latitude', 'longitude').first()
+    instance._coordinates_changed = previous != (instance.latitude, instance.longitude)
+
+@receiver(post_save, sender=VendorLocation)
+@receiver(post_save, sender=DeliveryLocation)
+def invalidate_distances_on_location_change(sender, instance, **kwargs):
+    if getattr(instance, '_coordinates_changed', True):
+        invalidate_distance_matrix()
+
+@receiver(post_delete, sender=VendorLocation)
+@receiver(post_delete, sender=DeliveryLocation)
+def invalidate_distances_on_location_delete(sender, instance, **kwargs):
+    if instance.latitude is not None and instance.longitude is not None:
+        invalidate_distance_matrix()
+
+@receiver(post_init, sender=StockReceiptConfirmation)
+def remember_condition_rating(sender, instance, **kwargs):
+    instance._rating_state = instance.__dict__.get('condition_rating')
+
+def rate_schedule_parties(confirmation, old_rating, new_rating):
+    """A receipt's condition rating counts towards both the vendor and the partner that delivered it"""
+    schedule = confirmation.delivery_schedule
+    rated_at = confirmation.confirmed_at
+    move_rating(VendorProfile, (schedule.vendor_id, old_rating, rated_at), (schedule.vendor_id, new_rating, rated_at))
+    move_rating(
+        LogisticsPartner,
+        (schedule.assigned_partner_id, old_rating, rated_at),
+        (schedule.assigned_partner_id, new_rating, rated_at),
+    )
+
+@receiver(post_save, sender=StockReceiptConfirmation)
+def update_ratings_on_receipt(sender, instance, created, **kwargs):
+    old_rating = None if created else instance._rating_state
+    instance._rating_state = instance.condition_rating
+    if old_rating != instance.condition_rating and (created or old_rating is not None):
+        rate_schedule_parties(instance, old_rating, instance.condition_rating)
+
+@receiver(post_delete, sender=StockReceiptConfirmation)
+def drop_ratings_on_receipt_delete(sender, instance, **kwargs):
+    rate_schedule_parties(instance, instance.condition_rating, None)
+
+@receiver(post_save, sender=VendorPickup)
+@receiver(post_save, sender=DeliverySchedule)
+@receiver(post_save, sender=LogisticsPartner)
+@receiver(post_delete, sender=VendorPickup)
+@receiver(post_delete, sender=DeliverySchedule)
+@receiver(post_delete, sender=LogisticsPartner)
+def invalidate_logistics_summary_on_change(sender, **kwargs):
+    invalidate_logistics_summary()
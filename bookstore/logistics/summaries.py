@@ -0,0 +1,58 @@
+# logistics/summaries.py - Cached logistics dashboard counters
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .models import VendorPickup, DeliverySchedule, LogisticsPartner
+
+LOGISTICS_SUMMARY_CACHE_KEY = 'logistics_dashboard_summary'
+# Short, since bulk status updates send no signals to clear it
+LOGISTICS_SUMMARY_CACHE_TIMEOUT = 60
+
+
+def invalidate_logistics_summary():
+    cache.delete(LOGISTICS_SUMMARY_CACHE_KEY)
+
+
+def pickup_counts():
+    """Vendor pickup buckets (old pickup system) in one conditional aggregate"""
+    return VendorPickup.objects.aggregate(
+        scheduled_pickups=Count('id', filter=Q(status='scheduled')),
+        in_transit_pickups=Count('id', filter=Q(status='in_transit')),
+        completed_pickups=Count('id', filter=Q(status='delivered')),
+    )
+
+
+def delivery_schedule_counts():
+    """Delivery schedule buckets in one conditional aggregate"""
+    return DeliverySchedule.objects.aggregate(
+        total_deliveries=Count('id'),
+        pending_assignments=Count('id', filter=Q(status='scheduled', assigned_partner__isnull=True)),
+        assigned_deliveries=Count(
+            'id', filter=Q(status__in=['confirmed', 'pickup_assigned'], assigned_partner__isnull=False)
+        ),
+        active_deliveries=Count('id', filter=Q(status__in=['collected', 'in_transit'])),
+        pending_confirmations=Count('id', filter=Q(status='arrived')),
+        completed_deliveries=Count('id', filter=Q(status__in=['verified', 'completed'])),
+    )
+
+
+def partner_counts():
+    return LogisticsPartner.objects.aggregate(
+        active_partners=Count('id', filter=Q(status='active')),
+    )
+
+
+def logistics_summary():
+    """
+    Every dashboard counter, one query per model, cached briefly and
+    cleared by logistics.signals when a pickup, delivery schedule or
+    partner is saved or deleted.
+    """
+    summary = cache.get(LOGISTICS_SUMMARY_CACHE_KEY)
+    if summary is None:
+        summary = {
+            **pickup_counts(),
+            **delivery_schedule_counts(),
+            **partner_counts(),
+        }
+        cache.set(LOGISTICS_SUMMARY_CACHE_KEY, summary, LOGISTICS_SUMMARY_CACHE_TIMEOUT)
+    return summary
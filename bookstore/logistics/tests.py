@@ -1,3 +1,233 @@
+import math
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from books.models import Book, Category
+from vendors.models import VendorProfile, StockOffer
+from vendors.models import OfferStatusNotification
+from delivery.versions import VersionedData, data_version
+from .distances import VENDOR_LOCATION, annotate_partner_estimates, distance_matrix, _load_distance_matrix
+from .models import VendorLocation, VendorPickup, DeliverySchedule, LogisticsPartner, PickupRoute, DeliveryTracking
+from .routing import build_route_plan, apply_route_plan, plan_pickup_routes
+from .summaries import logistics_summary
+
+User = get_user_model()
+
+
+class LogisticsSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', email='staff@example.com', password='pass', user_type='staff')
+        vendor_user = User.objects.create_user(username='vendor', email='vendor@example.com', password='pass')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        book = Book.objects.create(title='Book', slug='book', category=category, price=10, description='A book')
+        vendor = VendorProfile.objects.create(
+            user=vendor_user, business_name='Vendor', contact_person='Vendor', business_address='Street',
+            city='Mumbai', state='MH', pincode='400001', phone='1234567890', email='vendor@example.com',
+            status='approved',
+        )
+        partner = LogisticsPartner.objects.create(
+            name='Partner', contact_person='Partner', phone='1234567890', email='partner@example.com',
+            vehicle_type='van', vehicle_number='MH01AB1234',
+        )
+        location = VendorLocation.objects.create(
+            vendor=vendor, name='Store', address='Street', city='Mumbai', state='MH', pincode='400001',
+        )
+        today = timezone.now().date()
+
+        def offer():
+            return StockOffer.objects.create(
+                vendor=vendor, book=book, quantity=5, unit_price=1, total_amount=5,
+                availability_date=today, expiry_date=today, status='approved',
+            )
+
+        for status in ['scheduled', 'in_transit', 'delivered', 'delivered']:
+            VendorPickup.objects.create(
+                stock_offer=offer(), vendor=vendor, logistics_partner=partner, pickup_address='Street',
+                warehouse_address='Warehouse', scheduled_date=timezone.now(), status=status,
+            )
+        for status in ['scheduled', 'scheduled', 'pickup_assigned', 'in_transit', 'arrived', 'completed']:
+            DeliverySchedule.objects.create(
+                stock_offer=offer(), vendor=vendor, scheduled_delivery_date=timezone.now(), vendor_location=location,
+                contact_person='Vendor', contact_phone='1234567890', status=status,
+                assigned_partner=partner if status == 'pickup_assigned' else None,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_summary_is_three_queries_cold_and_none_warm(self):
+        with self.assertNumQueries(3):
+            summary = logistics_summary()
+        with self.assertNumQueries(0):
+            self.assertEqual(logistics_summary(), summary)
+
+        self.assertEqual(summary['scheduled_pickups'], 1)
+        self.assertEqual(summary['in_transit_pickups'], 1)
+        self.assertEqual(summary['completed_pickups'], 2)
+        self.assertEqual(summary['total_deliveries'], 6)
+        self.assertEqual(summary['pending_assignments'], 2)
+        self.assertEqual(summary['assigned_deliveries'], 1)
+        self.assertEqual(summary['active_deliveries'], 1)
+        self.assertEqual(summary['pending_confirmations'], 1)
+        self.assertEqual(summary['completed_deliveries'], 1)
+        self.assertEqual(summary['active_partners'], 1)
+
+    def test_saving_a_schedule_refreshes_the_summary(self):
+        self.assertEqual(logistics_summary()['pending_confirmations'], 1)
+        schedule = DeliverySchedule.objects.get(status='arrived')
+        schedule.status = 'completed'
+        schedule.save()
+        self.assertEqual(logistics_summary()['pending_confirmations'], 0)
+
+    def test_dashboard_and_api_report_the_same_counters(self):
+        self.client.force_login(self.staff)
+        api = self.client.get(reverse('logistics:summary_api'))
+        dashboard = self.client.get(reverse('logistics:dashboard'))
+
+        self.assertEqual(api.status_code, 200)
+        self.assertEqual(dashboard.status_code, 200)
+        counters = api.json()
+        self.assertEqual(counters, logistics_summary())
+        for name, value in counters.items():
+            self.assertEqual(dashboard.context[name], value, name)
+
+
+class RoutePlanningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', email='staff@example.com', password='pass', user_type='staff')
+        vendor_user = User.objects.create_user(username='vendor', email='vendor@example.com', password='pass')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        book = Book.objects.create(title='Book', slug='book', category=category, price=10, description='A book')
+        cls.vendor = VendorProfile.objects.create(
+            user=vendor_user, business_name='Vendor', contact_person='Vendor', business_address='Street',
+            city='Mumbai', state='MH', pincode='400001', phone='1234567890', email='vendor@example.com',
+            status='approved',
+        )
+        cls.partner = LogisticsPartner.objects.create(
+            name='Partner', contact_person='Partner', phone='1234567890', email='partner@example.com',
+            vehicle_type='van', vehicle_number='MH01AB1234', cost_per_km=10, base_cost=100,
+        )
+        cls.day = timezone.localdate() + timedelta(days=1)
+        when = timezone.make_aware(datetime.combine(cls.day, time(10)))
+        for i in range(3):
+            location = VendorLocation.objects.create(
+                vendor=cls.vendor, name=f'Store {i}', address='Street', city='Mumbai', state='MH', pincode='400001',
+                latitude=19.08 + i / 100, longitude=72.88,
+            )
+            offer = StockOffer.objects.create(
+                vendor=cls.vendor, book=book, quantity=10, unit_price=1, total_amount=10,
+                availability_date=cls.day, expiry_date=cls.day + timedelta(days=5), status='approved',
+            )
+            DeliverySchedule.objects.create(
+                stock_offer=offer, vendor=cls.vendor, scheduled_delivery_date=when, vendor_location=location,
+                contact_person='Vendor', contact_phone='1234567890',
+            )
+
+    def test_replanning_replaces_the_routes(self):
+        plan_pickup_routes(self.day, user=self.staff)
+        plan = plan_pickup_routes(self.day, user=self.staff)
+
+        self.assertEqual(plan.routed_count, 3)
+        self.assertEqual(PickupRoute.objects.filter(route_date=self.day).count(), 1)
+        self.assertEqual(DeliverySchedule.objects.filter(status='pickup_assigned', assigned_partner=self.partner).count(), 3)
+        # Same partner both times: the second plan is not announced again
+        self.assertEqual(DeliveryTracking.objects.filter(status='pickup_assigned').count(), 3)
+
+    def test_stop_collected_after_planning_is_left_alone(self):
+        plan = build_route_plan(self.day)
+        collected = DeliverySchedule.objects.order_by('pk').first()
+        DeliverySchedule.objects.filter(pk=collected.pk).update(status='collected')
+
+        apply_route_plan(plan, self.staff)
+        collected.refresh_from_db()
+        self.assertEqual(collected.status, 'collected')
+        self.assertIsNone(collected.pickup_route)
+        self.assertEqual([delivery.pk for delivery, reason in plan.unassigned], [collected.pk])
+        route = PickupRoute.objects.get(route_date=self.day)
+        self.assertEqual((route.stop_count, route.total_units), (2, 20))
+
+    def test_dropped_stop_is_tracked_and_vendor_told(self):
+        plan_pickup_routes(self.day, user=self.staff)
+        dropped = DeliverySchedule.objects.order_by('pk').first()
+        VendorLocation.objects.filter(pk=dropped.vendor_location_id).update(latitude=None)
+
+        plan_pickup_routes(self.day, user=self.staff)
+        dropped.refresh_from_db()
+        self.assertEqual(dropped.status, 'scheduled')
+        self.assertIsNone(dropped.assigned_partner)
+        self.assertTrue(dropped.tracking_updates.filter(status='scheduled', notes__contains='Partner').exists())
+        self.assertTrue(OfferStatusNotification.objects.filter(
+            stock_offer=dropped.stock_offer, status='scheduled', message__contains='Partner',
+        ).exists())
+
+    def test_route_planner_rejects_impossible_dates(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('logistics:route_planner'), {'date': '2024-02-30'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('logistics:route_planner'), {'date': 'tomorrow'}).status_code, 400)
+        self.assertFalse(PickupRoute.objects.exists())
+        self.assertEqual(self.client.get(reverse('logistics:route_planner')).status_code, 200)
+
+
+class DistanceMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor_user = User.objects.create_user(username='vendor', email='vendor@example.com', password='pass')
+        vendor = VendorProfile.objects.create(
+            user=vendor_user, business_name='Vendor', contact_person='Vendor', business_address='Street',
+            city='Mumbai', state='MH', pincode='400001', phone='1234567890', email='vendor@example.com',
+        )
+
+        def location(name, latitude=None, longitude=None):
+            return VendorLocation.objects.create(
+                vendor=vendor, name=name, address='Street', city='Mumbai', state='MH', pincode='400001',
+                latitude=latitude, longitude=longitude,
+            )
+
+        # One degree of latitude north of the default depot is about 111.2 km
+        cls.north = location('North', '20.076000', '72.877700')
+        cls.unmapped = location('Unmapped')
+
+    def setUp(self):
+        cache.clear()
+
+    def depot_distances(self, *locations):
+        return distance_matrix().from_depot(VENDOR_LOCATION, [location.pk for location in locations])
+
+    def test_road_distance_from_the_depot(self):
+        north, unmapped = self.depot_distances(self.north, self.unmapped)
+        self.assertAlmostEqual(north, 111.2 * 1.3, delta=0.5)
+        self.assertTrue(math.isnan(unmapped))
+
+        partner = LogisticsPartner(name='Van', base_cost=100, cost_per_km=2)
+        distance, [partner] = annotate_partner_estimates([partner], self.north.pk)
+        self.assertAlmostEqual(partner.cost_estimate, 100 + 2 * distance, delta=Decimal('0.02'))
+
+    def test_warm_matrix_costs_one_version_read(self):
+        distance_matrix()
+        with self.assertNumQueries(1):
+            distance_matrix()
+
+    def test_coordinate_changes_reach_every_process(self):
+        # A second copy stands in for another worker process with its own memory
+        other_process = VersionedData('logistics_distance_matrix', _load_distance_matrix)
+        other_process.get()
+        version = data_version('logistics_distance_matrix')
+
+        self.north.refresh_from_db()
+        self.north.name = 'Renamed'
+        self.north.save()
+        self.assertEqual(data_version('logistics_distance_matrix'), version)
 
-# Create your tests here.
+        self.unmapped.latitude, self.unmapped.longitude = '19.076000', '72.877700'
+        self.unmapped.save()
+        self.assertNotEqual(data_version('logistics_distance_matrix'), version)
+        self.assertEqual(
+            other_process.get().from_depot(VENDOR_LOCATION, [self.unmapped.pk]).tolist(), [0.0]
+        )
@@ -7,6 +7,7 @@ app_name = 'logistics'
 urlpatterns = [
     # Dashboard
     path('', views.logistics_dashboard, name='dashboard'),
+    path('api/summary/', views.logistics_summary_api, name='summary_api'),
 
     path('partners/', views.logistics_partner_list, name='partner_list'),
     path('partners/create/', views.logistics_partner_create, name='partner_create'),
@@ -18,6 +19,9 @@ urlpatterns = [
     path('deliveries/<int:delivery_id>/assign-partner/', views.assign_logistics_partner, name='assign_partner'),
     path('deliveries/<int:delivery_id>/update-status/', views.update_delivery_status, name='update_status'),
     
+    # PICKUP ROUTE PLANNING
+    path('routes/', views.route_planner, name='route_planner'),
+    
     # STOCK RECEIPT CONFIRMATION
     path('pending-receipts/', views.pending_receipts, name='pending_receipts'),
     path('deliveries/<int:delivery_id>/confirm-receipt/', views.confirm_stock_receipt, name='confirm_receipt'),
@@ -1,11 +1,17 @@
 # logistics/views.py - Enhanced version
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db.models import Prefetch
 from django.db.models import Q, Count
-from .models import VendorPickup, LogisticsPartner, PickupTracking, DeliverySchedule, StockReceiptConfirmation, DeliveryTracking
+from .models import VendorPickup, LogisticsPartner, PickupTracking, DeliverySchedule, StockReceiptConfirmation, DeliveryTracking, PickupRoute
+from .routing import plan_pickup_routes
+from .distances import annotate_delivery_estimates, annotate_partner_estimates, annotate_pickup_estimates
+from .summaries import logistics_summary
 from vendors.models import StockOffer, OfferStatusNotification
 from warehouse.models import Stock, StockMovement
 from .forms import StockReceiptForm
@@ -20,35 +26,7 @@ def is_staff_or_admin(user):
 @login_required
 @user_passes_test(is_staff_or_admin)
 def logistics_dashboard(request):
-    """FIXED: Dashboard showing both old pickups and new delivery schedules"""
-    
-    # OLD PICKUP SYSTEM STATS (for backward compatibility)
-    scheduled_pickups = VendorPickup.objects.filter(status='scheduled').count()
-    in_transit_pickups = VendorPickup.objects.filter(status='in_transit').count()
-    completed_pickups = VendorPickup.objects.filter(status='delivered').count()
-    
-    # NEW DELIVERY SCHEDULE STATS - FIXED QUERIES
-    pending_assignments = DeliverySchedule.objects.filter(
-        status='scheduled', 
-        assigned_partner__isnull=True
-    ).count()
-    
-    assigned_deliveries = DeliverySchedule.objects.filter(
-        status__in=['confirmed', 'pickup_assigned'],
-        assigned_partner__isnull=False
-    ).count()
-    
-    active_deliveries = DeliverySchedule.objects.filter(
-        status__in=['collected', 'in_transit']
-    ).count()
-    
-    pending_confirmations = DeliverySchedule.objects.filter(
-        status='arrived'
-    ).count()
-    
-    completed_deliveries = DeliverySchedule.objects.filter(
-        status__in=['verified', 'completed']
-    ).count()
+    """Dashboard showing both old pickups and new delivery schedules"""
     
     # FIXED: Recent deliveries needing attention - should show ALL scheduled deliveries
     recent_scheduled_deliveries = DeliverySchedule.objects.filter(
@@ -71,36 +49,25 @@ def logistics_dashboard(request):
         'vendor', 'logistics_partner', 'stock_offer__book'
     ).order_by('-created_at')[:5]
     
-    # All active logistics partners
-    active_partners = LogisticsPartner.objects.filter(status='active').count()
-    
-    # DEBUG: Print actual counts to help troubleshoot
-    print(f"DEBUG - Total DeliverySchedule objects: {DeliverySchedule.objects.count()}")
-    print(f"DEBUG - Scheduled deliveries: {pending_assignments}")
-    print(f"DEBUG - Recent scheduled deliveries: {len(recent_scheduled_deliveries)}")
-    
     context = {
-        # Old system stats
-        'scheduled_pickups': scheduled_pickups,
-        'in_transit_pickups': in_transit_pickups,
-        'completed_pickups': completed_pickups,
-        
-        # New delivery system stats - FIXED
-        'pending_assignments': pending_assignments,
-        'assigned_deliveries': assigned_deliveries,
-        'active_deliveries': active_deliveries,
-        'pending_confirmations': pending_confirmations,
-        'completed_deliveries': completed_deliveries,
+        # Pickup and delivery schedule counters, shared with logistics_summary_api
+        **logistics_summary(),
         
         'recent_scheduled_deliveries': recent_scheduled_deliveries,
         'pending_receipts': pending_receipts,
         'recent_pickups': recent_pickups,
-        'active_partners': active_partners,
     }
     
     return render(request, 'logistics/dashboard.html', context)
 
 
+@login_required
+@user_passes_test(is_staff_or_admin)
+def logistics_summary_api(request):
+    """Dashboard counters as JSON, from the same cached summary"""
+    return JsonResponse(logistics_summary())
+
+
 @login_required
 @user_passes_test(is_staff_or_admin)
 def pickup_list(request):
@@ -115,13 +82,16 @@ def pickup_list(request):
     paginator = Paginator(pickups_list, 20)
     page_number = request.GET.get('page')
     pickups = paginator.get_page(page_number)
+    # Distance/cost estimates for pickups that never had them entered
+    pickups.object_list = annotate_pickup_estimates(pickups.object_list)
     
     return render(request, 'logistics/pickup_list.html', {'pickups': pickups})
 
 @login_required
 @user_passes_test(is_staff_or_admin)
 def pickup_detail(request, pickup_id):
-    pickup = get_object_or_404(VendorPickup, id=pickup_id)
+    pickup = get_object_or_404(VendorPickup.objects.select_related('logistics_partner'), id=pickup_id)
+    annotate_pickup_estimates([pickup])
     return render(request, 'logistics/pickup_detail.html', {'pickup': pickup})
 
 # NEW VIEWS FOR DELIVERY MANAGEMENT
@@ -159,6 +129,7 @@ def delivery_list(request):
     paginator = Paginator(deliveries_list, 20)
     page_number = request.GET.get('page')
     deliveries = paginator.get_page(page_number)
+    deliveries.object_list = annotate_delivery_estimates(deliveries.object_list)
     
     # Get available logistics partners for assignment
     available_partners = LogisticsPartner.objects.filter(status='active').order_by('name')
@@ -198,11 +169,14 @@ def delivery_detail(request, delivery_id):
     
     # Get available logistics partners for potential assignment/reassignment
     available_partners = LogisticsPartner.objects.filter(status='active').order_by('name')
+    # Depot -> vendor location distance and what each partner would charge for it
+    pickup_distance, available_partners = annotate_partner_estimates(available_partners, delivery.vendor_location_id)
     
     context = {
         'delivery': delivery,
         'tracking_updates': tracking_updates,
         'available_partners': available_partners,
+        'pickup_distance': pickup_distance,
     }
     
     return render(request, 'logistics/delivery_detail.html', context)
@@ -268,7 +242,7 @@ def confirm_stock_receipt(request, delivery_id):
                         }
                     )
                     
-                    # Create stock movement record FIRST
+                    # The movement applies the quantity to stock with an F() update
                     movement = StockMovement.objects.create(
                         stock=stock,
                         movement_type='in',
@@ -278,10 +252,6 @@ def confirm_stock_receipt(request, delivery_id):
                         performed_by=request.user,
                     )
                     
-                    # FIXED: Only update quantity, let available_quantity be calculated by property
-                    stock.quantity += confirmation.books_accepted
-                    stock.save()
-                    
                     # Mark confirmation as completed
                     confirmation.stock_updated = True
                     confirmation.stock_movement_created = True
@@ -542,3 +512,50 @@ def logistics_partner_edit(request, partner_id):
     else:
         form = LogisticsPartnerForm(instance=partner)
     return render(request, 'logistics/partner_form.html', {'form': form, 'partner': partner})
+
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+def route_planner(request):
+    """Plan a day's pickup routes and show the planned routes with their stops"""
+    value = request.POST.get('date') or request.GET.get('date')
+    try:
+        route_date = parse_date(value) if value else timezone.localdate()
+    except ValueError:  # Well formed but impossible, e.g. 2024-02-30
+        route_date = None
+    if route_date is None:
+        return HttpResponseBadRequest(f'Invalid date "{value}", use YYYY-MM-DD.')
+    
+    if request.method == 'POST':
+        plan = plan_pickup_routes(route_date, user=request.user)
+        messages.success(
+            request,
+            f'Planned {len(plan.routes)} routes for {plan.routed_count} pickups on {route_date:%b %d}: '
+            f'{plan.total_distance} km, estimated cost ₹{plan.total_cost}.'
+        )
+        if plan.unassigned:
+            messages.warning(request, f'{len(plan.unassigned)} pickups could not be routed.')
+        return redirect(f"{request.path}?date={route_date.isoformat()}")
+    
+    routes = PickupRoute.objects.filter(route_date=route_date).select_related('partner').prefetch_related(
+        Prefetch(
+            'stops',
+            queryset=DeliverySchedule.objects.select_related('vendor', 'vendor_location', 'stock_offer__book').order_by('route_sequence'),
+        )
+    ).order_by('partner__name', 'trip')
+    
+    unrouted = DeliverySchedule.objects.filter(
+        scheduled_delivery_date__date=route_date,
+        status__in=['scheduled', 'confirmed'],
+        assigned_partner__isnull=True,
+    ).select_related('vendor', 'vendor_location', 'stock_offer__book')
+    
+    context = {
+        'route_date': route_date,
+        'routes': routes,
+        'unrouted': unrouted,
+        'total_distance': sum(route.total_distance for route in routes),
+        'total_cost': sum(route.estimated_cost for route in routes),
+    }
+    
+    return render(request, 'logistics/route_planner.html', context)
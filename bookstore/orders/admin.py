@@ -1,11 +1,12 @@
 # orders/admin.py
 from django.contrib import admin
+from warehouse.reservations import fill_backorders
 from .models import Order, OrderItem, OrderTracking, Return, ReturnItem
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ['total']
+    readonly_fields = ['total', 'backordered_quantity']
 
 class OrderTrackingInline(admin.TabularInline):
     model = OrderTracking
@@ -18,6 +19,12 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_id', 'user__username', 'billing_email']
     readonly_fields = ['order_id', 'created_at', 'updated_at']
     inlines = [OrderItemInline, OrderTrackingInline]
+    actions = ['fill_backorders_from_stock']
+
+    def fill_backorders_from_stock(self, request, queryset):
+        filled = fill_backorders(queryset, performed_by=request.user)
+        self.message_user(request, f'{filled} backordered units were filled from stock.')
+    fill_backorders_from_stock.short_description = 'Fill backorders of selected orders from stock'
 
 @admin.register(Return)
 class ReturnAdmin(admin.ModelAdmin):
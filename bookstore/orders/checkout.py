@@ -0,0 +1,99 @@
+# orders/checkout.py - Set-based checkout: cart lines, prices and stock in one batch
+from decimal import Decimal
+
+from django.utils import timezone
+from coupons.models import BookSaleItem
+from .models import OrderItem
+
+
+class CheckoutLine:
+    """
+    A cart line with its book, stock row and the unit price in effect at
+    checkout. Quacks like a CartItem for Coupon.can_use/calculate_discount
+    without their per-item sale lookups.
+    """
+
+    def __init__(self, book, quantity, price):
+        self.book = book
+        self.book_id = book.pk
+        self.quantity = quantity
+        self.price = price
+
+    @property
+    def stock(self):
+        return getattr(self.book, 'stock', None)
+
+    def get_effective_price(self):
+        return self.price
+
+    def get_original_price(self):
+        return self.book.price
+
+    @property
+    def total_price(self):
+        return self.price * self.quantity
+
+    @property
+    def original_total_price(self):
+        return self.book.price * self.quantity
+
+
+def sale_prices(books, at=None):
+    """
+    {book_id: sale price} for books in an active sale, from one query. A
+    book in several running sales gets the lowest of their prices.
+    """
+    at = at or timezone.now()
+    books = {book.pk: book for book in books}
+    prices = {}
+    for sale_item in BookSaleItem.objects.select_related('sale').filter(
+        book_id__in=books,
+        sale__is_active=True,
+        sale__valid_from__lte=at,
+        sale__valid_to__gte=at,
+    ):
+        sale_item.book = books[sale_item.book_id]  # get_sale_price reads the book's price
+        price = sale_item.get_sale_price()
+        prices[sale_item.book_id] = min(price, prices.get(sale_item.book_id, price))
+    return prices
+
+
+def load_checkout_lines(cart):
+    """
+    The cart as CheckoutLines: items with their books and stock rows in one
+    query, sale prices in a second, whatever the cart size.
+    """
+    items = list(cart.items.select_related('book', 'book__stock').order_by('pk'))
+    prices = sale_prices([item.book for item in items])
+    return [
+        CheckoutLine(item.book, item.quantity, prices.get(item.book_id, item.book.price))
+        for item in items
+    ]
+
+
+def stock_problem(lines):
+    """Message for the first line the loaded stock cannot cover, or None"""
+    for line in lines:
+        if line.stock is None:
+            return f'"{line.book.title}" is currently out of stock.'
+        if line.stock.available_quantity < line.quantity:
+            return f'Only {line.stock.available_quantity} units of "{line.book.title}" are available.'
+    return None
+
+
+def lines_subtotal(lines):
+    return sum((line.total_price for line in lines), Decimal('0.00'))
+
+
+def create_order_items(order, lines):
+    """All OrderItems of the order in one INSERT, priced as loaded"""
+    return OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            book=line.book,
+            quantity=line.quantity,
+            price=line.price,
+            total=line.total_price,  # bulk_create skips OrderItem.save()
+        )
+        for line in lines
+    ])
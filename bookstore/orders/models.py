@@ -95,13 +95,19 @@ class Order(models.Model):
     def total_items(self):
         return sum(item.quantity for item in self.items.all())
 
+    @property
+    def is_backordered(self):
+        return self.items.filter(backordered_quantity__gt=0).exists()
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price at time of order
     total = models.DecimalField(max_digits=10, decimal_places=2)
-    
+    # Units paid for but not in stock when the order was confirmed
+    backordered_quantity = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return f"{self.quantity} x {self.book.title}"
     
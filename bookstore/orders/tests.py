@@ -1,3 +1,95 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from books.models import Book, Category, Cart, CartItem
+from coupons.models import Coupon, BookSale, BookSaleItem
+from warehouse.models import Stock
+from .models import Order
+
+User = get_user_model()
+
+CHECKOUT_FORM = {
+    'billing_first_name': 'Reader', 'billing_last_name': 'One', 'billing_email': 'reader@example.com',
+    'billing_phone': '1234567890', 'billing_address': 'Street', 'billing_city': 'Mumbai',
+    'billing_state': 'MH', 'billing_pincode': '400001', 'same_as_billing': 'on',
+}
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {i}', slug=f'book-{i}', category=category, price=Decimal('100.00'), description='A book')
+            for i in range(20)
+        ]
+        Stock.objects.filter(book__in=cls.books).update(quantity=50)
+
+        now = timezone.now()
+        sale = BookSale.objects.create(
+            name='Sale', sale_type='percentage', discount_value=10,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+        # Every other book is 10% off
+        for book in cls.books[::2]:
+            BookSaleItem.objects.create(sale=sale, book=book)
+        Coupon.objects.create(
+            code='TEN', name='Ten off', discount_type='fixed_amount', discount_value=10,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+
+    def shopper(self, username, lines, quantity=2):
+        user = User.objects.create_user(username=username, email=f'{username}@example.com', password='pass')
+        cart = Cart.objects.create(user=user)
+        for book in self.books[:lines]:
+            CartItem.objects.create(cart=cart, book=book, quantity=quantity)
+        self.client.force_login(user)
+        # Warm the page once so the measured POST does not pay for first-hit lookups
+        self.client.get(reverse('orders:checkout'))
+        return user
+
+    def checkout(self, **data):
+        response = self.client.post(reverse('orders:checkout'), {**CHECKOUT_FORM, **data})
+        self.assertEqual(response.status_code, 302)
+        return response
+
+    def test_query_count_does_not_grow_with_cart_lines(self):
+        self.shopper('small', lines=2)
+        with CaptureQueriesContext(connection) as small:
+            self.checkout()
+        # Count now: the next request's request_started signal clears the query log
+        small_queries = len(small)
+
+        self.shopper('large', lines=20)
+        with self.assertNumQueries(small_queries):
+            self.checkout()
+        self.assertEqual(Order.objects.get(user__username='large').items.count(), 20)
+
+    def test_valid_coupon_is_applied(self):
+        user = self.shopper('coupon', lines=2)
+        self.checkout(coupon_code='TEN')
+
+        order = Order.objects.get(user=user)
+        self.assertEqual(order.coupon_code, 'TEN')
+        self.assertEqual(order.discount_amount, Decimal('10.00'))
+        self.assertEqual(order.subtotal, Decimal('380.00'))
+        self.assertEqual(order.total_amount, order.subtotal - order.discount_amount + order.shipping_cost + order.tax_amount)
+
+    def test_item_prices_match_sale_price_subtotal(self):
+        user = self.shopper('sale', lines=4)
+        self.checkout()
 
-# Create your tests here.
+        order = Order.objects.get(user=user)
+        items = list(order.items.order_by('book_id'))
+        self.assertEqual(len(items), 4)
+        for item in items:
+            on_sale = self.books.index(item.book) % 2 == 0
+            self.assertEqual(item.price, Decimal('90.00') if on_sale else Decimal('100.00'))
+        self.assertEqual(sum(item.total for item in items), order.subtotal)
+        self.assertEqual(order.subtotal, Decimal('760.00'))
@@ -6,9 +6,15 @@ from django.core.paginator import Paginator
 from django.db import transaction
 from django.http import JsonResponse
 from books.models import Cart, CartItem
-from warehouse.models import Stock, StockMovement
+from warehouse.inventory import InsufficientStock
+from warehouse.reservations import (
+    order_lines, reserve_stock, commit_reservations, release_order_reservations,
+    restock_order, shortage_message,
+)
 from coupons.models import Coupon, CouponUsage
-from .models import Order, OrderItem, OrderTracking, Return, ReturnItem
+from delivery.eta import estimated_delivery_date
+from .models import Order, OrderTracking, Return, ReturnItem
+from .checkout import load_checkout_lines, stock_problem, lines_subtotal, create_order_items
 from .forms import CheckoutForm, ReturnRequestForm
 from decimal import Decimal
 import json
@@ -26,7 +32,9 @@ def create_from_cart(request):
         # Get user's cart
         cart = get_object_or_404(Cart, user=request.user)
         
-        if not cart.items.exists():
+        # Cart lines, books, sale prices and stock rows in one batch
+        lines = load_checkout_lines(cart)
+        if not lines:
             return JsonResponse({'success': False, 'error': 'Cart is empty'})
         
         # Check if user has profile with address information
@@ -42,27 +50,10 @@ def create_from_cart(request):
                 'redirect_url': '/accounts/profile/'
             })
         
+        subtotal = lines_subtotal(lines)
+        
         with transaction.atomic():
-            # STEP 1: Check stock availability (but don't reserve yet during order creation)
-            for cart_item in cart.items.all():
-                try:
-                    stock = Stock.objects.select_for_update().get(book=cart_item.book)
-                    
-                    # Check if enough stock is available
-                    available_stock = stock.available_quantity  # This is quantity - reserved_quantity
-                    if available_stock < cart_item.quantity:
-                        return JsonResponse({
-                            'success': False,
-                            'error': f'Not enough stock for "{cart_item.book.title}". Available: {available_stock}, Requested: {cart_item.quantity}'
-                        })
-                        
-                except Stock.DoesNotExist:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'Stock record not found for "{cart_item.book.title}"'
-                    })
-            
-            # STEP 2: Create the order (pending status)
+            # STEP 1: Create the order (pending status)
             order = Order.objects.create(
                 user=request.user,
                 status='pending',  # Start as pending
@@ -85,39 +76,22 @@ def create_from_cart(request):
                 shipping_city=getattr(user, 'city', 'City not provided'),
                 shipping_state=getattr(user, 'state', 'State not provided'),
                 shipping_pincode=getattr(user, 'pincode', '000000'),
+                estimated_delivery_date=estimated_delivery_date(getattr(user, 'pincode', '')),
                 
                 # Order totals
-                subtotal=cart.total_price,
+                subtotal=subtotal,
                 tax_amount=Decimal('0.00'),
                 shipping_cost=Decimal('0.00'),
                 discount_amount=Decimal('0.00'),
-                total_amount=cart.total_price
+                total_amount=subtotal
             )
             
-            # STEP 3: Create order items and RESERVE stock (don't reduce actual stock yet)
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    book=cart_item.book,
-                    quantity=cart_item.quantity,
-                    price=cart_item.book.price,
-                    total=cart_item.total_price
-                )
-                
-                # RESERVE stock (increase reserved_quantity, don't touch actual quantity)
-                stock = Stock.objects.select_for_update().get(book=cart_item.book)
-                stock.reserved_quantity += cart_item.quantity
-                stock.save()
-                
-                # Create stock movement for reservation
-                StockMovement.objects.create(
-                    stock=stock,
-                    movement_type='adjustment',  # Use adjustment for reservations
-                    quantity=0,  # No actual stock change yet, just reservation
-                    reference=f"Order-{order.order_id}-Reserved",
-                    reason=f"Stock reserved for order {order.order_id}",
-                    performed_by=request.user
-                )
+            # STEP 2: Create order items in one INSERT
+            create_order_items(order, lines)
+            
+            # STEP 3: RESERVE stock for every line in one locked batch (don't reduce
+            # actual stock yet); a shortage rolls the whole order back
+            reserve_stock(order_lines(lines), order=order, performed_by=request.user)
             
             # STEP 4: Create initial tracking
             OrderTracking.objects.create(
@@ -135,6 +109,9 @@ def create_from_cart(request):
                 'message': 'Order created successfully'
             })
     
+    except InsufficientStock as e:
+        return JsonResponse({'success': False, 'error': shortage_message(e)})
+    
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -162,25 +139,8 @@ def confirm_order_payment(request, order_id):
             order.payment_status = 'paid'
             order.save()
             
-            # NOW reduce actual stock and clear reservations
-            for order_item in order.items.all():
-                stock = Stock.objects.select_for_update().get(book=order_item.book)
-                
-                # Reduce actual stock quantity
-                stock.quantity -= order_item.quantity
-                # Clear the reservation
-                stock.reserved_quantity -= order_item.quantity
-                stock.save()
-                
-                # Create stock movement for actual stock reduction
-                StockMovement.objects.create(
-                    stock=stock,
-                    movement_type='out',
-                    quantity=-order_item.quantity,  # Negative for stock out
-                    reference=f"Order-{order.order_id}",
-                    reason=f"Stock sold - Order {order.order_id}",
-                    performed_by=None  # System generated
-                )
+            # NOW reduce actual stock and clear reservations in one batch
+            commit_reservations(order)
             
             # Update tracking
             OrderTracking.objects.create(
@@ -204,26 +164,42 @@ def confirm_order_payment(request, order_id):
 def checkout(request):
     cart = get_object_or_404(Cart, user=request.user)
     
-    if not cart.items.exists():
+    # Cart lines, books, sale prices and stock rows in one batch; the page,
+    # the checks and the order below all work from these
+    lines = load_checkout_lines(cart)
+    if not lines:
         messages.error(request, 'Your cart is empty!')
         return redirect('books:cart')
     
-    # Check stock availability
-    for item in cart.items.all():
-        try:
-            stock = Stock.objects.get(book=item.book)
-            if stock.available_quantity < item.quantity:
-                messages.error(request, f'Only {stock.available_quantity} units of "{item.book.title}" are available.')
-                return redirect('books:cart')
-        except Stock.DoesNotExist:
-            messages.error(request, f'"{item.book.title}" is currently out of stock.')
-            return redirect('books:cart')
+    # Check stock availability (reserve_stock re-checks under lock)
+    problem = stock_problem(lines)
+    if problem:
+        messages.error(request, problem)
+        return redirect('books:cart')
+    
+    subtotal = lines_subtotal(lines)
     
     if request.method == 'POST':
         form = CheckoutForm(request.POST)
         if form.is_valid():
             try:
                 with transaction.atomic():
+                    # Validate the coupon against the loaded lines before creating anything
+                    coupon = None
+                    discount = Decimal('0.00')
+                    coupon_code = form.cleaned_data.get('coupon_code')
+                    if coupon_code:
+                        coupon = Coupon.objects.filter(
+                            code=coupon_code,
+                            is_active=True,
+                            valid_from__lte=timezone.now(),
+                            valid_to__gte=timezone.now()
+                        ).first()
+                        if coupon is not None and coupon.can_use(request.user, subtotal, lines)[0]:
+                            discount = coupon.calculate_discount(lines)
+                        else:
+                            coupon = None
+                    
                     # Create order
                     order = Order.objects.create(
                         user=request.user,
@@ -242,53 +218,29 @@ def checkout(request):
                         shipping_city=form.cleaned_data.get('shipping_city') or form.cleaned_data['billing_city'],
                         shipping_state=form.cleaned_data.get('shipping_state') or form.cleaned_data['billing_state'],
                         shipping_pincode=form.cleaned_data.get('shipping_pincode') or form.cleaned_data['billing_pincode'],
+                        estimated_delivery_date=estimated_delivery_date(
+                            form.cleaned_data.get('shipping_pincode') or form.cleaned_data['billing_pincode']
+                        ),
                         
-                        subtotal=cart.total_price,
-                        total_amount=cart.total_price,
-                        coupon_code=form.cleaned_data.get('coupon_code', ''),
+                        subtotal=subtotal,
+                        discount_amount=discount,
+                        total_amount=subtotal - discount,
+                        coupon_code=coupon_code if coupon else '',
                         notes=form.cleaned_data.get('notes', ''),
                     )
                     
-                    # Create order items and reserve stock
-                    for cart_item in cart.items.all():
-                        OrderItem.objects.create(
+                    # Create order items in one INSERT and reserve stock in one locked batch
+                    create_order_items(order, lines)
+                    reserve_stock(order_lines(lines), order=order, performed_by=request.user)
+                    
+                    # Record coupon usage
+                    if coupon:
+                        CouponUsage.objects.create(
+                            coupon=coupon,
+                            user=request.user,
                             order=order,
-                            book=cart_item.book,
-                            quantity=cart_item.quantity,
-                            price=cart_item.book.price,
+                            discount_amount=discount
                         )
-                        
-                        # Reserve stock
-                        stock = Stock.objects.get(book=cart_item.book)
-                        stock.reserved_quantity += cart_item.quantity
-                        stock.save()
-                    
-                    # Apply coupon if provided
-                    coupon_code = form.cleaned_data.get('coupon_code')
-                    if coupon_code:
-                        try:
-                            coupon = Coupon.objects.get(
-                                code=coupon_code,
-                                is_active=True,
-                                valid_from__lte=timezone.now(),
-                                valid_to__gte=timezone.now()
-                            )
-                            
-                            if coupon.can_use(request.user):
-                                discount = coupon.calculate_discount(order.subtotal)
-                                order.discount_amount = discount
-                                order.total_amount = order.subtotal - discount
-                                order.save()
-                                
-                                # Record coupon usage
-                                CouponUsage.objects.create(
-                                    coupon=coupon,
-                                    user=request.user,
-                                    order=order,
-                                    discount_amount=discount
-                                )
-                        except Coupon.DoesNotExist:
-                            pass
                     
                     # Create initial tracking
                     OrderTracking.objects.create(
@@ -303,6 +255,9 @@ def checkout(request):
                     messages.success(request, f'Order #{order.order_id} placed successfully!')
                     return redirect('orders:order_detail', order_id=order.order_id)
                     
+            except InsufficientStock as e:
+                messages.error(request, shortage_message(e))
+                return redirect('books:cart')
             except Exception as e:
                 messages.error(request, 'An error occurred while processing your order. Please try again.')
                 return redirect('books:cart')
@@ -324,6 +279,9 @@ def checkout(request):
     context = {
         'form': form,
         'cart': cart,
+        'lines': lines,
+        'subtotal': subtotal,
+        'estimated_delivery': estimated_delivery_date(getattr(request.user, 'pincode', '')),
     }
     
     return render(request, 'orders/checkout.html', context)
@@ -353,36 +311,17 @@ def cancel_order(request, order_id):
     order = get_object_or_404(Order, order_id=order_id, user=request.user)
     
     if order.status in ['pending', 'confirmed']:
-        old_status = order.status
-        order.status = 'cancelled'
-        order.save()
-        
-        # Release reserved stock
-        for item in order.items.all():
-            try:
-                stock = Stock.objects.select_for_update().get(book=item.book)
-                
-                if old_status == 'pending':
-                    # Order was only reserved, release reservation
-                    stock.reserved_quantity = max(0, stock.reserved_quantity - item.quantity)
-                elif old_status == 'confirmed':
-                    # Order was confirmed (stock was deducted), add back to actual stock
-                    stock.quantity += item.quantity
-                
-                stock.save()
-                
-                # Create stock movement
-                StockMovement.objects.create(
-                    stock=stock,
-                    movement_type='returned',
-                    quantity=item.quantity,
-                    reference=f"Order-{order.order_id}-Cancelled",
-                    reason=f"Order cancelled - stock returned",
-                    performed_by=request.user
-                )
-                
-            except Stock.DoesNotExist:
-                pass
+        with transaction.atomic():
+            old_status = order.status
+            order.status = 'cancelled'
+            order.save()
+            
+            if old_status == 'pending':
+                # Order was only reserved, release reservation
+                release_order_reservations(order)
+            else:
+                # Order was confirmed (stock was deducted), add back to actual stock
+                restock_order(order, performed_by=request.user)
         
         OrderTracking.objects.create(
             order=order,
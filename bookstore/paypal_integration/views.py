@@ -3,10 +3,11 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse
+from django.db import transaction
 from django.utils import timezone
 from django.http import JsonResponse
 from orders.models import Order, OrderTracking
-from warehouse.models import Stock, StockMovement
+from warehouse.reservations import commit_reservations
 from .models import PayPalPayment
 from .services import PayPalService
 
@@ -88,47 +89,38 @@ def execute_payment(request, order_id):
         executed_payment = paypal_service.execute_payment(payment_id, payer_id)
         
         if executed_payment.state == 'approved':
-            # Update payment record
-            paypal_payment.paypal_payer_id = payer_id
-            paypal_payment.status = 'completed'
-            paypal_payment.completed_at = timezone.now()
-            paypal_payment.paypal_response = executed_payment.to_dict()
-            paypal_payment.save()
-            
-            # Update order
-            order.payment_status = 'paid'
-            order.payment_method = 'PayPal'
-            order.payment_transaction_id = payment_id
-            order.status = 'confirmed'
-            order.save()
-            
-            # Convert reserved stock to actual stock reduction
-            for item in order.items.all():
-                try:
-                    stock = Stock.objects.get(book=item.book)
-                    # Remove from reserved and actual quantity
-                    stock.reserved_quantity = max(0, stock.reserved_quantity - item.quantity)
-                    stock.quantity = max(0, stock.quantity - item.quantity)
-                    stock.save()
-                    
-                    # Create stock movement record
-                    StockMovement.objects.create(
-                        stock=stock,
-                        movement_type='out',
-                        quantity=-item.quantity,
-                        reference=order.order_id,
-                        reason='Order fulfillment',
-                        performed_by=None
-                    )
-                except Stock.DoesNotExist:
-                    pass
+            # Payment, order, stock and tracking change together or not at all
+            with transaction.atomic():
+                # Update payment record
+                paypal_payment.paypal_payer_id = payer_id
+                paypal_payment.status = 'completed'
+                paypal_payment.completed_at = timezone.now()
+                paypal_payment.paypal_response = executed_payment.to_dict()
+                paypal_payment.save()
+                
+                # Update order
+                order.payment_status = 'paid'
+                order.payment_method = 'PayPal'
+                order.payment_transaction_id = payment_id
+                order.status = 'confirmed'
+                order.save()
+                
+                # Convert reserved stock to actual stock reduction. Payment is already
+                # captured, so units no longer in stock are backordered, not dropped
+                shortfall = commit_reservations(order, backorder=True)
+                
+                # Add order tracking
+                description = 'Payment received and order confirmed.'
+                if shortfall:
+                    description += f' {sum(shortfall.values())} item(s) are backordered and will ship once restocked.'
+                OrderTracking.objects.create(
+                    order=order,
+                    status='order_confirmed',
+                    description=description
+                )
             
-            # Add order tracking
-            OrderTracking.objects.create(
-                order=order,
-                status='order_confirmed',
-                description='Payment received and order confirmed.'
-            )
+            if shortfall:
+                messages.warning(request, 'Some items in your order are backordered and will ship once they are back in stock.')
             
             messages.success(request, f'Payment successful! Your order #{order.order_id} has been confirmed.')
             return redirect('paypal_integration:payment_success', order_id=order_id)
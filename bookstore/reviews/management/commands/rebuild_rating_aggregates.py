@@ -0,0 +1,39 @@
+# reviews/management/commands/rebuild_rating_aggregates.py
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Coalesce
+from delivery.models import Delivery, DeliveryPartner
+from logistics.models import LogisticsPartner, StockReceiptConfirmation
+from vendors.models import VendorProfile
+from reviews.ratings import rebuild_ratings
+
+class Command(BaseCommand):
+    help = 'Recompute the running rating aggregates of delivery partners, logistics partners and vendors from their ratings'
+
+    def rating_sources(self):
+        """(model, (pk, value, rated_at) rows) for every rated model; must match the signals that keep them live"""
+        receipts = StockReceiptConfirmation.objects.order_by()
+        return [
+            (DeliveryPartner, Delivery.objects.filter(
+                delivery_partner__isnull=False, customer_rating__isnull=False
+            ).annotate(
+                rated_at=Coalesce('delivered_at', 'assigned_at')
+            ).values_list('delivery_partner_id', 'customer_rating', 'rated_at').order_by()),
+            (LogisticsPartner, receipts.values_list(
+                'delivery_schedule__assigned_partner_id', 'condition_rating', 'confirmed_at'
+            )),
+            (VendorProfile, receipts.values_list(
+                'delivery_schedule__vendor_id', 'condition_rating', 'confirmed_at'
+            )),
+        ]
+
+    def handle(self, *args, **options):
+        for model, ratings in self.rating_sources():
+            changed = rebuild_ratings(model, ratings.iterator())
+            for row in changed[:10]:
+                self.stdout.write(self.style.WARNING(
+                    f'  {row}: {row.rating} from {row.rating_count} ratings (had drifted)'
+                ))
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural.capitalize()}: ratings rebuilt, {len(changed)} changed'
+            ))
@@ -0,0 +1,144 @@
+# reviews/ratings.py - Running rating aggregates for rated partners and vendors
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Cast, Greatest, Round
+
+RATING_DEFAULTS = {
+    'HALF_LIFE_DAYS': None,  # None: every rating counts the same
+}
+
+# Weights grow from this date instead of older ratings shrinking, so a new
+# rating is a plain addition and never rewrites the ones before it
+RATING_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def rating_settings():
+    return {**RATING_DEFAULTS, **getattr(settings, 'RATING_AGGREGATES', {})}
+
+
+class RatedModel(models.Model):
+    """
+    Running rating aggregates next to the model's rating field. rating is
+    the weighted average, rating_weighted_sum / rating_weight, and equals
+    rating_sum / rating_count unless RATING_AGGREGATES["HALF_LIFE_DAYS"]
+    is set. All of these are written only by adjust_rating and
+    rebuild_ratings; ordinary saves of an existing row leave them alone so
+    a stale instance never overwrites them.
+    """
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_weight = models.FloatField(default=0, editable=False)
+    rating_weighted_sum = models.FloatField(default=0, editable=False)
+
+    # Columns kept up to date with F() updates rather than save()
+    MAINTAINED_FIELDS = ('rating', 'rating_count', 'rating_sum', 'rating_weight', 'rating_weighted_sum')
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # A plain save() leaves the maintained columns out of its UPDATE. Inserts,
+        # including the fallback when the row no longer exists, still write them.
+        if update_fields is None:
+            values = [value for value in values if value[0].name not in self.MAINTAINED_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+def weight_at(rated_at, half_life_days=None):
+    """Weight of a rating given at rated_at: doubles every half-life after RATING_EPOCH, else 1"""
+    if half_life_days is None:
+        half_life_days = rating_settings()['HALF_LIFE_DAYS']
+    if not half_life_days or rated_at is None:
+        return 1.0
+    return 2.0 ** ((rated_at - RATING_EPOCH).total_seconds() / (half_life_days * 86400))
+
+
+def adjust_rating(model, pk, add=None, remove=None):
+    """
+    Add and/or remove one (value, rated_at) rating on a row in a single
+    UPDATE. The average is recomputed from the new aggregates in the same
+    statement, so concurrent ratings never lose each other.
+    """
+    if add == remove:
+        return
+    count = total = weight = weighted = 0
+    for sign, rating in ((1, add), (-1, remove)):
+        if rating is not None:
+            value, rated_at = rating
+            w = weight_at(rated_at)
+            count += sign
+            total += sign * value
+            weight += sign * w
+            weighted += sign * value * w
+
+    average = Cast(
+        Round((F('rating_weighted_sum') + weighted) / (F('rating_weight') + weight), 2),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+    model.objects.filter(pk=pk).update(
+        rating_count=Greatest(F('rating_count') + count, Value(0)),
+        rating_sum=Greatest(F('rating_sum') + total, Value(0)),
+        rating_weight=F('rating_weight') + weight,
+        rating_weighted_sum=F('rating_weighted_sum') + weighted,
+        rating=Case(
+            When(rating_count__gt=-count, then=average),
+            default=Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    )
+
+
+def move_rating(model, old, new):
+    """
+    Re-file one rating that was (pk, value, rated_at) and is now (pk,
+    value, rated_at); a None pk or value means it was, or is, not counted.
+    """
+    if old == new:
+        return
+    old_pk, old_value, old_rated_at = old
+    new_pk, new_value, new_rated_at = new
+    remove = (old_value, old_rated_at) if old_pk and old_value else None
+    add = (new_value, new_rated_at) if new_pk and new_value else None
+    if old_pk == new_pk:
+        if old_pk:
+            adjust_rating(model, old_pk, add=add, remove=remove)
+        return
+    if remove:
+        adjust_rating(model, old_pk, remove=remove)
+    if add:
+        adjust_rating(model, new_pk, add=add)
+
+
+@transaction.atomic
+def rebuild_ratings(model, ratings):
+    """
+    Recompute every row's aggregates from (pk, value, rated_at) ratings,
+    resetting rows without any; returns the rows whose rating changed.
+    """
+    half_life_days = rating_settings()['HALF_LIFE_DAYS']
+    totals = {}
+    for pk, value, rated_at in ratings:
+        if not pk or not value:
+            continue
+        w = weight_at(rated_at, half_life_days)
+        count, total, weight, weighted = totals.get(pk, (0, 0, 0.0, 0.0))
+        totals[pk] = (count + 1, total + value, weight + w, weighted + value * w)
+
+    rows = list(model.objects.select_for_update().only('pk', *RatedModel.MAINTAINED_FIELDS))
+    changed = []
+    for row in rows:
+        count, total, weight, weighted = totals.get(row.pk, (0, 0, 0.0, 0.0))
+        rating = Decimal(str(round(weighted / weight, 2))).quantize(Decimal('0.01')) if count else Decimal('0.00')
+        if rating != row.rating or count != row.rating_count:
+            changed.append(row)
+        row.rating_count = count
+        row.rating_sum = total
+        row.rating_weight = weight
+        row.rating_weighted_sum = weighted
+        row.rating = rating
+    model.objects.bulk_update(rows, RatedModel.MAINTAINED_FIELDS, batch_size=500)
+    return changed
@@ -1,3 +1,91 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from delivery.models import Delivery, DeliveryPartner
+from orders.models import Order
+from .ratings import RATING_EPOCH, rebuild_ratings, weight_at
+
+User = get_user_model()
+
+
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass')
+        cls.partner = cls.delivery_partner('Fast')
+
+    @staticmethod
+    def delivery_partner(name):
+        return DeliveryPartner.objects.create(
+            name=name, contact_person='Contact', phone='1234567890', email=f'{name.lower()}@example.com', address='Depot',
+        )
+
+    def rated_delivery(self, rating, partner=None):
+        order = Order.objects.create(user=self.user, subtotal=0, total_amount=0, status='confirmed')
+        delivery = Delivery.objects.get(order=order)
+        delivery.delivery_partner = partner or self.partner
+        delivery.customer_rating = rating
+        delivery.save()
+        return delivery
+
+    def aggregates(self, partner=None):
+        partner = partner or self.partner
+        partner.refresh_from_db()
+        return partner.rating, partner.rating_count, partner.rating_sum
+
+    def test_ratings_are_added_changed_moved_and_removed(self):
+        first = self.rated_delivery(4)
+        self.rated_delivery(5)
+        self.assertEqual(self.aggregates(), (Decimal('4.50'), 2, 9))
+
+        first.customer_rating = 2
+        first.save()
+        self.assertEqual(self.aggregates(), (Decimal('3.50'), 2, 7))
+
+        other = self.delivery_partner('Other')
+        first.delivery_partner = other
+        first.save()
+        self.assertEqual(self.aggregates(), (Decimal('5.00'), 1, 5))
+        self.assertEqual(self.aggregates(other), (Decimal('2.00'), 1, 2))
+
+        first.delete()
+        self.assertEqual(self.aggregates(other), (Decimal('0.00'), 0, 0))
+
+    def test_plain_save_of_a_stale_partner_keeps_the_aggregates(self):
+        stale = DeliveryPartner.objects.get(pk=self.partner.pk)
+        self.rated_delivery(4)
+
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertEqual(self.aggregates(), (Decimal('4.00'), 1, 4))
+        self.assertEqual(self.partner.name, 'Renamed')
+
+        # Naming a maintained field writes it on purpose
+        stale.rating = Decimal('1.00')
+        stale.save(update_fields=['rating'])
+        self.assertEqual(self.aggregates(), (Decimal('1.00'), 1, 4))
+
+    @override_settings(RATING_AGGREGATES={'HALF_LIFE_DAYS': 30})
+    def test_half_life_weights_recent_ratings_more(self):
+        self.assertEqual(weight_at(RATING_EPOCH), 1.0)
+        self.assertAlmostEqual(weight_at(RATING_EPOCH + timedelta(days=60)), 4.0)
+
+        old, recent = self.rated_delivery(1), self.rated_delivery(5)
+        Delivery.objects.filter(pk=old.pk).update(assigned_at=RATING_EPOCH)
+        Delivery.objects.filter(pk=recent.pk).update(assigned_at=RATING_EPOCH + timedelta(days=30))
+        rebuild_ratings(DeliveryPartner, Delivery.objects.values_list('delivery_partner_id', 'customer_rating', 'assigned_at'))
+        # Weights 1 and 2: (1 + 10) / 3
+        self.assertEqual(self.aggregates(), (Decimal('3.67'), 2, 6))
+
+    def test_rebuild_repairs_drift_and_reports_it(self):
+        self.rated_delivery(3)
+        untouched = self.delivery_partner('Unrated')
+        DeliveryPartner.objects.filter(pk=self.partner.pk).update(rating=Decimal('4.90'), rating_count=7)
+        ratings = Delivery.objects.values_list('delivery_partner_id', 'customer_rating', 'assigned_at')
+
+        self.assertEqual(rebuild_ratings(DeliveryPartner, ratings), [self.partner])
+        self.assertEqual(self.aggregates(), (Decimal('3.00'), 1, 3))
+        self.assertEqual(self.aggregates(untouched), (Decimal('0.00'), 0, 0))
+        self.assertEqual(rebuild_ratings(DeliveryPartner, ratings), [])
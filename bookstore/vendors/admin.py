@@ -4,10 +4,10 @@ from .models import VendorProfile, StockOffer, VendorTicket, VendorTicketRespons
 
 @admin.register(VendorProfile)
 class VendorProfileAdmin(admin.ModelAdmin):
-    list_display = ['business_name', 'contact_person', 'status', 'rating', 'created_at']
+    list_display = ['business_name', 'contact_person', 'status', 'rating', 'rating_count', 'created_at']
     list_filter = ['status', 'city', 'state']
     search_fields = ['business_name', 'contact_person', 'email']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['rating', 'rating_count', 'created_at', 'updated_at']
 
 @admin.register(StockOffer)
 class StockOfferAdmin(admin.ModelAdmin):
@@ -0,0 +1,49 @@
+# vendors/consumers.py
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import VendorProfile
+from .notification_push import vendor_group, unread_count
+
+
+class VendorNotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes OfferStatusNotification rows to a logged-in vendor's open pages"""
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.vendor_id = await self.get_vendor_id(user)
+        if self.vendor_id is None:
+            await self.close()
+            return
+
+        self.group_name = vendor_group(self.vendor_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json({'type': 'unread_count', 'unread_count': await self.get_unread_count()})
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_created(self, event):
+        await self.send_json({
+            'type': 'notification',
+            'notification': event['notification'],
+            'unread_count': event['unread_count'],
+        })
+
+    async def notification_count(self, event):
+        await self.send_json({'type': 'unread_count', 'unread_count': event['unread_count']})
+
+    @database_sync_to_async
+    def get_vendor_id(self, user):
+        return VendorProfile.objects.filter(user=user).values_list('pk', flat=True).first()
+
+    @database_sync_to_async
+    def get_unread_count(self):
+        return unread_count(self.vendor_id)
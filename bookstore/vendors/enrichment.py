@@ -0,0 +1,63 @@
+# vendors/enrichment.py - Batch enrichment of book lists for vendor APIs
+from django.db.models import Sum, Count, Max, Q
+from warehouse.models import Stock
+from warehouse.inventory import stock_level
+from .models import StockOffer
+
+EMPTY_OFFER_SUMMARY = {
+    'pending_quantity': None,
+    'approved_quantity': None,
+    'total_offers': 0,
+    'latest_offer_date': None,
+}
+
+
+def with_stock_data(books):
+    """Join stock and forecast, prefetch authors: one query plus one for authors"""
+    return books.select_related('category', 'stock', 'demand_forecast').prefetch_related('authors')
+
+
+def offer_summaries(vendor_profile, book_ids):
+    """This vendor's offer totals per book, grouped in one query"""
+    rows = StockOffer.objects.filter(
+        vendor=vendor_profile,
+        book_id__in=book_ids,
+    ).values('book_id').annotate(
+        pending_quantity=Sum('quantity', filter=Q(status='pending')),
+        approved_quantity=Sum('quantity', filter=Q(status='approved')),
+        total_offers=Count('id'),
+        latest_offer_date=Max('created_at'),
+    ).order_by()
+    return {row['book_id']: row for row in rows}
+
+
+def book_stock(book):
+    """The book's Stock from select_related, or None (never queries)"""
+    try:
+        return book.stock
+    except Stock.DoesNotExist:
+        return None
+
+
+def enrich_books(books, vendor_profile):
+    """
+    Yield (book, stock_info, offers) for a page of books.
+
+    Expects books from with_stock_data(), so stock, forecast and authors are
+    already loaded; offers for the whole page come from one extra grouped
+    query and suggestions are computed in memory. stock_info is None for
+    books without a stock record.
+    """
+    books = list(books)
+    offers = offer_summaries(vendor_profile, [book.id for book in books])
+
+    for book in books:
+        stock = book_stock(book)
+        stock_info = None
+        if stock is not None:
+            stock_info = {
+                'stock': stock,
+                'status': stock_level(stock.available_quantity, stock.reorder_level),
+                'suggested_quantity': stock.suggested_order_quantity,
+            }
+        yield book, stock_info, offers.get(book.id, EMPTY_OFFER_SUMMARY)
@@ -436,9 +436,58 @@ class CategoryBulkOfferForm(forms.Form):
                 )
         
         return cleaned_data
-    
 
 
+class OfferUploadForm(forms.Form):
+    """CSV/XLSX upload of many offers; the dates and notes are defaults for rows that leave them blank"""
+
+    offers_file = forms.FileField(
+        help_text="Columns: book_id or isbn, quantity, unit_price, and optionally availability_date, expiry_date, notes",
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx'
+        })
+    )
+    availability_date = forms.DateField(
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control'
+        })
+    )
+    expiry_date = forms.DateField(
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control'
+        })
+    )
+    notes = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 3,
+            'placeholder': 'Notes added to every offer in the file...'
+        })
+    )
+
+    def clean_offers_file(self):
+        offers_file = self.cleaned_data.get('offers_file')
+        if offers_file and not offers_file.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Please upload a .csv or .xlsx file.")
+        return offers_file
+
+    def clean(self):
+        cleaned_data = super().clean()
+        availability_date = cleaned_data.get('availability_date')
+        expiry_date = cleaned_data.get('expiry_date')
+
+        if availability_date and expiry_date:
+            if expiry_date <= availability_date:
+                raise forms.ValidationError(
+                    "Expiry date must be after availability date."
+                )
+
+        return cleaned_data
+
 
 class DeliveryScheduleForm(forms.ModelForm):
     class Meta:
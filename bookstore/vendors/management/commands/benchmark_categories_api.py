@@ -0,0 +1,101 @@
+# vendors/management/commands/benchmark_categories_api.py
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from books.models import Book, Category
+from warehouse.models import Stock
+from warehouse.opportunities import category_stock_summary
+from warehouse.summaries import category_stock_counts, invalidate_stock_summaries
+
+FIXTURE_SLUG = 'benchmark-categories-api'
+
+class Command(BaseCommand):
+    help = 'Compare query counts of the per-book categories_api loop with the grouped aggregate'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Add a temporary category with this many books (removed afterwards)'
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.create_fixture(options['seed'])
+
+        try:
+            legacy = self.measure('Per-book loop (old)', self.legacy_counts)
+            grouped = self.measure('Grouped aggregate', category_stock_counts)
+            self.measure('CategoryStock rows', category_stock_summary)
+
+            if self.normalize(legacy) != self.normalize(grouped):
+                self.stdout.write(self.style.ERROR('Results differ between implementations!'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Both implementations return the same counts'))
+        finally:
+            if options['seed']:
+                Book.objects.filter(category__slug=FIXTURE_SLUG).delete()
+                Category.objects.filter(slug=FIXTURE_SLUG).delete()
+                invalidate_stock_summaries()
+
+    def measure(self, label, func):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label}: {len(queries)} queries, {elapsed * 1000:.1f} ms')
+        return result
+
+    def normalize(self, rows):
+        keys = ['out_of_stock_books', 'low_stock_books', 'in_stock_books', 'no_stock_record', 'total_books']
+        return sorted((row['id'], tuple(row[key] for key in keys)) for row in rows)
+
+    def legacy_counts(self):
+        """The original categories_api algorithm: one Stock lookup per book"""
+        categories = Category.objects.filter(
+            is_active=True,
+            books__status__in=['available', 'out_of_stock']
+        ).distinct().annotate(
+            total_books=Count('books', filter=Q(books__status__in=['available', 'out_of_stock']))
+        ).filter(total_books__gt=0)
+
+        rows = []
+        for category in categories:
+            counts = {'out_of_stock_books': 0, 'low_stock_books': 0, 'in_stock_books': 0, 'no_stock_record': 0}
+            for book in Book.objects.filter(category=category, status__in=['available', 'out_of_stock']):
+                try:
+                    stock = Stock.objects.get(book=book)
+                    if stock.available_quantity <= 0:
+                        counts['out_of_stock_books'] += 1
+                    elif stock.available_quantity <= stock.reorder_level:
+                        counts['low_stock_books'] += 1
+                    else:
+                        counts['in_stock_books'] += 1
+                except Stock.DoesNotExist:
+                    counts['no_stock_record'] += 1
+            rows.append({'id': category.id, 'total_books': category.total_books, **counts})
+        return rows
+
+    def create_fixture(self, count):
+        category = Category.objects.create(name='Benchmark categories_api', slug=FIXTURE_SLUG)
+        books = Book.objects.bulk_create([
+            Book(
+                title=f'Benchmark book {i}', slug=f'{FIXTURE_SLUG}-{i}', category=category,
+                description='Created by benchmark_categories_api', price=1,
+                status='out_of_stock' if i % 4 == 0 else 'available',
+            )
+            for i in range(count)
+        ], batch_size=500)
+        if any(book.pk is None for book in books):
+            books = list(Book.objects.filter(category=category))
+
+        # Mix of out of stock, low stock, in stock and missing records
+        Stock.objects.bulk_create([
+            Stock(book=book, quantity=(i % 4) * 10, reserved_quantity=0, reorder_level=10)
+            for i, book in enumerate(books) if i % 5
+        ], batch_size=500)
+        self.stdout.write(f'Seeded {count} books in "{category.name}"')
@@ -0,0 +1,11 @@
+# vendors/management/commands/recount_vendor_notifications.py
+
+from django.core.management.base import BaseCommand
+from vendors.summaries import recount_unread_notifications
+
+class Command(BaseCommand):
+    help = 'Rebuild VendorProfile.unread_notification_count from the notifications table'
+
+    def handle(self, *args, **options):
+        updated = recount_unread_notifications()
+        self.stdout.write(self.style.SUCCESS(f'Recounted unread notifications for {updated} vendors'))
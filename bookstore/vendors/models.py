@@ -2,10 +2,11 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from books.models import Book
+from reviews.ratings import RatedModel
 
 User = get_user_model()
 
-class VendorProfile(models.Model):
+class VendorProfile(RatedModel):
     VENDOR_STATUS = (
         ('pending', 'Pending Approval'),
         ('approved', 'Approved'),
@@ -33,11 +34,19 @@ class VendorProfile(models.Model):
     ifsc_code = models.CharField(max_length=20, blank=True)
     
     status = models.CharField(max_length=20, choices=VENDOR_STATUS, default='pending')
+    # Average condition rating of delivered stock; maintained from StockReceiptConfirmation
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     
+    # Maintained by vendors.signals; see recount_vendor_notifications
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # unread_notification_count is only changed with F() updates too; saves never
+    # write back a stale in-memory value
+    MAINTAINED_FIELDS = RatedModel.MAINTAINED_FIELDS + ('unread_notification_count',)
+    
     def __str__(self):
         return self.business_name
 
@@ -160,6 +169,7 @@ class VendorTicketResponse(models.Model):
 class OfferStatusNotification(models.Model):
     stock_offer = models.ForeignKey(StockOffer, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=[
+        ('submitted', 'Offer Submitted - Awaiting Review'),
         ('approved', 'Offer Approved - Schedule Delivery'),
         ('pickup_scheduled', 'Pickup Scheduled'),
         ('in_transit', 'Books in Transit'),
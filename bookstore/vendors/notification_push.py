@@ -0,0 +1,59 @@
+# vendors/notification_push.py - Fan out vendor notifications over the channel layer
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .models import VendorProfile
+
+logger = logging.getLogger(__name__)
+
+
+def vendor_group(vendor_id):
+    """Channel layer group joined by every open notification socket of a vendor"""
+    return f'vendor_notifications_{vendor_id}'
+
+
+def notification_payload(notification):
+    offer = notification.stock_offer
+    return {
+        'id': notification.pk,
+        'status': notification.status,
+        'status_display': notification.get_status_display(),
+        'message': notification.message,
+        'offer_id': offer.pk,
+        'book_title': offer.book.title,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def unread_count(vendor_id):
+    return VendorProfile.objects.filter(pk=vendor_id).values_list('unread_notification_count', flat=True).first() or 0
+
+
+def _group_send(vendor_id, message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(vendor_group(vendor_id), message)
+    except Exception as e:
+        # Pushing is best effort: pages fall back to polling notifications_count
+        logger.warning(f"Could not push notification to vendor {vendor_id}: {e}")
+
+
+def push_notification(notification):
+    """Send a new notification, with the vendor's unread count, to their open sockets"""
+    vendor_id = notification.stock_offer.vendor_id
+    _group_send(vendor_id, {
+        'type': 'notification.created',
+        'notification': notification_payload(notification),
+        'unread_count': unread_count(vendor_id),
+    })
+
+
+def push_unread_count(vendor_id):
+    """Send only the unread count, e.g. after bulk inserts or marking everything read"""
+    _group_send(vendor_id, {
+        'type': 'notification.count',
+        'unread_count': unread_count(vendor_id),
+    })
@@ -0,0 +1,333 @@
+# vendors/offer_upload.py - Bulk stock offer creation and CSV/XLSX offer upload
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from books.identifier_index import book_index, normalize_isbn
+from books.models import Book
+from warehouse.summaries import OFFERABLE_STATUSES
+from .enrichment import book_stock
+from .models import StockOffer, OfferStatusNotification
+from .summaries import invalidate_vendor_summary
+
+UPLOAD_CHUNK_SIZE = 500
+WRITE_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+
+# Quantity suggested for books that have no stock record yet
+NO_STOCK_SUGGESTED_QUANTITY = 20
+
+# Largest value an integer column holds on every supported database
+MAX_INTEGER = 2 ** 31 - 1
+
+OFFER_UPLOAD_COLUMNS = ['book_id', 'isbn', 'quantity', 'unit_price', 'availability_date', 'expiry_date', 'notes']
+
+
+class OfferUploadError(Exception):
+    """The uploaded file cannot be read at all"""
+
+
+class OfferRowError(ValueError):
+    """One row of an upload is invalid"""
+
+
+def suggested_quantity(book):
+    """Suggested offer quantity for a book loaded with stock and demand_forecast"""
+    stock = book_stock(book)
+    if stock is None:
+        return NO_STOCK_SUGGESTED_QUANTITY
+    return stock.suggested_order_quantity
+
+
+def new_offer(vendor_profile, book, quantity, unit_price, availability_date, expiry_date, notes=''):
+    """Unsaved StockOffer with total_amount filled in, since bulk_create skips save()"""
+    unit_price = Decimal(str(unit_price))
+    return StockOffer(
+        vendor=vendor_profile,
+        book=book,
+        quantity=quantity,
+        unit_price=unit_price,
+        total_amount=quantity * unit_price,
+        availability_date=availability_date,
+        expiry_date=expiry_date,
+        notes=notes,
+    )
+
+
+@transaction.atomic
+def create_offers(vendor_profile, offers, notify=False):
+    """
+    Insert offers with bulk_create. With notify, each offer also gets a
+    'submitted' OfferStatusNotification, inserted in bulk as well. The
+    vendor submitted these offers themselves, so the notifications are
+    filed as already read and leave the unread count alone.
+    """
+    if not offers:
+        return []
+
+    offers = StockOffer.objects.bulk_create(offers, batch_size=WRITE_BATCH_SIZE)
+
+    if notify:
+        OfferStatusNotification.objects.bulk_create([
+            OfferStatusNotification(
+                stock_offer=offer,
+                status='submitted',
+                message=f"Your offer for '{offer.book.title}' ({offer.quantity} copies at ₹{offer.unit_price}) has been received and is awaiting review.",
+                is_read=True,
+            )
+            for offer in offers
+        ], batch_size=WRITE_BATCH_SIZE)
+
+    transaction.on_commit(lambda: invalidate_vendor_summary(vendor_profile.pk))
+    return offers
+
+
+class OfferUploadResult:
+    def __init__(self):
+        self.created = 0
+        self.total_value = Decimal('0')
+        self.error_count = 0
+        self.errors = []  # (row number, message), capped at MAX_REPORTED_ERRORS
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def _csv_rows(upload):
+    text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise OfferUploadError(f'Could not read CSV file: {e}')
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(upload):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise OfferUploadError('XLSX uploads are not available on this server; please upload a CSV file.')
+
+    try:
+        workbook = load_workbook(upload.file, read_only=True, data_only=True)
+    except Exception as e:
+        raise OfferUploadError(f'Could not read XLSX file: {e}')
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_offer_rows(upload):
+    """
+    Yield (row_number, {column: value}) for every non-empty data row of an
+    uploaded CSV or XLSX file, reading it incrementally.
+    """
+    name = upload.name.lower()
+    if name.endswith('.csv'):
+        rows = _csv_rows(upload)
+    elif name.endswith('.xlsx'):
+        rows = _xlsx_rows(upload)
+    else:
+        raise OfferUploadError('Please upload a .csv or .xlsx file.')
+
+    header = next(rows, None)
+    if header is None:
+        raise OfferUploadError('The uploaded file is empty.')
+
+    columns = [str(value or '').strip().lower().replace(' ', '_') for value in header]
+    if 'book_id' not in columns and 'isbn' not in columns:
+        raise OfferUploadError('The file needs a "book_id" or "isbn" column.')
+    missing = [column for column in ('quantity', 'unit_price') if column not in columns]
+    if missing:
+        raise OfferUploadError(f'Missing column(s): {", ".join(missing)}')
+
+    for row_number, values in enumerate(rows, start=2):
+        if all(value is None or str(value).strip() == '' for value in values):
+            continue
+        yield row_number, dict(zip(columns, values))
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _whole_number(value):
+    """
+    The integer a cell holds, or None. Spreadsheets hand numbers over as
+    floats, so "12.0" is 12, but "1.5" is rejected rather than truncated,
+    and so is anything an integer column cannot store.
+    """
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or number != number.to_integral_value() or abs(number) > MAX_INTEGER:
+        return None
+    return int(number)
+
+
+def _amount_limit(field_name):
+    """Smallest amount too large for a StockOffer decimal field"""
+    field = StockOffer._meta.get_field(field_name)
+    return Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+def _to_date(value, default):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not _text(value):
+        return default
+    try:
+        parsed = parse_date(_text(value))
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise OfferRowError(f'Invalid date "{value}", use YYYY-MM-DD')
+    return parsed
+
+
+def _parse_row(row, defaults):
+    """Check one row's own values; book lookups happen per chunk"""
+    book_id = _text(row.get('book_id'))
+    isbn = normalize_isbn(row.get('isbn'))
+    if not book_id and not isbn:
+        raise OfferRowError('Either book_id or isbn is required')
+    if book_id:
+        book_id = _whole_number(book_id)
+        if book_id is None or book_id <= 0:
+            raise OfferRowError(f'Invalid book_id "{row.get("book_id")}"')
+
+    quantity = None
+    if _text(row.get('quantity')):
+        try:
+            quantity = Decimal(_text(row.get('quantity')))
+        except InvalidOperation:
+            raise OfferRowError(f'Invalid quantity "{row.get("quantity")}"')
+        if not quantity.is_finite() or quantity != quantity.to_integral_value() or quantity <= 0:
+            raise OfferRowError('Quantity must be a whole number above zero')
+        if quantity > MAX_INTEGER:
+            raise OfferRowError(f'Quantity must be at most {MAX_INTEGER}')
+        quantity = int(quantity)
+
+    try:
+        unit_price = Decimal(_text(row.get('unit_price'))).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise OfferRowError(f'Invalid unit_price "{row.get("unit_price")}"')
+    if not unit_price.is_finite() or unit_price <= 0:
+        raise OfferRowError('Unit price must be above zero')
+    if unit_price >= _amount_limit('unit_price'):
+        raise OfferRowError(f'Unit price must be below {_amount_limit("unit_price")}')
+    if quantity and quantity * unit_price >= _amount_limit('total_amount'):
+        raise OfferRowError(f'Total amount must be below {_amount_limit("total_amount")}')
+
+    availability_date = _to_date(row.get('availability_date'), defaults['availability_date'])
+    expiry_date = _to_date(row.get('expiry_date'), defaults['expiry_date'])
+    if expiry_date <= availability_date:
+        raise OfferRowError('Expiry date must be after availability date')
+
+    notes = _text(row.get('notes')) or defaults['notes']
+    return book_id, isbn, quantity, unit_price, availability_date, expiry_date, notes
+
+
+def _load_books(parsed):
+    """
+    Books referenced by a chunk, with stock and forecast, in one query.
+    ISBNs are resolved through the identifier index, which matches them
+    however the catalogue formatted them.
+    """
+    book_ids = {values[0] for values in parsed if values[0]}
+    isbn_ids = {}
+    for values in parsed:
+        isbn = values[1]
+        if isbn and not values[0] and isbn not in isbn_ids:
+            isbn_ids[isbn] = book_index.lookup(isbn=isbn, isbn13=isbn)
+    unresolved = [isbn for isbn, book_id in isbn_ids.items() if book_id is None]
+
+    books = Book.objects.filter(
+        Q(pk__in=book_ids | {book_id for book_id in isbn_ids.values() if book_id})
+        | Q(isbn__in=unresolved) | Q(isbn13__in=unresolved)
+    ).select_related('stock', 'demand_forecast')
+
+    by_id = {book.pk: book for book in books}
+    by_isbn = {isbn: by_id.get(book_id) for isbn, book_id in isbn_ids.items() if book_id}
+    for book in by_id.values():
+        for isbn in (book.isbn, book.isbn13):
+            if isbn:
+                by_isbn.setdefault(normalize_isbn(isbn), book)
+    return by_id, by_isbn
+
+
+def _import_chunk(vendor_profile, chunk, defaults, seen_books, result):
+    parsed = []
+    for row_number, row in chunk:
+        try:
+            parsed.append((row_number, _parse_row(row, defaults)))
+        except OfferRowError as e:
+            result.add_error(row_number, str(e))
+
+    by_id, by_isbn = _load_books([values for row_number, values in parsed])
+
+    offers = []
+    for row_number, (book_id, isbn, quantity, unit_price, availability_date, expiry_date, notes) in parsed:
+        book = by_id.get(book_id) if book_id else by_isbn.get(isbn)
+        if book is None:
+            result.add_error(row_number, f'Book not found ({"book_id " + str(book_id) if book_id else "ISBN " + isbn})')
+            continue
+        if book.status not in OFFERABLE_STATUSES:
+            result.add_error(row_number, f'"{book.title}" is not accepting offers ({book.get_status_display()})')
+            continue
+        if book.pk in seen_books:
+            result.add_error(row_number, f'"{book.title}" is already offered on row {seen_books[book.pk]}')
+            continue
+        seen_books[book.pk] = row_number
+
+        offers.append(new_offer(
+            vendor_profile, book, quantity or suggested_quantity(book), unit_price,
+            availability_date, expiry_date, notes,
+        ))
+
+    create_offers(vendor_profile, offers, notify=True)
+    result.created += len(offers)
+    result.total_value += sum((offer.total_amount for offer in offers), Decimal('0'))
+
+
+def import_offer_upload(vendor_profile, upload, availability_date, expiry_date, notes=''):
+    """
+    Create offers from an uploaded CSV/XLSX file.
+
+    Rows are read incrementally and validated in chunks of UPLOAD_CHUNK_SIZE
+    against books (and their stock, for blank quantities) loaded with one
+    query per chunk. Valid rows are inserted with bulk_create inside one
+    transaction; invalid rows are reported on the result, not raised.
+    Dates, notes and a blank quantity fall back to the given defaults and
+    the book's suggested order quantity.
+    """
+    defaults = {
+        'availability_date': availability_date,
+        'expiry_date': expiry_date,
+        'notes': f"{notes}\n[Offer upload: {upload.name}]".strip(),
+    }
+    result = OfferUploadResult()
+    seen_books = {}
+
+    with transaction.atomic():
+        chunk = []
+        for row in read_offer_rows(upload):
+            chunk.append(row)
+            if len(chunk) >= UPLOAD_CHUNK_SIZE:
+                _import_chunk(vendor_profile, chunk, defaults, seen_books, result)
+                chunk = []
+        if chunk:
+            _import_chunk(vendor_profile, chunk, defaults, seen_books, result)
+
+    return result
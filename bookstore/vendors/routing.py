@@ -0,0 +1,7 @@
+# vendors/routing.py
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/vendors/notifications/', consumers.VendorNotificationConsumer.as_asgi()),
+]
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from logistics.models import DeliverySchedule
+from .models import StockOffer, OfferStatusNotification
+from .summaries import invalidate_vendor_summary, adjust_unread_count, recount_unread_notifications
+from .notification_push import push_notification
+
+@receiver(post_save, sender=StockOffer)
+@receiver(post_save, sender=DeliverySchedule)
+def invalidate_vendor_summary_on_change(sender, instance, **kwargs):
+    invalidate_vendor_summary(instance.vendor_id)
+
+@receiver(post_delete, sender=StockOffer)
+def refresh_vendor_on_offer_delete(sender, instance, **kwargs):
+    invalidate_vendor_summary(instance.vendor_id)
+    # Its notifications are gone too
+    recount_unread_notifications([instance.vendor_id])
+
+@receiver(post_delete, sender=DeliverySchedule)
+def invalidate_vendor_summary_on_delete(sender, instance, **kwargs):
+    invalidate_vendor_summary(instance.vendor_id)
+
+@receiver(post_save, sender=OfferStatusNotification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    """Keep VendorProfile.unread_notification_count in step and push new notifications to open pages"""
+    vendor_id = instance.stock_offer.vendor_id
+    if created:
+        if not instance.is_read:
+            adjust_unread_count(vendor_id, 1)
+        transaction.on_commit(lambda: push_notification(instance))
+    else:
+        # Individual notifications are rarely edited; recount just this vendor
+        recount_unread_notifications([vendor_id])
+
+@receiver(post_delete, sender=OfferStatusNotification)
+def uncount_unread_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        vendor_id = StockOffer.objects.filter(pk=instance.stock_offer_id).values_list('vendor_id', flat=True).first()
+        if vendor_id:
+            adjust_unread_count(vendor_id, -1)
@@ -0,0 +1,125 @@
+# vendors/summaries.py - Cached per-vendor dashboard summary
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from logistics.models import DeliverySchedule
+from warehouse.models import BookOpportunity
+from warehouse.opportunities import opportunity_totals
+from warehouse.summaries import stock_summary_version
+from .models import VendorProfile, StockOffer, OfferStatusNotification
+from .notification_push import push_unread_count
+
+VENDOR_SUMMARY_CACHE_TIMEOUT = 60 * 10
+
+ACTIVE_DELIVERY_STATUSES = ['scheduled', 'confirmed', 'pickup_assigned', 'collected', 'in_transit', 'arrived']
+
+
+def _summary_key(vendor_id):
+    return f'vendor_dashboard_summary:{vendor_id}'
+
+
+def invalidate_vendor_summary(vendor_id):
+    # Older stock versions are unreachable already
+    cache.delete(_summary_key(vendor_id), version=stock_summary_version())
+
+
+def offer_counts(vendor_profile):
+    """All offer counters for the dashboard in one conditional aggregate"""
+    return StockOffer.objects.filter(vendor=vendor_profile).aggregate(
+        total_offers=Count('id'),
+        pending_offers=Count('id', filter=Q(status='pending')),
+        # DeliverySchedule.stock_offer is one-to-one, so the join cannot duplicate rows
+        approved_offers=Count('id', filter=Q(status='approved', deliveryschedule__isnull=True)),
+        processed_offers=Count('id', filter=Q(status='processed')),
+    )
+
+
+def delivery_counts(vendor_profile):
+    return DeliverySchedule.objects.filter(vendor=vendor_profile).aggregate(
+        active_deliveries=Count('id', filter=Q(status__in=ACTIVE_DELIVERY_STATUSES)),
+        completed_deliveries=Count('id', filter=Q(status='completed')),
+    )
+
+
+def vendor_opportunities(vendor_profile):
+    """Warehouse opportunity counts from the precomputed opportunity tables"""
+    totals = opportunity_totals()
+    out_of_stock_books = totals['out_of_stock_books']
+    low_stock_books = totals['low_stock_books']
+    books_without_stock = totals['no_stock_record']
+
+    # High priority books this vendor hasn't offered in the last week
+    recent_offer = StockOffer.objects.filter(
+        vendor=vendor_profile,
+        book=OuterRef('book_id'),
+        status__in=['pending', 'approved'],
+        created_at__gte=timezone.now() - timedelta(days=7),
+    )
+    high_priority_opportunities = BookOpportunity.objects.filter(
+        level__in=['out_of_stock', 'no_stock'],
+    ).exclude(Exists(recent_offer)).count()
+
+    return {
+        'out_of_stock_books': out_of_stock_books,
+        'low_stock_books': low_stock_books,
+        'books_without_stock': books_without_stock,
+        'total_opportunities': out_of_stock_books + low_stock_books + books_without_stock,
+        'categories_needing_attention': totals['categories_needing_attention'],
+        'high_priority_opportunities': high_priority_opportunities,
+        'show_alerts': out_of_stock_books > 0 or books_without_stock > 0,
+    }
+
+
+def vendor_summary(vendor_profile):
+    """
+    Dashboard counters for one vendor, cached until one of the vendor's
+    offers or deliveries changes (or any stock level changes, via the
+    stock summary version).
+    """
+    key = _summary_key(vendor_profile.pk)
+    version = stock_summary_version()
+    summary = cache.get(key, version=version)
+    if summary is None:
+        summary = {
+            **offer_counts(vendor_profile),
+            **delivery_counts(vendor_profile),
+            'warehouse_opportunities': vendor_opportunities(vendor_profile),
+        }
+        cache.set(key, summary, VENDOR_SUMMARY_CACHE_TIMEOUT, version=version)
+    return summary
+
+
+def adjust_unread_count(vendor_id, delta):
+    VendorProfile.objects.filter(pk=vendor_id).update(
+        unread_notification_count=Greatest(F('unread_notification_count') + delta, Value(0))
+    )
+
+
+def recount_unread_notifications(vendor_ids=None):
+    """Rebuild unread counters from OfferStatusNotification in one UPDATE"""
+    unread = OfferStatusNotification.objects.filter(
+        stock_offer__vendor=OuterRef('pk'),
+        is_read=False,
+    ).order_by().values('stock_offer__vendor').annotate(count=Count('id')).values('count')
+
+    vendors = VendorProfile.objects.all()
+    if vendor_ids is not None:
+        vendors = vendors.filter(pk__in=vendor_ids)
+    return vendors.update(
+        unread_notification_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+    )
+
+
+def mark_notifications_read(vendor_profile):
+    """Mark every unread notification of the vendor as read and update the counter"""
+    marked = OfferStatusNotification.objects.filter(
+        stock_offer__vendor=vendor_profile,
+        is_read=False,
+    ).update(is_read=True)
+    if marked:
+        adjust_unread_count(vendor_profile.pk, -marked)
+        push_unread_count(vendor_profile.pk)
+    return marked
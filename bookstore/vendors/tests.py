@@ -1,3 +1,144 @@
-from django.test import TestCase
+import re
+from datetime import date
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from books.models import Book, Category
+from .consumers import VendorNotificationConsumer
+from .models import VendorProfile, StockOffer, OfferStatusNotification
+from .offer_upload import import_offer_upload
+
+User = get_user_model()
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class VendorNotificationPushTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='vendor', email='vendor@example.com', password='pass', user_type='vendor')
+        cls.vendor = VendorProfile.objects.create(user=cls.user, business_name='Vendor', status='approved')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        book = Book.objects.create(title='Book', slug='book', category=category, price=10, description='A book')
+        cls.offer = StockOffer.objects.create(
+            vendor=cls.vendor, book=book, quantity=5, unit_price=1,
+            availability_date='2026-01-01', expiry_date='2026-02-01',
+        )
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(VendorNotificationConsumer.as_asgi(), '/ws/vendors/notifications/')
+        communicator.scope['user'] = user
+        return communicator
+
+    def notify(self):
+        # The push is sent once the creating transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return OfferStatusNotification.objects.create(stock_offer=self.offer, status='approved', message='Approved')
+
+    async def test_new_notification_is_pushed_with_unread_count(self):
+        communicator = self.communicator(self.user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread_count', 'unread_count': 0})
+
+        notification = await database_sync_to_async(self.notify)()
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'notification')
+        self.assertEqual(message['unread_count'], 1)
+        self.assertEqual(message['notification']['id'], notification.pk)
+        self.assertEqual(message['notification']['book_title'], 'Book')
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_anonymous_socket_is_refused(self):
+        connected, _ = await self.communicator(AnonymousUser()).connect()
+        self.assertFalse(connected)
+
+    def test_page_does_not_poll_while_socket_is_open(self):
+        self.client.force_login(self.user)
+        page = self.client.get(reverse('vendors:dashboard')).content.decode()
+
+        self.assertIn('/ws/vendors/notifications/', page)
+        # The only polling timer is startPolling's, which runs only while the socket is down
+        self.assertEqual(page.count('setInterval('), 1)
+        self.assertRegex(page, r'function startPolling\(\) \{\s*if \(pollTimer\) return;\s*pollTimer = setInterval\(')
+        self.assertEqual(re.findall(r'startPolling\(\);', page), ['startPolling();'] * 2)
+        self.assertRegex(page, r"if \(!\('WebSocket' in window\)\) \{\s*startPolling\(\);")
+        self.assertRegex(page, r'socket\.onclose = \(\) => \{\s*startPolling\(\);')
+        self.assertRegex(page, r'socket\.onopen = \(\) => \{[^}]*stopPolling\(\);')
+
+
+class OfferUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='vendor', email='vendor@example.com', password='pass', user_type='vendor')
+        cls.vendor = VendorProfile.objects.create(user=user, business_name='Vendor', status='approved')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {i}', slug=f'book-{i}', category=category, price=10, description='A book')
+            for i in range(2)
+        ]
+
+    def upload(self, *rows):
+        content = '\n'.join(['book_id,quantity,unit_price', *rows]).encode()
+        return import_offer_upload(
+            self.vendor, SimpleUploadedFile('offers.csv', content), date(2026, 1, 1), date(2026, 2, 1),
+        )
+
+    def test_out_of_range_values_are_row_errors(self):
+        first, second = self.books
+        result = self.upload(
+            '1e30,1,1',
+            '99999999999999999999,1,1',
+            f'{first.pk},2147483648,1',
+            f'{first.pk},1,100000000',
+            f'{first.pk},1,NaN',
+            f'{first.pk},2000000,99999',
+            f'{first.pk}.0,3,2.50',
+            f'{second.pk},2147483647,1',
+        )
+
+        self.assertEqual([row for row, message in result.errors], [2, 3, 4, 5, 6, 7])
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            sorted(StockOffer.objects.values_list('book_id', 'quantity')),
+            [(first.pk, 3), (second.pk, 2147483647)],
+        )
+
+
+class CategoriesApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='vendor', email='vendor@example.com', password='pass', user_type='vendor')
+        cls.category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {i}', slug=f'book-{i}', category=cls.category, price=10, description='A book')
+            for i in range(3)
+        ]
+
+    def categories(self):
+        self.client.force_login(self.user)
+        return self.client.get(reverse('vendors:categories_api')).json()['categories']
+
+    def test_counts_follow_the_maintained_category_rows(self):
+        from warehouse.models import Stock
+        with self.captureOnCommitCallbacks(execute=True):
+            stock = Stock.objects.get(book=self.books[0])
+            stock.quantity = 50
+            stock.save()
+            Stock.objects.filter(book=self.books[2]).delete()
+
+        [fiction] = self.categories()
+        self.assertEqual(fiction['id'], self.category.pk)
+        self.assertEqual(
+            [fiction[key] for key in ('total_books', 'in_stock_books', 'out_of_stock_books', 'no_stock_record')],
+            [3, 1, 1, 1],
+        )
+        self.assertEqual(fiction['opportunity_score'], 66)
+        self.assertEqual(fiction['priority'], 'normal')
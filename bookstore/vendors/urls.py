@@ -35,4 +35,5 @@ urlpatterns = [
     path('api/notifications/count/', views.notifications_count, name='notifications_count'),
     path('submit-multiple-offer/', views.submit_multiple_offer, name='submit_multiple_offer'),
     path('submit-category-bulk-offer/', views.submit_category_bulk_offer, name='submit_category_bulk_offer'),
+    path('upload-offers/', views.upload_offers, name='upload_offers'),
 ]
\ No newline at end of file
@@ -10,11 +10,17 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from logistics.models import DeliverySchedule, LogisticsPartner, DeliveryTracking
 from warehouse.models import Stock  
+from warehouse.summaries import OUT_OF_STOCK, LOW_STOCK, NO_STOCK_RECORD
+from warehouse.opportunities import category_stock_summary, opportunity_totals
+from .enrichment import enrich_books, with_stock_data
+from .summaries import vendor_summary, mark_notifications_read
+from .offer_upload import new_offer, create_offers, suggested_quantity, import_offer_upload, OfferUploadError, OFFER_UPLOAD_COLUMNS
 from django.conf import settings
-from django.db.models import Sum, Count, Q, Avg, F, Case, When, IntegerField, Max
-from django.http import JsonResponse
+from django.db.models import Sum, Count, Q, Avg, F, Case, When, IntegerField, Max, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, Http404
 from django.contrib.auth import get_user_model
-from .forms import (VendorRegistrationForm, StockOfferForm, VendorTicketForm,  MultipleStockOfferForm, CategoryBulkOfferForm, DeliveryScheduleForm, QuickVendorLocationForm, VendorUserCreationForm)
+from .forms import (VendorRegistrationForm, StockOfferForm, VendorTicketForm,  MultipleStockOfferForm, CategoryBulkOfferForm, OfferUploadForm, DeliveryScheduleForm, QuickVendorLocationForm, VendorUserCreationForm)
 from books.models import Book, Category
 import json
 from django.views.decorators.http import require_http_methods
@@ -96,58 +102,22 @@ def vendor_dashboard(request):
     except VendorProfile.DoesNotExist:
         return redirect('vendors:register')
 
-    # Statistics
-    total_offers = StockOffer.objects.filter(vendor=vendor_profile).count()
-    pending_offers = StockOffer.objects.filter(vendor=vendor_profile, status='pending').count()
-
-    approved_offers_without_delivery = StockOffer.objects.filter(
-        vendor=vendor_profile,
-        status='approved'
-    ).exclude(
-        id__in=DeliverySchedule.objects.values_list('stock_offer_id', flat=True)
-    ).count()
-
-    processed_offers = StockOffer.objects.filter(vendor=vendor_profile, status='processed').count()
-
-    # FIXED: Get fresh warehouse opportunity data
-    warehouse_opportunities = get_vendor_opportunities(vendor_profile)
+    # Statistics: one conditional aggregate per model, cached per vendor
+    summary = vendor_summary(vendor_profile)
 
     # Recent offers
-    recent_offers = StockOffer.objects.filter(vendor=vendor_profile).order_by('-created_at')[:5]
-
-    # Active deliveries
-    active_deliveries = DeliverySchedule.objects.filter(
-        vendor=vendor_profile,
-        status__in=['scheduled', 'confirmed', 'pickup_assigned', 'collected', 'in_transit', 'arrived']
-    ).count()
-
-    completed_deliveries = DeliverySchedule.objects.filter(
-        vendor=vendor_profile,
-        status='completed'
-    ).count()
-
-    # Recent notifications
-    unread_notifications = OfferStatusNotification.objects.filter(
-        stock_offer__vendor=vendor_profile,
-        is_read=False
-    ).count()
+    recent_offers = StockOffer.objects.filter(vendor=vendor_profile).select_related('book').order_by('-created_at')[:5]
 
     recent_notifications = OfferStatusNotification.objects.filter(
         stock_offer__vendor=vendor_profile
-    ).order_by('-created_at')[:5]
+    ).select_related('stock_offer__book').order_by('-created_at')[:5]
 
     context = {
+        **summary,
         'vendor_profile': vendor_profile,
-        'total_offers': total_offers,
-        'pending_offers': pending_offers,
-        'approved_offers': approved_offers_without_delivery,
-        'processed_offers': processed_offers,
         'recent_offers': recent_offers,
-        'active_deliveries': active_deliveries,
-        'completed_deliveries': completed_deliveries,
-        'unread_notifications': unread_notifications,
+        'unread_notifications': vendor_profile.unread_notification_count,
         'recent_notifications': recent_notifications,
-        'warehouse_opportunities': warehouse_opportunities,  # This will now be accurate
     }
 
     return render(request, 'vendors/dashboard.html', context)
@@ -272,7 +242,7 @@ def vendor_notifications(request):
     ).select_related('stock_offer').order_by('-created_at')
     
     # Mark all as read when viewing
-    notifications_list.filter(is_read=False).update(is_read=True)
+    mark_notifications_read(vendor_profile)
     
     paginator = Paginator(notifications_list, 20)
     page_number = request.GET.get('page')
@@ -320,11 +290,11 @@ def vendor_locations(request):
 @login_required
 def notifications_count(request):
     """API endpoint for notification count"""
-    vendor_profile = get_object_or_404(VendorProfile, user=request.user)
-    count = OfferStatusNotification.objects.filter(
-        stock_offer__vendor=vendor_profile,
-        is_read=False
-    ).count()
+    count = VendorProfile.objects.filter(user=request.user).values_list(
+        'unread_notification_count', flat=True
+    ).first()
+    if count is None:
+        raise Http404("No VendorProfile matches the given query.")
     
     return JsonResponse({'count': count})
 
@@ -669,57 +639,37 @@ def book_search_api(request):
             Q(authors__name__icontains=query),
             # FIXED: Include both available AND out_of_stock books
             status__in=['available', 'out_of_stock']
-        ).select_related('category').prefetch_related('authors').distinct()[:20]
+        ).distinct()[:20]
         
         book_list = []
-        for book in books:
+        for book, stock_info, existing_offers in enrich_books(with_stock_data(books), vendor_profile):
             authors = ', '.join([author.name for author in book.authors.all()])
             
-            # Get warehouse stock info
-            try:
-                stock = Stock.objects.get(book=book)
-                current_stock = stock.available_quantity
-                reorder_level = stock.reorder_level
+            # Warehouse stock info, already joined for the whole page
+            if stock_info:
+                stock_status = stock_info['status']
+                current_stock = stock_info['stock'].available_quantity
+                reorder_level = stock_info['stock'].reorder_level
+                # Suggested quantity comes from the demand forecast when there is one
+                suggested_qty = stock_info['suggested_quantity']
                 
-                # FIXED: Proper stock status determination
-                if stock.available_quantity == 0:
-                    stock_status = 'out_of_stock'
+                if stock_status == 'out_of_stock':
                     priority_level = 'high'
                     priority_text = 'OUT OF STOCK - High Priority'
-                elif stock.available_quantity <= stock.reorder_level:
-                    stock_status = 'low_stock'
+                elif stock_status == 'low_stock':
                     priority_level = 'medium'
                     priority_text = 'Low Stock - Medium Priority'
                 else:
-                    stock_status = 'in_stock'
                     priority_level = 'normal'
                     priority_text = 'In Stock - Normal Priority'
-                    
-            except Stock.DoesNotExist:
+            else:
                 # FIXED: Books without stock records are high priority
                 stock_status = 'no_stock_record'
                 current_stock = 0
                 reorder_level = 10
                 priority_level = 'high'
                 priority_text = 'No Stock Record - High Priority'
-            
-            # Check existing vendor offers
-            existing_offers = StockOffer.objects.filter(
-                vendor=vendor_profile,
-                book=book,
-                status__in=['pending', 'approved']
-            ).aggregate(
-                total_pending=Sum('quantity', filter=Q(status='pending')),
-                total_approved=Sum('quantity', filter=Q(status='approved'))
-            )
-            
-            # Calculate suggested quantity based on stock status
-            if stock_status in ['out_of_stock', 'no_stock_record']:
                 suggested_qty = max(20, reorder_level + 10)  # Higher for out of stock
-            elif stock_status == 'low_stock':
-                suggested_qty = reorder_level - current_stock + 5
-            else:
-                suggested_qty = 5
             
             book_list.append({
                 'id': book.id,
@@ -731,8 +681,8 @@ def book_search_api(request):
                 'current_stock': current_stock,
                 'priority_level': priority_level,
                 'priority_text': priority_text,
-                'existing_pending': existing_offers['total_pending'] or 0,
-                'existing_approved': existing_offers['total_approved'] or 0,
+                'existing_pending': existing_offers['pending_quantity'] or 0,
+                'existing_approved': existing_offers['approved_quantity'] or 0,
                 'reorder_level': reorder_level,
                 'suggested_quantity': suggested_qty,
                 'book_status': book.status,  # Add book status for debugging
@@ -763,36 +713,34 @@ def category_books_api(request):
         books = Book.objects.filter(
             category=category,
             status__in=['available', 'out_of_stock']  # FIXED: Include out_of_stock
-        ).select_related('category').prefetch_related('authors')
+        )
         
         book_list = []
         priority_counts = {'high': 0, 'medium': 0, 'normal': 0}
         
-        for book in books:
+        for book, stock_info, existing_offers in enrich_books(with_stock_data(books), vendor_profile):
             authors = ', '.join([author.name for author in book.authors.all()])
             
-            # Get stock information
-            try:
-                stock = Stock.objects.get(book=book)
+            # Stock information, already joined for the whole category
+            if stock_info:
+                stock = stock_info['stock']
+                stock_status = stock_info['status']
                 current_stock = stock.available_quantity
                 reserved_stock = stock.reserved_quantity
                 reorder_level = stock.reorder_level
+                suggested_qty = stock_info['suggested_quantity']
                 
                 # FIXED: Proper priority calculation
-                if current_stock == 0:
-                    stock_status = 'out_of_stock'
+                if stock_status == 'out_of_stock':
                     priority = 'high'
                     priority_text = 'OUT OF STOCK'
-                elif current_stock <= reorder_level:
-                    stock_status = 'low_stock'
+                elif stock_status == 'low_stock':
                     priority = 'medium'
                     priority_text = 'LOW STOCK'
                 else:
-                    stock_status = 'in_stock'
                     priority = 'normal'
                     priority_text = 'IN STOCK'
-                    
-            except Stock.DoesNotExist:
+            else:
                 # FIXED: No stock record = high priority
                 stock_status = 'no_stock_record'
                 current_stock = 0
@@ -800,28 +748,10 @@ def category_books_api(request):
                 reorder_level = 10
                 priority = 'high'
                 priority_text = 'NO STOCK RECORD'
+                suggested_qty = max(25, reorder_level + 15)  # Higher for critical items
             
             priority_counts[priority] += 1
             
-            # Check vendor's existing offers
-            existing_offers = StockOffer.objects.filter(
-                vendor=vendor_profile,
-                book=book
-            ).aggregate(
-                pending_quantity=Sum('quantity', filter=Q(status='pending')),
-                approved_quantity=Sum('quantity', filter=Q(status='approved')),
-                total_offers=Count('id'),
-                latest_offer_date=Max('created_at')
-            )
-            
-            # Calculate suggested quantity based on stock status
-            if stock_status in ['out_of_stock', 'no_stock_record']:
-                suggested_qty = max(25, reorder_level + 15)  # Higher for critical items
-            elif stock_status == 'low_stock':
-                suggested_qty = reorder_level - current_stock + 10
-            else:
-                suggested_qty = 5
-            
             book_list.append({
                 'id': book.id,
                 'title': book.title,
@@ -869,39 +799,12 @@ def category_books_api(request):
 def categories_api(request):
     """FIXED: Categories API that properly counts out-of-stock books"""
     try:
-        # FIXED: Get categories with proper book filtering
-        categories = Category.objects.filter(
-            is_active=True,
-            books__status__in=['available', 'out_of_stock']  # FIXED: Include out_of_stock
-        ).distinct().annotate(
-            total_books=Count('books', filter=Q(books__status__in=['available', 'out_of_stock']))
-        ).filter(total_books__gt=0)
-        
+        # Per-category stock counts come from the CategoryStock rows warehouse.opportunities maintains
         category_list = []
-        for category in categories:
-            # FIXED: Get stock statistics for ALL books in category (including out_of_stock)
-            category_books = Book.objects.filter(
-                category=category, 
-                status__in=['available', 'out_of_stock']  # FIXED: Include out_of_stock
-            )
-            
-            # Count books by stock status
-            out_of_stock = 0
-            low_stock = 0
-            in_stock = 0
-            no_stock_record = 0
-            
-            for book in category_books:
-                try:
-                    stock = Stock.objects.get(book=book)
-                    if stock.available_quantity == 0:
-                        out_of_stock += 1
-                    elif stock.available_quantity <= stock.reorder_level:
-                        low_stock += 1
-                    else:
-                        in_stock += 1
-                except Stock.DoesNotExist:
-                    no_stock_record += 1
+        for counts in category_stock_summary():
+            out_of_stock = counts['out_of_stock_books']
+            low_stock = counts['low_stock_books']
+            no_stock_record = counts['no_stock_record']
             
             # Calculate priority based on critical needs
             needs_attention = out_of_stock + low_stock + no_stock_record
@@ -912,21 +815,10 @@ def categories_api(request):
             else:
                 priority = 'normal'
             
-            # Calculate opportunity score
-            opportunity_score = int((needs_attention / category.total_books) * 100) if category.total_books > 0 else 0
-            
             category_list.append({
-                'id': category.id,
-                'name': category.name,
-                'slug': category.slug,
-                'total_books': category.total_books,
-                'out_of_stock_books': out_of_stock,
-                'low_stock_books': low_stock,
-                'in_stock_books': in_stock,
-                'no_stock_record': no_stock_record,
+                **counts,
                 'needs_attention': needs_attention,
                 'priority': priority,
-                'opportunity_score': opportunity_score,
                 'urgency_message': f"{out_of_stock} books out of stock" if out_of_stock > 0 else f"{low_stock} books low stock" if low_stock > 0 else "Stock levels normal"
             })
         
@@ -972,41 +864,40 @@ def submit_multiple_offer(request):
         if not availability_date or not expiry_date:
             return JsonResponse({'success': False, 'message': 'Please provide availability and expiry dates.'})
         
-        created_offers = []
-        total_value = 0
+        # Validate every line against books fetched in one query before inserting anything
+        try:
+            book_ids = [int(book_data['id']) for book_data in books_data]
+        except (ValueError, KeyError, TypeError) as e:
+            return JsonResponse({'success': False, 'message': f'Invalid data format: {str(e)}'})
+        books = Book.objects.in_bulk(book_ids)
         
-        with transaction.atomic():
-            for book_data in books_data:
-                try:
-                    book = Book.objects.get(id=book_data['id'])
-                    quantity = int(book_data['quantity'])
-                    unit_price = float(book_data['price'])
-                    
-                    if quantity <= 0 or unit_price <= 0:
-                        return JsonResponse({'success': False, 'message': f'Invalid quantity or price for book: {book.title}'})
-                    
-                    offer = StockOffer.objects.create(
-                        vendor=vendor_profile,
-                        book=book,
-                        quantity=quantity,
-                        unit_price=unit_price,
-                        availability_date=availability_date,
-                        expiry_date=expiry_date,
-                        notes=f"{notes}\n[Multi-book offer batch]".strip()
-                    )
-                    created_offers.append(offer)
-                    total_value += offer.total_amount
-                    
-                except Book.DoesNotExist:
-                    return JsonResponse({'success': False, 'message': f'Book with ID {book_data["id"]} not found.'})
-                except (ValueError, KeyError) as e:
-                    return JsonResponse({'success': False, 'message': f'Invalid data format: {str(e)}'})
+        offers = []
+        for book_id, book_data in zip(book_ids, books_data):
+            book = books.get(book_id)
+            if book is None:
+                return JsonResponse({'success': False, 'message': f'Book with ID {book_data["id"]} not found.'})
+            try:
+                quantity = int(book_data['quantity'])
+                unit_price = float(book_data['price'])
+            except (ValueError, KeyError, TypeError) as e:
+                return JsonResponse({'success': False, 'message': f'Invalid data format: {str(e)}'})
+            
+            if quantity <= 0 or unit_price <= 0:
+                return JsonResponse({'success': False, 'message': f'Invalid quantity or price for book: {book.title}'})
+            
+            offers.append(new_offer(
+                vendor_profile, book, quantity, unit_price, availability_date, expiry_date,
+                notes=f"{notes}\n[Multi-book offer batch]".strip()
+            ))
+        
+        created_offers = create_offers(vendor_profile, offers)
+        total_value = sum(offer.total_amount for offer in created_offers)
         
         return JsonResponse({
             'success': True, 
             'message': f'Successfully submitted {len(created_offers)} book offers! Total value: ₹{total_value:,.2f}',
             'offers_count': len(created_offers),
-            'total_value': total_value
+            'total_value': float(total_value)
         })
         
     except json.JSONDecodeError:
@@ -1033,24 +924,21 @@ def submit_category_bulk_offer(request):
             expiry_date = form.cleaned_data['expiry_date']
             notes = form.cleaned_data['notes']
             
-            # FIXED: Get books that need restocking including out_of_stock status
+            # Books without stock, out of stock or at/below their reorder level
+            recent_offer = StockOffer.objects.filter(
+                vendor=vendor_profile,
+                book=OuterRef('pk'),
+                status__in=['pending', 'approved'],
+                created_at__gte=timezone.now() - timezone.timedelta(days=7)
+            )
             books_needing_stock = Book.objects.filter(
+                NO_STOCK_RECORD | OUT_OF_STOCK | LOW_STOCK,
                 category=category,
                 status__in=['available', 'out_of_stock']  # FIXED: Include out_of_stock
-            ).annotate(
-                needs_restock=Case(
-                    When(stock__isnull=True, then=1),  # No stock record
-                    When(stock__available_quantity=0, then=1),   # Out of stock
-                    When(stock__available_quantity__lte=F('stock__reorder_level'), then=1),  # Low stock
-                    default=0,
-                    output_field=IntegerField()
-                )
-            ).filter(needs_restock=1).exclude(
+            ).exclude(
                 # Don't include books with recent pending/approved offers
-                stockoffer__vendor=vendor_profile,
-                stockoffer__status__in=['pending', 'approved'],
-                stockoffer__created_at__gte=timezone.now() - timezone.timedelta(days=7)
-            )
+                Exists(recent_offer)
+            ).select_related('stock', 'demand_forecast')
             
             if not books_needing_stock.exists():
                 messages.warning(
@@ -1059,27 +947,20 @@ def submit_category_bulk_offer(request):
                 )
                 return redirect('vendors:submit_category_bulk_offer')
             
-            created_offers = []
-            total_value = 0
+            offers = []
+            for book in books_needing_stock:
+                # Use smart quantity calculation
+                smart_quantity = suggested_quantity(book)
+                final_quantity = max(default_quantity, smart_quantity)
+                
+                offers.append(new_offer(
+                    vendor_profile, book, final_quantity, default_price, availability_date, expiry_date,
+                    notes=f"{notes}\n[Bulk category offer: {category.name}]\n[Smart quantity: {smart_quantity}]".strip()
+                ))
             
             try:
-                with transaction.atomic():
-                    for book in books_needing_stock:
-                        # Use smart quantity calculation
-                        smart_quantity = calculate_suggested_quantity(book)
-                        final_quantity = max(default_quantity, smart_quantity)
-                        
-                        offer = StockOffer.objects.create(
-                            vendor=vendor_profile,
-                            book=book,
-                            quantity=final_quantity,
-                            unit_price=default_price,
-                            availability_date=availability_date,
-                            expiry_date=expiry_date,
-                            notes=f"{notes}\n[Bulk category offer: {category.name}]\n[Smart quantity: {smart_quantity}]".strip()
-                        )
-                        created_offers.append(offer)
-                        total_value += offer.total_amount
+                created_offers = create_offers(vendor_profile, offers)
+                total_value = sum(offer.total_amount for offer in created_offers)
                 
                 messages.success(
                     request,
@@ -1105,89 +986,76 @@ def submit_category_bulk_offer(request):
     return render(request, 'vendors/submit_category_bulk_offer.html', context)
 
 
+@login_required
+def upload_offers(request):
+    """Create offers in bulk from a CSV/XLSX catalogue upload"""
+    vendor_profile = get_object_or_404(VendorProfile, user=request.user)
+    
+    if vendor_profile.status != 'approved':
+        messages.error(request, 'Your vendor account needs to be approved.')
+        return redirect('vendors:dashboard')
+    
+    result = None
+    if request.method == 'POST':
+        form = OfferUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                result = import_offer_upload(
+                    vendor_profile,
+                    form.cleaned_data['offers_file'],
+                    form.cleaned_data['availability_date'],
+                    form.cleaned_data['expiry_date'],
+                    form.cleaned_data['notes'],
+                )
+            except OfferUploadError as e:
+                messages.error(request, str(e))
+            else:
+                if result.created:
+                    messages.success(
+                        request,
+                        f'Created {result.created} offers from "{form.cleaned_data["offers_file"].name}". '
+                        f'Total value: ₹{result.total_value:,.2f}'
+                    )
+                if result.error_count:
+                    messages.warning(request, f'{result.error_count} rows were skipped; see the details below.')
+                else:
+                    return redirect('vendors:stock_offers')
+    else:
+        form = OfferUploadForm()
+    
+    context = {
+        'form': form,
+        'vendor_profile': vendor_profile,
+        'result': result,
+        'columns': OFFER_UPLOAD_COLUMNS,
+    }
+    
+    return render(request, 'vendors/upload_offers.html', context)
+
+
 # Helper Functions
 def calculate_suggested_quantity(book):
-    """FIXED: Calculate smart suggested quantity with better logic for out-of-stock"""
+    """Suggested order quantity from the book's demand forecast (static rules without one)"""
     try:
-        stock = Stock.objects.get(book=book)
-        reorder_level = stock.reorder_level
-        current_stock = stock.available_quantity
-        
-        if current_stock == 0:
-            # Out of stock - suggest higher quantity
-            return max(25, reorder_level + 15)
-        elif current_stock <= reorder_level:
-            # Low stock - suggest to reach comfortable level
-            return max(reorder_level - current_stock + 10, 10)
-        else:
-            # In stock - minimal quantity
-            return 5
+        stock = Stock.objects.select_related('book__demand_forecast').get(book=book)
+        return stock.suggested_order_quantity
             
     except Stock.DoesNotExist:
         # No stock record - suggest substantial quantity
         return 20
 
 def get_warehouse_priority_stats():
-    """FIXED: Get warehouse statistics to show priority areas with proper Stock model queries"""
-    try:
-        from warehouse.models import Stock  # Make sure import is correct
-        from books.models import Book, Category
-        from django.db.models import Q, F, Count
-        
-        # FIXED: Count books that are actually out of stock (quantity = 0)
-        out_of_stock_books = Stock.objects.filter(
-            quantity=0  # Use 'quantity' instead of 'available_quantity'
-        ).count()
-        
-        # FIXED: Count books with low stock (quantity <= reorder_level but > 0)
-        low_stock_books = Stock.objects.filter(
-            quantity__lte=F('reorder_level'),
-            quantity__gt=0
-        ).count()
-        
-        # FIXED: Books without stock records (books that exist but have no Stock entry)
-        books_without_stock = Book.objects.filter(
-            status__in=['available', 'out_of_stock'],
-            stock__isnull=True  # Books that don't have a Stock record
-        ).count()
-        
-        # FIXED: Categories that have books needing attention
-        categories_need_attention = Category.objects.filter(
-            is_active=True,
-            books__status__in=['available', 'out_of_stock']
-        ).annotate(
-            # Count books that are out of stock OR have no stock record
-            critical_books=Count('books', filter=Q(
-                Q(books__stock__quantity=0) |  # Out of stock
-                Q(books__stock__isnull=True)   # No stock record
-            )),
-            # Count books with low stock
-            low_stock_count=Count('books', filter=Q(
-                books__stock__quantity__lte=F('books__stock__reorder_level'),
-                books__stock__quantity__gt=0
-            ))
-        ).filter(
-            Q(critical_books__gt=0) | Q(low_stock_count__gt=0)
-        ).distinct().count()
-        
-        return {
-            'out_of_stock_books': out_of_stock_books,
-            'low_stock_books': low_stock_books,
-            'books_without_stock': books_without_stock,
-            'total_books_need_restock': out_of_stock_books + low_stock_books + books_without_stock,
-            'categories_need_attention': categories_need_attention
-        }
-        
-    except Exception as e:
-        print(f"Error calculating warehouse priority stats: {e}")
-        return {
-            'out_of_stock_books': 0,
-            'low_stock_books': 0,
-            'books_without_stock': 0,
-            'total_books_need_restock': 0,
-            'categories_need_attention': 0
-        }
-
+    """Warehouse statistics to show priority areas, read from the precomputed CategoryStock table"""
+    totals = opportunity_totals()
+    return {
+        'out_of_stock_books': totals['out_of_stock_books'],
+        'low_stock_books': totals['low_stock_books'],
+        'books_without_stock': totals['no_stock_record'],
+        'total_books_need_restock': (
+            totals['out_of_stock_books'] + totals['low_stock_books'] + totals['no_stock_record']
+        ),
+        'categories_need_attention': totals['categories_needing_attention'],
+    }
 
 
 def calculate_category_opportunity(category):
@@ -1201,107 +1069,29 @@ def calculate_category_opportunity(category):
     return int((needs_attention / total_books) * 100)
 
 def get_priority_categories_for_vendor(vendor_profile):
-    """FIXED: Get categories prioritized for vendor including out-of-stock books"""
+    """Categories needing stock, from the precomputed CategoryStock rows plus this vendor's recent offers"""
+    recent_offers = StockOffer.objects.filter(
+        vendor=vendor_profile,
+        book__category=OuterRef('pk'),
+        created_at__gte=timezone.now() - timezone.timedelta(days=30)
+    ).order_by().values('book__category').annotate(count=Count('id')).values('count')
+    
     return Category.objects.filter(
         is_active=True,
-        books__status__in=['available', 'out_of_stock']  # FIXED: Include out_of_stock
+        category_stock__opportunity_score__gt=0,
     ).annotate(
-        # FIXED: Count books that need restocking
-        needs_restock=Count('books', filter=Q(
-            Q(books__stock__available_quantity__lte=F('books__stock__reorder_level')) |
-            Q(books__stock__isnull=True),
-            books__status__in=['available', 'out_of_stock']
-        )),
-        total_books=Count('books', filter=Q(books__status__in=['available', 'out_of_stock'])),
-        out_of_stock_count=Count('books', filter=Q(
-            books__stock__available_quantity=0,
-            books__status__in=['available', 'out_of_stock']
-        )),
-        no_stock_count=Count('books', filter=Q(
-            books__stock__isnull=True,
-            books__status__in=['available', 'out_of_stock']
-        )),
-        vendor_recent_offers=Count('books__stockoffer', filter=Q(
-            books__stockoffer__vendor=vendor_profile,
-            books__stockoffer__created_at__gte=timezone.now() - timezone.timedelta(days=30)
-        ))
-    ).filter(
-        needs_restock__gt=0
+        needs_restock=(
+            F('category_stock__out_of_stock_books')
+            + F('category_stock__low_stock_books')
+            + F('category_stock__no_stock_record')
+        ),
+        total_books=F('category_stock__total_books'),
+        out_of_stock_count=F('category_stock__out_of_stock_books'),
+        no_stock_count=F('category_stock__no_stock_record'),
+        opportunity_score=F('category_stock__opportunity_score'),
+        vendor_recent_offers=Coalesce(Subquery(recent_offers, output_field=IntegerField()), 0),
     ).order_by('-out_of_stock_count', '-needs_restock', 'name')
 
-def get_vendor_opportunities(vendor_profile):
-    """FIXED: Get warehouse opportunities for vendor dashboard"""
-    try:
-        # FIXED: Count books that really need attention
-        out_of_stock_books = Stock.objects.filter(
-            available_quantity=0,
-            book__status__in=['available', 'out_of_stock']  # FIXED: Include out_of_stock status
-        ).count()
-        
-        low_stock_books = Stock.objects.filter(
-            available_quantity__lte=F('reorder_level'),
-            available_quantity__gt=0,
-            book__status__in=['available', 'out_of_stock']
-        ).count()
-        
-        # Books without stock records (also high priority)
-        books_without_stock = Book.objects.filter(
-            status__in=['available', 'out_of_stock'],
-            stock__isnull=True
-        ).count()
-        
-        # Categories needing attention
-        categories_needing_attention = Category.objects.filter(
-            is_active=True,
-            books__status__in=['available', 'out_of_stock']
-        ).annotate(
-            out_of_stock_count=Count('books', filter=Q(
-                books__stock__available_quantity=0
-            )),
-            no_stock_count=Count('books', filter=Q(
-                books__stock__isnull=True,
-                books__status__in=['available', 'out_of_stock']
-            ))
-        ).filter(
-            Q(out_of_stock_count__gt=0) | Q(no_stock_count__gt=0)
-        ).count()
-        
-        # Recent offers from this vendor to avoid double-offering
-        recent_vendor_offers = StockOffer.objects.filter(
-            vendor=vendor_profile,
-            created_at__gte=timezone.now() - timezone.timedelta(days=7),
-            status__in=['pending', 'approved']
-        ).values_list('book_id', flat=True)
-        
-        # High priority books this vendor hasn't offered yet
-        high_priority_opportunities = Stock.objects.filter(
-            Q(available_quantity=0) | Q(book__stock__isnull=True),
-            book__status__in=['available', 'out_of_stock']
-        ).exclude(
-            book_id__in=recent_vendor_offers
-        ).count()
-        
-        return {
-            'out_of_stock_books': out_of_stock_books,
-            'low_stock_books': low_stock_books,
-            'books_without_stock': books_without_stock,
-            'total_opportunities': out_of_stock_books + low_stock_books + books_without_stock,
-            'categories_needing_attention': categories_needing_attention,
-            'high_priority_opportunities': high_priority_opportunities,
-            'show_alerts': out_of_stock_books > 0 or books_without_stock > 0,
-        }
-        
-    except Exception as e:
-        print(f"Error calculating vendor opportunities: {e}")
-        return {
-            'out_of_stock_books': 0,
-            'low_stock_books': 0,
-            'books_without_stock': 0,
-            'total_opportunities': 0,
-            'categories_needing_attention': 0,
-            'high_priority_opportunities': 0,
-            'show_alerts': False,
-        }
 
 
 
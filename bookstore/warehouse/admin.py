@@ -1,7 +1,7 @@
 
 # warehouse/admin.py
 from django.contrib import admin
-from .models import Stock, StockMovement, CategoryStock, InventoryAudit, InventoryAuditItem
+from .models import Stock, StockMovement, StockSnapshot, StockReservation, DemandForecast, CategoryStock, BookOpportunity, PickWave, PickLine, InventoryAudit, InventoryAuditItem
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
@@ -15,7 +15,53 @@ class StockMovementAdmin(admin.ModelAdmin):
     list_display = ['stock', 'movement_type', 'quantity', 'reference', 'performed_by', 'created_at']
     list_filter = ['movement_type', 'created_at']
     search_fields = ['stock__book__title', 'reference']
+    
+    # The movement ledger is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'quantity', 'last_movement_id', 'taken_at']
+    search_fields = ['stock__book__title']
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'order', 'quantity', 'status', 'expires_at']
+    list_filter = ['status']
+    search_fields = ['stock__book__title', 'order__order_id']
+
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ['book', 'daily_demand', 'demand_std', 'safety_stock', 'reorder_point', 'target_level', 'computed_at']
+    search_fields = ['book__title']
+
+@admin.register(CategoryStock)
+class CategoryStockAdmin(admin.ModelAdmin):
+    list_display = ['category', 'total_books', 'out_of_stock_books', 'low_stock_books', 'no_stock_record', 'opportunity_score', 'last_updated']
+    ordering = ['-opportunity_score']
+
+@admin.register(BookOpportunity)
+class BookOpportunityAdmin(admin.ModelAdmin):
+    list_display = ['book', 'category', 'level', 'score', 'refreshed_at']
+    list_filter = ['level', 'category']
+    search_fields = ['book__title']
+
+class PickLineInline(admin.TabularInline):
+    model = PickLine
+    extra = 0
+    raw_id_fields = ['book', 'stock']
+
+@admin.register(PickWave)
+class PickWaveAdmin(admin.ModelAdmin):
+    list_display = ['wave_id', 'status', 'order_count', 'line_count', 'total_units', 'created_by', 'created_at']
+    list_filter = ['status']
+    search_fields = ['wave_id']
+    raw_id_fields = ['orders']
+    inlines = [PickLineInline]
 
-admin.site.register(CategoryStock)
 admin.site.register(InventoryAudit)
 admin.site.register(InventoryAuditItem)
\ No newline at end of file
@@ -0,0 +1,203 @@
+# warehouse/audits.py - Bulk ingestion of scanner counts into inventory audits
+import re
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from books.identifier_index import book_index, normalize_isbn
+from books.models import Book
+from .inventory import apply_stock_deltas
+from .models import Stock, StockMovement, InventoryAuditItem
+
+AUDIT_BATCH_SIZE = 1000
+ADJUSTMENT_BATCH_SIZE = 200
+MAX_REPORTED_PROBLEMS = 200
+
+# "ISBN", "ISBN,count", "ISBN;count", "ISBN<tab>count" or "ISBN count"
+SCAN_LINE = re.compile(r'^\s*([0-9Xx-]+)\s*(?:[,;\t ]\s*(\d+))?\s*$')
+
+
+class AuditIngestError(Exception):
+    """The scans cannot be ingested into this audit"""
+
+
+class AuditIngestResult:
+    def __init__(self):
+        self.lines = 0
+        self.items_created = 0
+        self.units_counted = 0
+        self.total_variance = 0
+        self.adjustments = 0
+        self.problem_count = 0
+        self.problems = []  # (line number or ISBN, message), capped at MAX_REPORTED_PROBLEMS
+
+    def add_problem(self, where, message):
+        self.problem_count += 1
+        if len(self.problems) < MAX_REPORTED_PROBLEMS:
+            self.problems.append((where, message))
+
+    def as_dict(self):
+        return {
+            'lines': self.lines,
+            'items_created': self.items_created,
+            'units_counted': self.units_counted,
+            'total_variance': self.total_variance,
+            'adjustments': self.adjustments,
+            'problem_count': self.problem_count,
+            'problems': [{'where': where, 'message': message} for where, message in self.problems],
+        }
+
+
+def read_scan_counts(lines, result):
+    """
+    Total scanned units per normalized ISBN from scanner output.
+
+    Each line is an ISBN with an optional count; a bare ISBN counts one
+    unit, so raw one-scan-per-item output works as is. Lines are consumed
+    as they arrive and only the per-ISBN totals are kept.
+    """
+    counts = {}
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig', errors='replace')
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        result.lines += 1
+
+        match = SCAN_LINE.match(line)
+        isbn = normalize_isbn(match.group(1)) if match else ''
+        if not isbn:
+            if line_number > 1:  # a header row is expected on line 1
+                result.add_problem(line_number, f'Unreadable scan "{line.strip()[:40]}"')
+            continue
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        counts[isbn] = counts.get(isbn, 0) + count
+    return counts
+
+
+def resolve_isbns(isbns):
+    """
+    {isbn: book_id} for normalized ISBNs. The identifier index answers
+    almost all of them; the rest are tried against the database in one
+    query per batch.
+    """
+    resolved = {}
+    unresolved = []
+    for isbn in isbns:
+        book_id = book_index.lookup(isbn=isbn, isbn13=isbn)
+        if book_id is None:
+            unresolved.append(isbn)
+        else:
+            resolved[isbn] = book_id
+
+    for start in range(0, len(unresolved), AUDIT_BATCH_SIZE):
+        batch = unresolved[start:start + AUDIT_BATCH_SIZE]
+        books = Book.objects.filter(Q(isbn__in=batch) | Q(isbn13__in=batch)).values_list('pk', 'isbn', 'isbn13')
+        for book_id, isbn, isbn13 in books:
+            for value in (isbn, isbn13):
+                if value:
+                    resolved.setdefault(normalize_isbn(value), book_id)
+    return resolved
+
+
+@transaction.atomic
+def ingest_audit_scans(audit, lines, performed_by=None, post_adjustments=False):
+    """
+    Record scanner counts on an audit in bulk.
+
+    ISBNs are resolved through the identifier index, system quantities
+    are snapshotted with one Stock query, and audit items (variance
+    included, since bulk_create skips save()) are inserted with
+    bulk_create. Books already counted in this audit are reported, not
+    counted twice. With post_adjustments, every variance is applied to
+    stock by a few batched UPDATEs and recorded as adjustment movements.
+    """
+    if audit.status in ('completed', 'cancelled'):
+        raise AuditIngestError(f'Audit #{audit.audit_id} is {audit.get_status_display().lower()}.')
+
+    result = AuditIngestResult()
+    scanned = read_scan_counts(lines, result)
+    if not scanned:
+        return result
+
+    book_ids = resolve_isbns(list(scanned))
+    counts = {}
+    scanned_isbn = {}
+    for isbn, count in scanned.items():
+        book_id = book_ids.get(isbn)
+        if book_id is None:
+            result.add_problem(isbn, 'Unknown ISBN')
+            continue
+        # An ISBN-10 and ISBN-13 of the same book are one count
+        counts[book_id] = counts.get(book_id, 0) + count
+        scanned_isbn.setdefault(book_id, isbn)
+
+    stocks = {
+        book_id: (stock_id, quantity)
+        for stock_id, book_id, quantity in Stock.objects.select_for_update().filter(
+            book_id__in=counts
+        ).values_list('id', 'book_id', 'quantity')
+    }
+    already_counted = set(
+        audit.items.filter(stock__book_id__in=counts).values_list('stock__book_id', flat=True)
+    )
+
+    items = []
+    for book_id, count in sorted(counts.items()):
+        if book_id not in stocks:
+            result.add_problem(scanned_isbn[book_id], 'Book has no stock record')
+            continue
+        if book_id in already_counted:
+            result.add_problem(scanned_isbn[book_id], 'Already counted in this audit')
+            continue
+        stock_id, system_quantity = stocks[book_id]
+        items.append(InventoryAuditItem(
+            audit=audit,
+            stock_id=stock_id,
+            system_quantity=system_quantity,
+            actual_quantity=count,
+            variance=count - system_quantity,
+        ))
+
+    InventoryAuditItem.objects.bulk_create(items, batch_size=AUDIT_BATCH_SIZE)
+    result.items_created = len(items)
+    result.units_counted = sum(item.actual_quantity for item in items)
+    result.total_variance = sum(item.variance for item in items)
+
+    if audit.status == 'scheduled':
+        audit.status = 'in_progress'
+        audit.started_at = audit.started_at or timezone.now()
+        audit.save(update_fields=['status', 'started_at'])
+
+    if post_adjustments:
+        stock_books = {stock_id: book_id for book_id, (stock_id, quantity) in stocks.items()}
+        result.adjustments = _post_adjustments(audit, items, stock_books, performed_by)
+    return result
+
+
+def _post_adjustments(audit, items, stock_books, performed_by=None):
+    """Apply the variances of new audit items to stock and record them in the ledger"""
+    variances = [item for item in items if item.variance]
+    if not variances:
+        return 0
+
+    # The Stock rows are locked since the snapshot, so each delta lands the count exactly.
+    # Batched because every book adds a CASE branch and a guard to the UPDATE.
+    for start in range(0, len(variances), ADJUSTMENT_BATCH_SIZE):
+        apply_stock_deltas({
+            stock_books[item.stock_id]: item.variance
+            for item in variances[start:start + ADJUSTMENT_BATCH_SIZE]
+        })
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            stock_id=item.stock_id,
+            movement_type='adjustment',
+            quantity=item.variance,
+            reference=f"Audit-{audit.audit_id}",
+            reason=f"Inventory audit count: system {item.system_quantity}, counted {item.actual_quantity}",
+            performed_by=performed_by,
+            auto_update_stock=False,  # Applied above in one statement
+        )
+        for item in variances
+    ], batch_size=AUDIT_BATCH_SIZE)
+    return len(variances)
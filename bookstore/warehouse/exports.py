@@ -0,0 +1,115 @@
+# warehouse/exports.py - Streaming CSV/XLSX exports of stock and movement history
+import csv
+import tempfile
+
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+from .inventory import stock_level
+
+EXPORT_CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+
+STOCK_EXPORT_HEADER = [
+    'Stock ID', 'Book ID', 'Title', 'ISBN', 'Category', 'Quantity', 'Reserved', 'Available',
+    'Reorder Level', 'Max Stock Level', 'Status', 'Section', 'Row', 'Shelf', 'Last Updated',
+]
+
+MOVEMENT_EXPORT_HEADER = [
+    'Movement ID', 'Date', 'Stock ID', 'Title', 'ISBN', 'Type', 'Quantity', 'Reference', 'Reason', 'Performed By',
+]
+
+
+class ExportUnavailable(Exception):
+    """The requested export format cannot be produced on this server"""
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _timestamp(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def stock_rows(stocks):
+    """Export rows for a Stock queryset, fetched EXPORT_CHUNK_SIZE rows at a time"""
+    rows = stocks.values_list(
+        'id', 'book_id', 'book__title', 'book__isbn', 'book__category__name',
+        'quantity', 'reserved_quantity', 'reorder_level', 'max_stock_level',
+        'location_section', 'location_row', 'location_shelf', 'last_updated',
+    )
+    for (stock_id, book_id, title, isbn, category, quantity, reserved, reorder_level, max_level,
+         section, row, shelf, last_updated) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        available = quantity - reserved
+        yield [
+            stock_id, book_id, title, isbn or '', category, quantity, reserved, available,
+            reorder_level, max_level, stock_level(available, reorder_level), section, row, shelf,
+            _timestamp(last_updated),
+        ]
+
+
+def movement_rows(movements):
+    """Export rows for a StockMovement queryset, fetched EXPORT_CHUNK_SIZE rows at a time"""
+    rows = movements.values_list(
+        'id', 'created_at', 'stock_id', 'stock__book__title', 'stock__book__isbn',
+        'movement_type', 'quantity', 'reference', 'reason', 'performed_by__username',
+    )
+    for (movement_id, created_at, stock_id, title, isbn, movement_type, quantity,
+         reference, reason, username) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            movement_id, _timestamp(created_at), stock_id, title, isbn or '', movement_type,
+            quantity, reference, reason, username or '',
+        ]
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(filename, header, rows):
+    """Stream rows as CSV; only one chunk of rows is ever in memory"""
+    response = StreamingHttpResponse(_csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    """
+    Write rows to a write-only workbook spooled to a temporary file, then
+    stream the file. openpyxl's write-only mode keeps rows on disk, so
+    memory stays flat however many rows are exported.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportUnavailable('XLSX export needs openpyxl installed; use CSV instead.')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=filename[:31])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    response = FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response.block_size = FILE_CHUNK_SIZE
+    return response
+
+
+def export_response(file_format, filename, header, rows):
+    if file_format == 'xlsx':
+        return xlsx_response(filename, header, rows)
+    return csv_response(filename, header, rows)
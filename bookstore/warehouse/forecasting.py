@@ -0,0 +1,121 @@
+# warehouse/forecasting.py - Vectorized demand forecasting
+import math
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Stock, StockMovement, DemandForecast
+
+FORECAST_DEFAULTS = {
+    'HISTORY_DAYS': 90,
+    'SMOOTHING': 0.2,
+    'LEAD_TIME_DAYS': 7,
+    'REVIEW_DAYS': 14,
+    'SERVICE_LEVEL_Z': 1.65,
+}
+
+WRITE_BATCH_SIZE = 500
+
+
+def forecast_settings():
+    return {**FORECAST_DEFAULTS, **getattr(settings, 'DEMAND_FORECAST', {})}
+
+
+def demand_matrix(book_ids, start_date, days):
+    """
+    Daily outbound units as a (books x days) matrix, built from one grouped
+    query over the movement ledger (sales and other stock-outs).
+    """
+    rows = (
+        StockMovement.objects.filter(
+            Q(movement_type__in=['out', 'damaged']) & Q(quantity__lt=0),
+            created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min)),
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values('stock__book_id', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+
+    position = {book_id: i for i, book_id in enumerate(book_ids)}
+    book_index, day_index, units = [], [], []
+    for row in rows:
+        i = position.get(row['stock__book_id'])
+        offset = (row['day'] - start_date).days
+        if i is not None and 0 <= offset < days:
+            book_index.append(i)
+            day_index.append(offset)
+            units.append(-row['units'])
+
+    matrix = np.zeros((len(book_ids), days), dtype=np.float64)
+    np.add.at(matrix, (np.asarray(book_index, dtype=np.intp), np.asarray(day_index, dtype=np.intp)), units)
+    return matrix
+
+
+def smooth(matrix, alpha):
+    """
+    Exponentially smoothed level and standard deviation per row.
+
+    Uses the closed form of simple exponential smoothing over the window
+    (weights alpha * (1 - alpha)^age, normalized), so the whole catalog is a
+    couple of matrix-vector products instead of a Python loop per book.
+    """
+    days = matrix.shape[1]
+    ages = np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights = alpha * (1 - alpha) ** ages
+    weights /= weights.sum()
+
+    level = matrix @ weights
+    variance = ((matrix - level[:, None]) ** 2) @ weights
+    return level, np.sqrt(variance)
+
+
+def compute_forecasts(now=None, history_days=None):
+    """Forecast every stocked book; returns unsaved DemandForecast rows"""
+    config = forecast_settings()
+    now = now or timezone.now()
+    days = history_days or config['HISTORY_DAYS']
+    start_date = timezone.localdate(now) - timedelta(days=days - 1)
+
+    book_ids = list(Stock.objects.order_by('book_id').values_list('book_id', flat=True))
+    if not book_ids:
+        return []
+
+    level, std = smooth(demand_matrix(book_ids, start_date, days), config['SMOOTHING'])
+
+    lead_time = config['LEAD_TIME_DAYS']
+    safety = config['SERVICE_LEVEL_Z'] * std * math.sqrt(lead_time)
+    reorder_point = np.ceil(level * lead_time + safety)
+    target = np.ceil(level * (lead_time + config['REVIEW_DAYS']) + safety)
+
+    return [
+        DemandForecast(
+            book_id=book_id,
+            daily_demand=round(float(level[i]), 4),
+            demand_std=round(float(std[i]), 4),
+            safety_stock=int(math.ceil(safety[i])),
+            reorder_point=int(reorder_point[i]),
+            target_level=int(target[i]),
+            history_days=days,
+            computed_at=now,
+        )
+        for i, book_id in enumerate(book_ids)
+    ]
+
+
+def store_forecasts(forecasts):
+    """Upsert forecasts into the DemandForecast table"""
+    DemandForecast.objects.bulk_create(
+        forecasts,
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['book'],
+        update_fields=[
+            'daily_demand', 'demand_std', 'safety_stock', 'reorder_point',
+            'target_level', 'history_days', 'computed_at',
+        ],
+    )
+    return len(forecasts)
@@ -0,0 +1,143 @@
+# warehouse/inventory.py - Set-based stock mutation API
+from django.db import transaction
+from django.db.models import Case, When, F, Q, Value, IntegerField
+from django.utils import timezone
+from books.models import Book
+from .models import Stock
+from .signals import stock_levels_changed
+
+
+class InsufficientStock(Exception):
+    """Raised when a delta would take stock below zero (or below reservations)"""
+
+    def __init__(self, book_ids):
+        self.book_ids = sorted(book_ids)
+        super().__init__(f"Insufficient stock for book(s): {', '.join(map(str, self.book_ids))}")
+
+
+def _delta_expression(field, deltas):
+    """F(field) + per-book delta as a single CASE expression"""
+    if not deltas:
+        return F(field)
+    return F(field) + Case(
+        *[When(book_id=book_id, then=Value(delta)) for book_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _guard(book_id, quantity_delta, reserved_delta, check_available):
+    """Row-level WHERE clause that rejects updates going below zero"""
+    condition = Q(book_id=book_id)
+    if quantity_delta < 0:
+        condition &= Q(quantity__gte=-quantity_delta)
+    if reserved_delta < 0:
+        condition &= Q(reserved_quantity__gte=-reserved_delta)
+    if check_available and reserved_delta - quantity_delta > 0:
+        condition &= Q(quantity__gte=F('reserved_quantity') + (reserved_delta - quantity_delta))
+    return condition
+
+
+def apply_stock_deltas(quantity_deltas=None, reserved_deltas=None, check_available=False):
+    """
+    Apply per-book quantity/reserved deltas ({book_id: delta}) to Stock rows.
+
+    All rows are changed by one UPDATE using F() expressions, so concurrent
+    writers cannot lose each other's updates. Rows that would go negative
+    (or, with check_available, below their reservations) are filtered out
+    by the WHERE clause; if any row is rejected nothing is applied and
+    InsufficientStock is raised. Book.status is only written for books that
+    actually crossed the out-of-stock threshold, and stock_levels_changed is
+    sent after commit for books that moved between out/low/in stock.
+    """
+    quantity_deltas = {k: v for k, v in (quantity_deltas or {}).items() if v}
+    reserved_deltas = {k: v for k, v in (reserved_deltas or {}).items() if v}
+    book_ids = set(quantity_deltas) | set(reserved_deltas)
+    if not book_ids:
+        return set()
+
+    condition = Q()
+    for book_id in book_ids:
+        condition |= _guard(
+            book_id,
+            quantity_deltas.get(book_id, 0),
+            reserved_deltas.get(book_id, 0),
+            check_available,
+        )
+
+    try:
+        with transaction.atomic():
+            updated = Stock.objects.filter(book_id__in=book_ids).filter(condition).update(
+                quantity=_delta_expression('quantity', quantity_deltas),
+                reserved_quantity=_delta_expression('reserved_quantity', reserved_deltas),
+                last_updated=timezone.now(),
+            )
+            if updated != len(book_ids):
+                # Leaving the atomic block with an exception rolls the UPDATE back
+                raise InsufficientStock(book_ids)
+
+            changes = _level_changes(book_ids, quantity_deltas, reserved_deltas)
+            crossed_out = [
+                book_id for book_id, (before, after) in changes.items()
+                if (before == 'out_of_stock') != (after == 'out_of_stock')
+            ]
+            if crossed_out:
+                sync_book_status(crossed_out)
+    except InsufficientStock:
+        raise InsufficientStock(_rejected_books(book_ids, condition)) from None
+
+    if changes:
+        transaction.on_commit(lambda: stock_levels_changed.send(sender=Stock, book_ids=set(changes)))
+    return book_ids
+
+
+def stock_level(available, reorder_level):
+    """'out_of_stock', 'low_stock' or 'in_stock' for an available quantity"""
+    if available <= 0:
+        return 'out_of_stock'
+    if available <= reorder_level:
+        return 'low_stock'
+    return 'in_stock'
+
+
+def _level_changes(book_ids, quantity_deltas, reserved_deltas):
+    """{book_id: (before, after)} for books whose stock level crossed a threshold"""
+    changes = {}
+    for book_id, quantity, reserved, reorder_level in Stock.objects.filter(book_id__in=book_ids).values_list(
+        'book_id', 'quantity', 'reserved_quantity', 'reorder_level'
+    ):
+        available = quantity - reserved
+        previous = available - quantity_deltas.get(book_id, 0) + reserved_deltas.get(book_id, 0)
+        before, after = stock_level(previous, reorder_level), stock_level(available, reorder_level)
+        if before != after:
+            changes[book_id] = (before, after)
+    return changes
+
+
+def _rejected_books(book_ids, condition):
+    """Books skipped by the guard, or without a Stock record at all"""
+    accepted = Stock.objects.filter(book_id__in=book_ids).filter(condition).values_list('book_id', flat=True)
+    return book_ids - set(accepted)
+
+
+def sync_book_status(book_ids=None):
+    """
+    Move books across the out-of-stock threshold in two conditional UPDATEs.
+
+    Only books whose status actually needs to change are written; discontinued
+    books are left alone. Pass None to resync the whole catalog.
+    """
+    books = Book.objects.all() if book_ids is None else Book.objects.filter(pk__in=book_ids)
+
+    now_out = books.filter(
+        stock__quantity__lte=F('stock__reserved_quantity'),
+        status='available',
+    ).update(status='out_of_stock', updated_at=timezone.now())
+
+    back_in = books.filter(
+        stock__quantity__gt=F('stock__reserved_quantity'),
+        status='out_of_stock',
+    ).update(status='available', updated_at=timezone.now())
+
+    return now_out + back_in
+
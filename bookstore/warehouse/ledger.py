@@ -0,0 +1,124 @@
+# warehouse/ledger.py - Stock movement ledger queries
+from django.db.models import Case, When, Exists, OuterRef, F, Q, Max, Sum, Value, IntegerField
+from django.utils import timezone
+from .models import Stock, StockMovement, StockSnapshot
+
+# Keep IN clauses well below SQLite's bound parameter limit
+LEDGER_BATCH_SIZE = 500
+
+# SQL twin of StockMovement.stock_delta
+LEDGER_DELTA = Case(
+    When(
+        Q(movement_type__in=['in', 'returned'], quantity__gt=0) |
+        Q(movement_type__in=['out', 'damaged'], quantity__lt=0) |
+        Q(movement_type='adjustment'),
+        then=F('quantity'),
+    ),
+    default=Value(0),
+    output_field=IntegerField(),
+)
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), LEDGER_BATCH_SIZE):
+        yield ids[start:start + LEDGER_BATCH_SIZE]
+
+
+def latest_snapshots(stock_ids=None, at=None):
+    """{stock_id: (quantity, last_movement_id)} for the newest snapshot taken by `at`"""
+    snapshots = StockSnapshot.objects.all()
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+
+    if stock_ids is None:
+        heads = snapshots.values('stock_id').annotate(head=Max('last_movement_id'))
+        pairs = [(row['stock_id'], row['head']) for row in heads]
+    else:
+        pairs = []
+        for batch in _batches(stock_ids):
+            heads = snapshots.filter(stock_id__in=batch).values('stock_id').annotate(head=Max('last_movement_id'))
+            pairs.extend((row['stock_id'], row['head']) for row in heads)
+
+    result = {}
+    for batch in _batches(pairs):
+        condition = Q()
+        for stock_id, head in batch:
+            condition |= Q(stock_id=stock_id, last_movement_id=head)
+        for stock_id, quantity, head in StockSnapshot.objects.filter(condition).values_list(
+            'stock_id', 'quantity', 'last_movement_id'
+        ):
+            result[stock_id] = (quantity, head)
+    return result
+
+
+def _tail_sums(movements, after):
+    """Grouped SUM of ledger deltas per stock for movements after id `after`"""
+    sums = movements.filter(id__gt=after).order_by().values('stock_id').annotate(delta=Sum(LEDGER_DELTA))
+    return {row['stock_id']: row['delta'] or 0 for row in sums}
+
+
+def ledger_quantities(stock_ids=None, at=None, upto=None):
+    """
+    Quantity per stock according to the ledger: latest snapshot + sum of the
+    movements recorded after it. Pass `at` for a point-in-time answer
+    ("stock on 2026-01-01") or `upto` to stop at a movement id. One grouped
+    query per snapshot generation, so a full pass stays a handful of queries.
+    """
+    snapshots = latest_snapshots(stock_ids, at=at)
+
+    movements = StockMovement.objects.all()
+    if at is not None:
+        movements = movements.filter(created_at__lte=at)
+    if upto is not None:
+        movements = movements.filter(id__lte=upto)
+
+    totals = {stock_id: quantity for stock_id, (quantity, head) in snapshots.items()}
+
+    # Stocks without a snapshot are summed from the start of the ledger
+    if stock_ids is None:
+        covered = StockSnapshot.objects.filter(stock_id=OuterRef('stock_id'))
+        if at is not None:
+            covered = covered.filter(taken_at__lte=at)
+        totals.update(_tail_sums(movements.filter(~Exists(covered)), 0))
+    else:
+        unsnapshotted = set(stock_ids) - set(snapshots)
+        for batch in _batches(unsnapshotted):
+            totals.update(_tail_sums(movements.filter(stock_id__in=batch), 0))
+
+    # Stocks sharing a snapshot generation are summed in one pass
+    generations = {}
+    for stock_id, (quantity, head) in snapshots.items():
+        generations.setdefault(head, set()).add(stock_id)
+
+    for head, members in generations.items():
+        tail = movements if stock_ids is None else movements.filter(stock_id__in=members)
+        for stock_id, delta in _tail_sums(tail, head).items():
+            if stock_id in members:
+                totals[stock_id] += delta
+
+    if stock_ids is not None:
+        for stock_id in stock_ids:
+            totals.setdefault(stock_id, 0)
+    return totals
+
+
+def take_snapshots(stock_ids=None):
+    """Checkpoint the ledger for the given (or all) stocks; returns snapshots created"""
+    head = StockMovement.objects.aggregate(head=Max('id'))['head'] or 0
+    taken_at = timezone.now()
+
+    previous = latest_snapshots(stock_ids)
+    quantities = ledger_quantities(stock_ids, upto=head)
+
+    if stock_ids is None:
+        stock_ids = Stock.objects.values_list('id', flat=True)
+
+    snapshots = [
+        StockSnapshot(stock_id=stock_id, quantity=quantities.get(stock_id, 0),
+                      last_movement_id=head, taken_at=taken_at)
+        for stock_id in stock_ids
+        if previous.get(stock_id, (None, None))[1] != head
+    ]
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=LEDGER_BATCH_SIZE)
+    return len(snapshots)
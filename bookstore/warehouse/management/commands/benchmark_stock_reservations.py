@@ -0,0 +1,115 @@
+# warehouse/management/commands/benchmark_stock_reservations.py
+
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from books.models import Book, Category
+from warehouse.models import Stock, StockReservation
+from warehouse.inventory import apply_stock_deltas
+from warehouse.reservations import reserve_stock, release_reservations
+
+class Command(BaseCommand):
+    help = 'Measure checkout reservation throughput when every buyer wants the same book'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Concurrent buyers (default: 8)'
+        )
+        parser.add_argument(
+            '--checkouts',
+            type=int,
+            default=50,
+            help='Checkouts per buyer (default: 50)'
+        )
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Use the old per-row read-modify-write reservation for comparison',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite serializes all writers; run against PostgreSQL for meaningful numbers'
+            ))
+
+        book = self.create_hot_book()
+        try:
+            elapsed, completed, failures, error = self.run(book.id, options)
+            stock = Stock.objects.get(book=book)
+        finally:
+            book.delete()
+            Category.objects.filter(slug='benchmark-hot-sku').delete()
+
+        mode = 'legacy' if options['legacy'] else 'batched'
+        self.stdout.write(f'Mode: {mode}, {options["threads"]} threads x {options["checkouts"]} checkouts')
+        self.stdout.write(f'Completed: {completed}, failed: {failures}, elapsed: {elapsed:.2f}s')
+        if error:
+            self.stdout.write(self.style.WARNING(f'First failure: {error}'))
+        self.stdout.write(self.style.SUCCESS(f'Throughput: {completed / elapsed:.1f} checkouts/s'))
+
+        if stock.reserved_quantity:
+            self.stdout.write(self.style.ERROR(f'Reserved quantity leaked: {stock.reserved_quantity}'))
+
+    def create_hot_book(self):
+        category, created = Category.objects.get_or_create(
+            slug='benchmark-hot-sku', defaults={'name': 'Benchmark hot SKU'}
+        )
+        book = Book.objects.create(
+            title='Benchmark hot SKU', slug='benchmark-hot-sku', category=category,
+            description='Created by benchmark_stock_reservations', price=1,
+        )
+        apply_stock_deltas({book.id: 1000000})
+        return book
+
+    def run(self, book_id, options):
+        results = []
+        errors = []
+        lock = threading.Lock()
+        checkout = self.legacy_checkout if options['legacy'] else self.batched_checkout
+
+        def buyer():
+            completed = failures = 0
+            try:
+                for _ in range(options['checkouts']):
+                    try:
+                        checkout(book_id)
+                        completed += 1
+                    except Exception as e:
+                        failures += 1
+                        errors.append(e)
+            finally:
+                connection.close()
+            with lock:
+                results.append((completed, failures))
+
+        threads = [threading.Thread(target=buyer) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        first_error = repr(errors[0]) if errors else None
+        return elapsed, sum(r[0] for r in results), sum(r[1] for r in results), first_error
+
+    def batched_checkout(self, book_id):
+        reservations = reserve_stock({book_id: 1})
+        release_reservations(StockReservation.objects.filter(pk__in=[r.pk for r in reservations]))
+
+    def legacy_checkout(self, book_id):
+        with transaction.atomic():
+            stock = Stock.objects.select_for_update().get(book_id=book_id)
+            if stock.available_quantity < 1:
+                raise ValueError('Out of stock')
+            stock.reserved_quantity += 1
+            stock.save()
+        with transaction.atomic():
+            stock = Stock.objects.select_for_update().get(book_id=book_id)
+            stock.reserved_quantity -= 1
+            stock.save()
@@ -2,7 +2,7 @@
 
 from django.core.management.base import BaseCommand
 from books.models import Book
-from warehouse.models import Stock
+from warehouse.models import Stock, StockMovement
 
 class Command(BaseCommand):
     help = 'Create stock records for books that don\'t have them'
@@ -47,6 +47,17 @@ class Command(BaseCommand):
                 created_count += 1
                 self.stdout.write(f"Created stock record for: {book.title}")
                 
+                # Record the opening balance so the movement ledger matches
+                if stock.quantity:
+                    StockMovement.objects.create(
+                        stock=stock,
+                        movement_type='adjustment',
+                        quantity=stock.quantity,
+                        reference='Opening balance',
+                        reason='Stock record created',
+                        auto_update_stock=False,
+                    )
+                
                 # Update book status based on stock
                 if stock.quantity == 0:
                     book.status = 'out_of_stock'
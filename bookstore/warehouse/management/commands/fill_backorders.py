@@ -0,0 +1,30 @@
+# warehouse/management/commands/fill_backorders.py
+
+import time
+from django.core.management.base import BaseCommand
+from warehouse.reservations import fill_backorders
+
+class Command(BaseCommand):
+    help = 'Ship backordered order items from stock that has come back in'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and fill backorders every N seconds (default: run once)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            filled = fill_backorders()
+            if filled:
+                self.stdout.write(self.style.SUCCESS(f'Filled {filled} backordered units from stock'))
+            elif not interval:
+                self.stdout.write('No backorders could be filled')
+
+            if not interval:
+                return
+            time.sleep(interval)
@@ -0,0 +1,59 @@
+# warehouse/management/commands/forecast_demand.py
+
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+from warehouse.models import Stock, DemandForecast
+from warehouse.forecasting import compute_forecasts, store_forecasts
+from warehouse.summaries import invalidate_stock_summaries
+from warehouse.opportunities import rebuild_opportunities
+
+class Command(BaseCommand):
+    help = 'Rebuild per-book demand forecasts (daily demand, safety stock, reorder point) from the movement ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=None,
+            help='Days of history to use (default: DEMAND_FORECAST["HISTORY_DAYS"])'
+        )
+        parser.add_argument(
+            '--update-reorder-levels',
+            action='store_true',
+            help='Set Stock.reorder_level to the forecast reorder point for books with demand',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute and summarize forecasts without saving them',
+        )
+
+    def handle(self, *args, **options):
+        forecasts = compute_forecasts(history_days=options['history_days'])
+        with_demand = [forecast for forecast in forecasts if forecast.daily_demand > 0]
+
+        self.stdout.write(f'Forecasted {len(forecasts)} books, {len(with_demand)} with recent demand')
+        for forecast in sorted(with_demand, key=lambda f: -f.daily_demand)[:10]:
+            self.stdout.write(
+                f'  Book #{forecast.book_id}: {forecast.daily_demand:.2f}/day, '
+                f'reorder at {forecast.reorder_point}, order up to {forecast.target_level}'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN - forecasts not saved'))
+            return
+
+        store_forecasts(forecasts)
+        self.stdout.write(self.style.SUCCESS(f'Saved {len(forecasts)} demand forecasts'))
+
+        if options['update_reorder_levels']:
+            updated = Stock.objects.filter(book__demand_forecast__daily_demand__gt=0).update(
+                reorder_level=Subquery(
+                    DemandForecast.objects.filter(book_id=OuterRef('book_id')).values('reorder_point')[:1]
+                )
+            )
+            invalidate_stock_summaries()
+            self.stdout.write(self.style.SUCCESS(f'Updated reorder levels for {updated} stock records'))
+
+        # Opportunity scores rank books by forecast demand
+        rebuild_opportunities()
@@ -0,0 +1,55 @@
+# warehouse/management/commands/ingest_audit_scans.py
+
+import sys
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from warehouse.models import InventoryAudit
+from warehouse.audits import ingest_audit_scans, AuditIngestError
+
+class Command(BaseCommand):
+    help = 'Load scanner output (ISBN and optional count per line) into an inventory audit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('audit_id', help='Audit ID, e.g. IA1A2B3C4D')
+        parser.add_argument('scans', help='Scanner output file, or - to read from stdin')
+        parser.add_argument(
+            '--post-adjustments',
+            action='store_true',
+            help='Correct stock to the counted quantities and record adjustment movements'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on the adjustment movements'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            audit = InventoryAudit.objects.get(audit_id=options['audit_id'])
+        except InventoryAudit.DoesNotExist:
+            raise CommandError(f'Audit {options["audit_id"]} does not exist.')
+
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'User {options["user"]} does not exist.')
+
+        scans = sys.stdin if options['scans'] == '-' else open(options['scans'], encoding='utf-8-sig')
+        try:
+            result = ingest_audit_scans(
+                audit, scans, performed_by=user, post_adjustments=options['post_adjustments']
+            )
+        except AuditIngestError as e:
+            raise CommandError(str(e))
+        finally:
+            if scans is not sys.stdin:
+                scans.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Audit #{audit.audit_id}: {result.items_created} items, {result.units_counted} units counted, '
+            f'net variance {result.total_variance:+d}, {result.adjustments} stock adjustments'
+        ))
+        if result.problem_count:
+            self.stdout.write(self.style.WARNING(f'{result.problem_count} problems'))
+            for where, message in result.problems[:20]:
+                self.stdout.write(f'  {where}: {message}')
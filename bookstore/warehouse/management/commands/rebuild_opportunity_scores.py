@@ -0,0 +1,29 @@
+# warehouse/management/commands/rebuild_opportunity_scores.py
+
+import time
+from django.core.management.base import BaseCommand
+from warehouse.opportunities import rebuild_opportunities
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-category and per-book restock opportunity tables shown to vendors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and rebuild every N seconds (default: run once)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            books, categories = rebuild_opportunities()
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt opportunity scores: {books} books need stock across {categories} categories'
+            ))
+
+            if not interval:
+                return
+            time.sleep(interval)
@@ -0,0 +1,81 @@
+# warehouse/management/commands/reconcile_stock_ledger.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from warehouse.models import Stock, StockMovement
+from warehouse.ledger import ledger_quantities, LEDGER_BATCH_SIZE
+from warehouse.inventory import sync_book_status
+from warehouse.opportunities import refresh_opportunities
+
+class Command(BaseCommand):
+    help = 'Verify Stock.quantity against the movement ledger (snapshot + grouped tail sums)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Set Stock.quantity to the ledger value for drifted records',
+        )
+        parser.add_argument(
+            '--adopt-stock',
+            action='store_true',
+            help='Record adjustment movements so the ledger matches Stock.quantity '
+                 '(use once for stock entered before the ledger existed)',
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Number of drifted records to list (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        if options['fix'] and options['adopt_stock']:
+            raise CommandError('Use either --fix or --adopt-stock, not both.')
+
+        ledger = ledger_quantities()
+
+        drifted = []
+        for stock_id, book_id, quantity in Stock.objects.values_list('id', 'book_id', 'quantity').iterator(
+            chunk_size=LEDGER_BATCH_SIZE
+        ):
+            expected = ledger.get(stock_id, 0)
+            if quantity != expected:
+                drifted.append((stock_id, book_id, quantity, expected))
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Stock matches the movement ledger.'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'{len(drifted)} stock records differ from the ledger'))
+        for stock_id, book_id, quantity, expected in drifted[:options['show']]:
+            self.stdout.write(f'  Stock #{stock_id} (book #{book_id}): stock={quantity} ledger={expected}')
+
+        if options['fix']:
+            self.fix_stock(drifted)
+            self.stdout.write(self.style.SUCCESS(f'Updated {len(drifted)} stock records from the ledger'))
+        elif options['adopt_stock']:
+            self.adopt_stock(drifted)
+            self.stdout.write(self.style.SUCCESS(f'Recorded {len(drifted)} ledger adjustments'))
+
+    @transaction.atomic
+    def fix_stock(self, drifted):
+        stocks = [Stock(id=stock_id, quantity=expected) for stock_id, book_id, quantity, expected in drifted]
+        Stock.objects.bulk_update(stocks, ['quantity'], batch_size=LEDGER_BATCH_SIZE)
+        book_ids = [book_id for stock_id, book_id, quantity, expected in drifted]
+        sync_book_status(book_ids)
+        transaction.on_commit(lambda: refresh_opportunities(book_ids))
+
+    def adopt_stock(self, drifted):
+        # bulk_create skips StockMovement.save(), so Stock itself is untouched
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                stock_id=stock_id,
+                movement_type='adjustment',
+                quantity=quantity - expected,
+                reference='Ledger reconciliation',
+                reason='Opening balance adopted from stock record',
+                auto_update_stock=False,
+            )
+            for stock_id, book_id, quantity, expected in drifted
+        ], batch_size=LEDGER_BATCH_SIZE)
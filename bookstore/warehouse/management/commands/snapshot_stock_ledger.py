@@ -0,0 +1,11 @@
+# warehouse/management/commands/snapshot_stock_ledger.py
+
+from django.core.management.base import BaseCommand
+from warehouse.ledger import take_snapshots
+
+class Command(BaseCommand):
+    help = 'Checkpoint the stock movement ledger so quantity queries only sum recent movements'
+
+    def handle(self, *args, **options):
+        created = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Created {created} stock snapshots'))
@@ -0,0 +1,30 @@
+# warehouse/management/commands/sweep_stock_reservations.py
+
+import time
+from django.core.management.base import BaseCommand
+from warehouse.reservations import sweep_expired_reservations
+
+class Command(BaseCommand):
+    help = 'Release stock held by reservations that have expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and sweep every N seconds (default: run once)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            released = sweep_expired_reservations()
+            if released:
+                self.stdout.write(self.style.SUCCESS(f'Released {released} units from expired reservations'))
+            elif not interval:
+                self.stdout.write('No expired reservations')
+
+            if not interval:
+                return
+            time.sleep(interval)
@@ -39,27 +39,46 @@ class Stock(models.Model):
     def is_out_of_stock(self):
         return self.available_quantity <= 0
     
+    @property
+    def suggested_order_quantity(self):
+        """Units to order now: from the demand forecast when there is one, else the static rules"""
+        forecast = getattr(self.book, 'demand_forecast', None)
+        if forecast is not None and forecast.has_demand:
+            return forecast.suggested_quantity(self.available_quantity)
+        
+        current_stock = self.available_quantity
+        if current_stock <= 0:
+            # Out of stock - suggest higher quantity
+            return max(25, self.reorder_level + 15)
+        elif current_stock <= self.reorder_level:
+            # Low stock - suggest to reach comfortable level
+            return max(self.reorder_level - current_stock + 10, 10)
+        else:
+            # In stock - minimal quantity
+            return 5
+    
     def get_location(self):
         if self.location_section and self.location_row and self.location_shelf:
             return f"{self.location_section}-{self.location_row}-{self.location_shelf}"
         return "Not Assigned"
 
-    def save(self, *args, **kwargs):
-        # Update the book's status based on stock levels
-        super().save(*args, **kwargs)
-        self.update_book_status()
+    def quantity_at(self, at=None):
+        """Quantity according to the movement ledger, now or at a point in time"""
+        from .ledger import ledger_quantities
+        return ledger_quantities([self.pk], at=at).get(self.pk, 0)
     
     def update_book_status(self):
-        """Update the related book's status based on stock levels"""
-        if self.is_out_of_stock:
-            self.book.status = 'out_of_stock'
-        elif self.needs_reorder:
-            # Book is still available but low stock
-            self.book.status = 'available'
-        else:
-            self.book.status = 'available'
+        """Update the related book's status, writing only when the out-of-stock threshold is crossed"""
+        status = 'out_of_stock' if self.is_out_of_stock else 'available'
+        
+        # Conditional UPDATE instead of Book.save(): no full_clean() and no write
+        # at all while the book is already on the right side of the threshold
+        changed = Book.objects.filter(pk=self.book_id).exclude(
+            status__in=[status, 'discontinued']
+        ).update(status=status)
         
-        self.book.save(update_fields=['status'])
+        if changed and Stock.book.is_cached(self):
+            self.book.status = status
 
     
     def update_from_delivery(self, delivery_schedule, confirmed_quantity, staff_user):
@@ -77,10 +96,7 @@ class Stock(models.Model):
             auto_created_from_delivery=True
         )
         
-        # Update stock quantity
-        self.quantity += confirmed_quantity
-        self.save()
-        
+        # The movement has already applied the quantity (and refreshed self)
         return movement
 
 class StockMovement(models.Model):
@@ -114,56 +130,240 @@ class StockMovement(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['stock', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.stock.book.title} - {self.movement_type} ({self.quantity})"
     
+    @property
+    def stock_delta(self):
+        """Change this movement applies to Stock.quantity"""
+        if self.movement_type in ['in', 'returned'] and self.quantity > 0:
+            return abs(self.quantity)
+        elif self.movement_type in ['out', 'damaged'] and self.quantity < 0:
+            return self.quantity  # Subtract (quantity is negative)
+        elif self.movement_type == 'adjustment':
+            # For adjustments, apply the quantity as-is (can be positive or negative)
+            return self.quantity
+        return 0
+    
     def save(self, *args, **kwargs):
+        # The ledger is append-only: corrections are recorded as new adjustments
+        if self.pk is not None:
+            raise ValueError("Stock movements cannot be modified; record an adjustment instead.")
+        
         # FIXED: Only update stock if this is a new movement AND auto_update_stock is True
         is_new_movement = self.pk is None
         
-        if is_new_movement and self.auto_update_stock:
-            # Update stock quantity based on movement type
-            if self.movement_type in ['in', 'returned'] and self.quantity > 0:
-                self.stock.quantity += abs(self.quantity)
-            elif self.movement_type in ['out', 'damaged'] and self.quantity < 0:
-                self.stock.quantity += self.quantity  # Subtract (quantity is negative)
-            elif self.movement_type == 'adjustment':
-                # For adjustments, apply the quantity as-is (can be positive or negative)
-                if self.quantity != 0:  # Only update if there's an actual quantity change
-                    self.stock.quantity += self.quantity
+        if is_new_movement and self.auto_update_stock and self.stock_delta:
+            from .inventory import apply_stock_deltas
             
-            # Save stock and update book status
-            self.stock.save()
+            # F() update instead of read-modify-write; book status is only
+            # touched when the out-of-stock threshold is crossed
+            apply_stock_deltas({self.stock.book_id: self.stock_delta})
+            self.stock.refresh_from_db(fields=['quantity', 'reserved_quantity', 'last_updated'])
         
         super().save(*args, **kwargs)
-        
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements cannot be deleted; record an adjustment instead.")
+
+
+class StockSnapshot(models.Model):
+    """Ledger checkpoint: stock quantity after every movement up to last_movement_id"""
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='snapshots')
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-taken_at']
+        unique_together = ['stock', 'last_movement_id']
+        indexes = [
+            models.Index(fields=['stock', 'taken_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.stock.book.title} - {self.quantity} @ {self.taken_at:%Y-%m-%d %H:%M}"
+
+class StockReservation(models.Model):
+    """Expiring hold on stock for a pending order"""
+    STATUS_CHOICES = (
+        ('held', 'Held'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    )
+    
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='reservations')
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.stock.book.title} x{self.quantity} ({self.status})"
+
+class DemandForecast(models.Model):
+    """Per-book demand forecast, rebuilt in one batch by the forecast_demand command"""
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='demand_forecast')
+    daily_demand = models.FloatField(default=0, help_text="Exponentially smoothed units per day")
+    demand_std = models.FloatField(default=0, help_text="Standard deviation of daily demand")
+    safety_stock = models.PositiveIntegerField(default=0)
+    reorder_point = models.PositiveIntegerField(default=0, help_text="Lead time demand + safety stock")
+    target_level = models.PositiveIntegerField(default=0, help_text="Order-up-to level")
+    history_days = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+    
+    MIN_ORDER_QUANTITY = 5
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['reorder_point']),
+        ]
+    
+    def __str__(self):
+        return f"{self.book.title} - {self.daily_demand:.2f}/day"
+    
+    @property
+    def has_demand(self):
+        return self.daily_demand > 0
+    
+    @property
+    def days_of_cover(self):
+        if not self.has_demand:
+            return None
+        return max(self.book.stock.available_quantity, 0) / self.daily_demand
+    
+    def suggested_quantity(self, available):
+        return max(self.target_level - max(available, 0), self.MIN_ORDER_QUANTITY)
+
 class CategoryStock(models.Model):
+    """Per-category stock levels and opportunity score, maintained by warehouse.opportunities"""
     category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='category_stock')
     total_books = models.PositiveIntegerField(default=0)
     total_quantity = models.PositiveIntegerField(default=0)
     out_of_stock_books = models.PositiveIntegerField(default=0)
     low_stock_books = models.PositiveIntegerField(default=0)
+    no_stock_record = models.PositiveIntegerField(default=0)
+    opportunity_score = models.PositiveSmallIntegerField(default=0, help_text="Percent of books needing stock")
     
     last_updated = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-opportunity_score']),
+        ]
+    
+    @property
+    def needs_restock(self):
+        return self.out_of_stock_books + self.low_stock_books + self.no_stock_record
+    
     def update_stats(self):
-        from django.db.models import Count, Sum, Q
-        
-        stocks = Stock.objects.filter(book__category=self.category)
+        from .opportunities import refresh_category_stock
         
-        self.total_books = stocks.count()
-        self.total_quantity = stocks.aggregate(Sum('quantity'))['quantity__sum'] or 0
-        self.out_of_stock_books = stocks.filter(quantity=0).count()
-        self.low_stock_books = stocks.filter(
-            Q(quantity__lte=models.F('reorder_level')) & Q(quantity__gt=0)
-        ).count()
-        
-        self.save()
+        refresh_category_stock([self.category_id])
+        self.refresh_from_db()
     
     def __str__(self):
         return f"{self.category.name} Stock Summary"
 
+class BookOpportunity(models.Model):
+    """A book vendors should restock; only books needing stock have a row"""
+    LEVEL_CHOICES = (
+        ('out_of_stock', 'Out of Stock'),
+        ('no_stock', 'No Stock Record'),
+        ('low_stock', 'Low Stock'),
+    )
+    
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='opportunity')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='book_opportunities')
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    score = models.FloatField(default=0, help_text="Level weight plus forecast daily demand")
+    refreshed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score']),
+            models.Index(fields=['category', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.book.title} - {self.get_level_display()} ({self.score:.1f})"
+
+class PickWave(models.Model):
+    """A batch of confirmed orders picked together in one walk of the warehouse"""
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    )
+    
+    wave_id = models.CharField(max_length=20, unique=True)
+    orders = models.ManyToManyField('orders.Order', related_name='pick_waves')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    
+    order_count = models.PositiveIntegerField(default=0)
+    line_count = models.PositiveIntegerField(default=0)
+    total_units = models.PositiveIntegerField(default=0)
+    
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Pick Wave #{self.wave_id} - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        if not self.wave_id:
+            import uuid
+            self.wave_id = f"PW{str(uuid.uuid4())[:8].upper()}"
+        super().save(*args, **kwargs)
+
+class PickLine(models.Model):
+    """One stop on a wave's walk: every unit of a book needed by the wave's orders"""
+    wave = models.ForeignKey(PickWave, on_delete=models.CASCADE, related_name='lines')
+    sequence = models.PositiveIntegerField(help_text="Position in the walk order")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    # Location at the time the wave was built
+    location_section = models.CharField(max_length=10, blank=True)
+    location_row = models.CharField(max_length=10, blank=True)
+    location_shelf = models.CharField(max_length=20, blank=True)
+    
+    quantity = models.PositiveIntegerField()
+    order_count = models.PositiveIntegerField(default=0, help_text="Orders in the wave containing this book")
+    
+    class Meta:
+        ordering = ['wave', 'sequence']
+        unique_together = ['wave', 'book']
+    
+    def __str__(self):
+        return f"{self.wave.wave_id} #{self.sequence} - {self.book.title} x{self.quantity}"
+    
+    def get_location(self):
+        if self.location_section and self.location_row and self.location_shelf:
+            return f"{self.location_section}-{self.location_row}-{self.location_shelf}"
+        return "Not Assigned"
+
 class InventoryAudit(models.Model):
     AUDIT_STATUS = (
         ('scheduled', 'Scheduled'),
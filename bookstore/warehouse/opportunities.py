@@ -0,0 +1,166 @@
+# warehouse/opportunities.py - Precomputed restock opportunity scores for vendors
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from books.models import Book, Category
+from .models import CategoryStock, BookOpportunity
+from .inventory import stock_level
+from .summaries import category_stock_counts, invalidate_stock_summaries, OFFERABLE_STATUSES
+
+WRITE_BATCH_SIZE = 500
+
+# Out of stock first, then books never stocked, then low stock; demand breaks ties
+LEVEL_WEIGHTS = {
+    'out_of_stock': 300,
+    'no_stock': 200,
+    'low_stock': 100,
+}
+
+
+def opportunity_score(counts):
+    """Percent of a category's offerable books that need stock"""
+    if not counts['total_books']:
+        return 0
+    needs = counts['out_of_stock_books'] + counts['low_stock_books'] + counts['no_stock_record']
+    return int(needs / counts['total_books'] * 100)
+
+
+def book_opportunities(book_ids=None):
+    """Unsaved BookOpportunity rows for offerable books that need stock"""
+    books = Book.objects.filter(category__is_active=True, status__in=OFFERABLE_STATUSES)
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+
+    rows = books.values_list(
+        'id', 'category_id', 'stock__id', 'stock__quantity', 'stock__reserved_quantity',
+        'stock__reorder_level', 'demand_forecast__daily_demand',
+    ).order_by()
+
+    opportunities = []
+    for book_id, category_id, stock_id, quantity, reserved, reorder_level, daily_demand in rows:
+        if stock_id is None:
+            level = 'no_stock'
+        else:
+            level = stock_level(quantity - reserved, reorder_level)
+        if level == 'in_stock':
+            continue
+        opportunities.append(BookOpportunity(
+            book_id=book_id,
+            category_id=category_id,
+            level=level,
+            score=LEVEL_WEIGHTS[level] + (daily_demand or 0),
+        ))
+    return opportunities
+
+
+def refresh_book_opportunities(book_ids=None):
+    """Upsert opportunity rows for the given books (all books when None) and drop stale ones"""
+    opportunities = book_opportunities(book_ids)
+    BookOpportunity.objects.bulk_create(
+        opportunities,
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['book'],
+        update_fields=['category', 'level', 'score', 'refreshed_at'],
+    )
+
+    stale = BookOpportunity.objects.exclude(book_id__in=[row.book_id for row in opportunities])
+    if book_ids is not None:
+        stale = stale.filter(book_id__in=book_ids)
+    stale.delete()
+    return len(opportunities)
+
+
+def refresh_category_stock(category_ids=None):
+    """Recount CategoryStock rows for the given categories (all when None) in one aggregate"""
+    counts = {row['id']: row for row in category_stock_counts(category_ids)}
+    if category_ids is None:
+        category_ids = Category.objects.values_list('pk', flat=True)
+
+    empty = {'total_books': 0, 'total_quantity': 0, 'out_of_stock_books': 0, 'low_stock_books': 0, 'no_stock_record': 0}
+    rows = []
+    for category_id in category_ids:
+        row = counts.get(category_id, empty)
+        rows.append(CategoryStock(
+            category_id=category_id,
+            total_books=row['total_books'],
+            total_quantity=max(row['total_quantity'], 0),
+            out_of_stock_books=row['out_of_stock_books'],
+            low_stock_books=row['low_stock_books'],
+            no_stock_record=row['no_stock_record'],
+            opportunity_score=opportunity_score(row),
+        ))
+
+    CategoryStock.objects.bulk_create(
+        rows,
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['category'],
+        update_fields=[
+            'total_books', 'total_quantity', 'out_of_stock_books', 'low_stock_books',
+            'no_stock_record', 'opportunity_score', 'last_updated',
+        ],
+    )
+    return len(rows)
+
+
+@transaction.atomic
+def refresh_opportunities(book_ids):
+    """Incremental refresh after the given books changed stock level"""
+    book_ids = set(book_ids)
+    if not book_ids:
+        return
+    refresh_book_opportunities(book_ids)
+    refresh_category_stock(set(Book.objects.filter(pk__in=book_ids).values_list('category_id', flat=True)))
+    invalidate_stock_summaries()
+
+
+@transaction.atomic
+def refresh_moved_book(book_id, category_ids=None):
+    """
+    A book changed status or category: refresh it and recount the categories
+    it left and joined (all of them when those are unknown).
+    """
+    refresh_book_opportunities([book_id])
+    refresh_category_stock(category_ids)
+    invalidate_stock_summaries()
+
+
+@transaction.atomic
+def rebuild_opportunities():
+    """Full rebuild of both tables; returns (books needing stock, categories)"""
+    books = refresh_book_opportunities()
+    categories = refresh_category_stock()
+    invalidate_stock_summaries()
+    return books, categories
+
+
+def category_stock_summary():
+    """category_stock_counts() rows, plus opportunity_score, read from the maintained CategoryStock table"""
+    return [
+        {
+            'id': stock.category_id,
+            'name': stock.category.name,
+            'slug': stock.category.slug,
+            'total_books': stock.total_books,
+            'total_quantity': stock.total_quantity,
+            'out_of_stock_books': stock.out_of_stock_books,
+            'low_stock_books': stock.low_stock_books,
+            'in_stock_books': stock.total_books - stock.needs_restock,
+            'no_stock_record': stock.no_stock_record,
+            'opportunity_score': stock.opportunity_score,
+        }
+        for stock in CategoryStock.objects.filter(
+            category__is_active=True, total_books__gt=0
+        ).select_related('category').order_by('category__name')
+    ]
+
+
+def opportunity_totals():
+    """Catalogue-wide opportunity counts read from CategoryStock in one query"""
+    totals = CategoryStock.objects.filter(category__is_active=True).aggregate(
+        out_of_stock_books=Sum('out_of_stock_books'),
+        low_stock_books=Sum('low_stock_books'),
+        no_stock_record=Sum('no_stock_record'),
+        categories_needing_attention=Count('id', filter=Q(opportunity_score__gt=0)),
+    )
+    return {key: value or 0 for key, value in totals.items()}
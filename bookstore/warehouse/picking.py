@@ -0,0 +1,229 @@
+# warehouse/picking.py - Wave picking: batch confirmed orders into location-ordered pick lists
+import re
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.db.models.signals import post_save
+from django.utils import timezone
+from orders.models import Order, OrderItem, OrderTracking
+from .models import PickWave, PickLine
+
+WRITE_BATCH_SIZE = 1000
+
+
+def max_wave_orders():
+    return getattr(settings, 'PICK_WAVE_MAX_ORDERS', 2000)
+
+
+class NoOrdersToPick(Exception):
+    """There are no confirmed orders waiting for a pick wave"""
+
+
+def orders_awaiting_pick():
+    """Confirmed orders with at least one unit in stock; fully backordered ones wait for fill_backorders"""
+    return Order.objects.filter(status='confirmed').filter(Exists(
+        OrderItem.objects.filter(order=OuterRef('pk'), quantity__gt=F('backordered_quantity'))
+    ))
+
+
+def _natural_key(value):
+    """Sort key where 'A2' comes before 'A10'"""
+    return [
+        (0, int(part), '') if part.isdigit() else (1, 0, part.lower())
+        for part in re.split(r'(\d+)', value.strip()) if part
+    ]
+
+
+def _has_location(line):
+    return bool(line['location_section'] and line['location_row'] and line['location_shelf'])
+
+
+def walk_order(lines):
+    """
+    Order pick lines for one walk through the warehouse.
+
+    Aisles (section, row) are visited in natural order and shelves are
+    walked serpentine: up one aisle, back down the next, so the picker
+    never walks an aisle empty-handed. Lines without a full location go
+    last, by title, so they can be searched for at the end.
+    """
+    aisles = {}
+    unassigned = []
+    for line in lines:
+        if _has_location(line):
+            aisle = (line['location_section'], line['location_row'])
+            aisles.setdefault(aisle, []).append(line)
+        else:
+            unassigned.append(line)
+
+    ordered = []
+    aisle_keys = sorted(aisles, key=lambda aisle: (_natural_key(aisle[0]), _natural_key(aisle[1])))
+    for index, aisle in enumerate(aisle_keys):
+        ordered.extend(sorted(
+            aisles[aisle],
+            key=lambda line: _natural_key(line['location_shelf']),
+            reverse=index % 2 == 1,
+        ))
+    ordered.extend(sorted(unassigned, key=lambda line: (line['title'].lower(), line['book_id'])))
+    return ordered
+
+
+def _move_orders(order_ids, status):
+    """
+    Move orders to `status` with one UPDATE, then send post_save for each so
+    the delivery receivers see the change as they would after Order.save()
+    """
+    Order.objects.filter(pk__in=order_ids).update(status=status, updated_at=timezone.now())
+    using = router.db_for_write(Order)
+    for order in Order.objects.filter(pk__in=order_ids).select_related('delivery'):
+        post_save.send(
+            sender=Order, instance=order, created=False,
+            update_fields=frozenset(['status', 'updated_at']), raw=False, using=using,
+        )
+
+
+def _wave_lines(wave):
+    """
+    Quantity per book across all of the wave's orders, with the book's stock
+    location, in one query. Backordered units have no stock to pick and are
+    left out.
+    """
+    rows = OrderItem.objects.filter(
+        order__pick_waves=wave, quantity__gt=F('backordered_quantity'),
+    ).values(
+        'book_id',
+        title=F('book__title'),
+        isbn=F('book__isbn'),
+        stock_id=F('book__stock__id'),
+        location_section=F('book__stock__location_section'),
+        location_row=F('book__stock__location_row'),
+        location_shelf=F('book__stock__location_shelf'),
+    ).annotate(
+        quantity=Sum(F('quantity') - F('backordered_quantity')),
+        order_count=Count('order_id', distinct=True),
+    ).order_by()
+
+    lines = []
+    for row in rows:
+        # Books without a stock record have no location at all
+        for field in ('location_section', 'location_row', 'location_shelf'):
+            row[field] = row[field] or ''
+        lines.append(row)
+    return lines
+
+
+@transaction.atomic
+def build_pick_wave(user=None, max_orders=None):
+    """
+    Take up to max_orders confirmed orders, oldest first, into a new wave.
+
+    The wave's orders are linked, moved to 'processing' and tracked in
+    bulk; their items are aggregated per book by the database and the
+    resulting lines are sorted into walk order and inserted with
+    bulk_create. Beyond the delivery receivers run for each moved order,
+    the cost does not grow with per-order queries.
+    """
+    max_orders = max_orders or max_wave_orders()
+    order_ids = list(
+        orders_awaiting_pick().select_for_update(skip_locked=True)
+        .order_by('created_at', 'id').values_list('id', flat=True)[:max_orders]
+    )
+    if not order_ids:
+        raise NoOrdersToPick('There are no confirmed orders waiting to be picked.')
+
+    wave = PickWave.objects.create(created_by=user, order_count=len(order_ids))
+    PickWave.orders.through.objects.bulk_create([
+        PickWave.orders.through(pickwave_id=wave.pk, order_id=order_id)
+        for order_id in order_ids
+    ], batch_size=WRITE_BATCH_SIZE)
+
+    _move_orders(order_ids, 'processing')
+    OrderTracking.objects.bulk_create([
+        OrderTracking(
+            order_id=order_id,
+            status='preparing',
+            description='Your order is being picked in the warehouse.',
+        )
+        for order_id in order_ids
+    ], batch_size=WRITE_BATCH_SIZE)
+
+    lines = walk_order(_wave_lines(wave))
+    PickLine.objects.bulk_create([
+        PickLine(
+            wave=wave,
+            sequence=sequence,
+            book_id=line['book_id'],
+            stock_id=line['stock_id'],
+            location_section=line['location_section'],
+            location_row=line['location_row'],
+            location_shelf=line['location_shelf'],
+            quantity=line['quantity'],
+            order_count=line['order_count'],
+        )
+        for sequence, line in enumerate(lines, start=1)
+    ], batch_size=WRITE_BATCH_SIZE)
+
+    wave.line_count = len(lines)
+    wave.total_units = sum(line['quantity'] for line in lines)
+    wave.save(update_fields=['line_count', 'total_units'])
+    return wave
+
+
+def complete_pick_wave(wave):
+    if wave.status != 'open':
+        return False
+    wave.status = 'completed'
+    wave.completed_at = timezone.now()
+    wave.save(update_fields=['status', 'completed_at'])
+    return True
+
+
+@transaction.atomic
+def cancel_pick_wave(wave):
+    """Cancel an open wave and put its orders that are still processing back in the queue"""
+    if wave.status != 'open':
+        return False
+    order_ids = list(
+        Order.objects.select_for_update().filter(pick_waves=wave, status='processing').values_list('id', flat=True)
+    )
+    _move_orders(order_ids, 'confirmed')
+    # Follows the wave's 'preparing' entry so the order's history ends in the right state
+    OrderTracking.objects.bulk_create([
+        OrderTracking(
+            order_id=order_id,
+            status='order_confirmed',
+            description='Picking was cancelled. Your order is waiting to be picked again.',
+        )
+        for order_id in order_ids
+    ], batch_size=WRITE_BATCH_SIZE)
+    wave.status = 'cancelled'
+    wave.save(update_fields=['status'])
+    return True
+
+
+def pick_list(wave):
+    """JSON-ready pick list for a wave, lines in walk order"""
+    lines = wave.lines.values(
+        'sequence', 'book_id', 'stock_id', 'quantity', 'order_count',
+        'location_section', 'location_row', 'location_shelf',
+        title=F('book__title'), isbn=F('book__isbn'),
+    ).order_by('sequence')
+    return {
+        'wave_id': wave.wave_id,
+        'status': wave.status,
+        'created_at': wave.created_at.isoformat(),
+        'order_count': wave.order_count,
+        'line_count': wave.line_count,
+        'total_units': wave.total_units,
+        'orders': list(wave.orders.order_by('created_at', 'id').values_list('order_id', flat=True)),
+        'lines': [
+            {
+                **line,
+                'isbn': line['isbn'] or '',
+                'location': '-'.join([line['location_section'], line['location_row'], line['location_shelf']])
+                if _has_location(line) else None,
+            }
+            for line in lines
+        ],
+    }
@@ -0,0 +1,329 @@
+# warehouse/reservations.py - Batched, expiring stock reservations
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Stock, StockMovement, StockReservation
+from .inventory import apply_stock_deltas, InsufficientStock, _delta_expression
+
+SWEEP_BATCH_SIZE = 500
+# Orders whose backordered units can still be shipped
+BACKORDER_STATUSES = ('confirmed', 'processing')
+
+
+def hold_duration():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_HOLD_SECONDS', 30 * 60))
+
+
+def order_lines(items):
+    """{book_id: quantity} for cart or order items, merging repeated books"""
+    lines = {}
+    for item in items:
+        lines[item.book_id] = lines.get(item.book_id, 0) + item.quantity
+    return lines
+
+
+def stocked_lines(items):
+    """{book_id: quantity} for order items, leaving out backordered units never taken from stock"""
+    lines = {}
+    for item in items:
+        quantity = item.quantity - item.backordered_quantity
+        if quantity > 0:
+            lines[item.book_id] = lines.get(item.book_id, 0) + quantity
+    return lines
+
+
+def _lock_stocks(book_ids):
+    """
+    Lock every Stock row of the batch with one SELECT ... FOR UPDATE in
+    book_id order, so two checkouts sharing books can never deadlock.
+    """
+    return dict(
+        Stock.objects.select_for_update().filter(book_id__in=book_ids).order_by('book_id').values_list('book_id', 'id')
+    )
+
+
+def shortage_message(exc):
+    """Human readable reason for an InsufficientStock raised by reserve_stock"""
+    stock = Stock.objects.filter(book_id__in=exc.book_ids).select_related('book').order_by('book_id').first()
+    if stock is None:
+        from books.models import Book
+        book = Book.objects.filter(pk__in=exc.book_ids).first()
+        return f'Stock record not found for "{book.title if book else exc.book_ids[0]}"'
+    return f'Not enough stock for "{stock.book.title}". Available: {max(stock.available_quantity, 0)}'
+
+
+@transaction.atomic
+def reserve_stock(lines, order=None, performed_by=None, hold_for=None):
+    """
+    Hold stock for {book_id: quantity} lines in one batch.
+
+    All rows are locked in a deterministic order, then reserved_quantity is
+    raised for every line by a single guarded UPDATE; if any line is short
+    nothing is reserved and InsufficientStock is raised. Holds expire after
+    STOCK_RESERVATION_HOLD_SECONDS unless committed or released.
+    """
+    lines = {book_id: quantity for book_id, quantity in lines.items() if quantity > 0}
+    if not lines:
+        return []
+
+    stock_ids = _lock_stocks(lines)
+    missing = set(lines) - set(stock_ids)
+    if missing:
+        raise InsufficientStock(missing)
+
+    apply_stock_deltas(reserved_deltas=lines, check_available=True)
+
+    expires_at = timezone.now() + (hold_for or hold_duration())
+    reservations = StockReservation.objects.bulk_create([
+        StockReservation(stock_id=stock_ids[book_id], order=order, quantity=quantity, expires_at=expires_at)
+        for book_id, quantity in sorted(lines.items())
+    ])
+
+    if order is not None:
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                stock_id=stock_ids[book_id],
+                movement_type='adjustment',  # Use adjustment for reservations
+                quantity=0,  # No actual stock change yet, just reservation
+                reference=f"Order-{order.order_id}-Reserved",
+                reason=f"Stock reserved for order {order.order_id}",
+                performed_by=performed_by,
+            )
+            for book_id in sorted(lines)
+        ])
+    return reservations
+
+
+def _claim(reservations, status):
+    """
+    Move held reservations to `status`; returns {book_id: quantity} of the
+    rows actually claimed, so a concurrent sweeper and checkout can never
+    both release the same hold.
+    """
+    rows = list(
+        reservations.select_for_update().filter(status='held').order_by('pk').values_list('pk', 'stock__book_id', 'quantity')
+    )
+    if not rows:
+        return {}
+    StockReservation.objects.filter(pk__in=[pk for pk, book_id, quantity in rows]).update(
+        status=status, updated_at=timezone.now()
+    )
+    claimed = {}
+    for pk, book_id, quantity in rows:
+        claimed[book_id] = claimed.get(book_id, 0) + quantity
+    return claimed
+
+
+@transaction.atomic
+def release_reservations(reservations, status='released'):
+    """Give held stock back; returns the number of units released"""
+    # Stock rows first, like every other path, then the holds themselves
+    _lock_stocks(set(reservations.filter(status='held').values_list('stock__book_id', flat=True)))
+    claimed = _claim(reservations, status)
+    if claimed:
+        apply_stock_deltas(reserved_deltas={book_id: -quantity for book_id, quantity in claimed.items()})
+    return sum(claimed.values())
+
+
+@transaction.atomic
+def release_order_reservations(order):
+    if order.stock_reservations.exists():
+        return release_reservations(order.stock_reservations.all())
+
+    # Orders placed before reservations were tracked: release what is left
+    lines = order_lines(order.items.all())
+    _lock_stocks(lines)
+    Stock.objects.filter(book_id__in=lines).update(
+        reserved_quantity=Greatest(_delta_expression('reserved_quantity', {
+            book_id: -quantity for book_id, quantity in lines.items()
+        }), Value(0)),
+        last_updated=timezone.now(),
+    )
+    return sum(lines.values())
+
+
+def _sellable(lines, held):
+    """
+    {book_id: (units, hold)} for each line with a Stock row: the units the
+    locked stock can cover, being the line's own hold plus whatever is still
+    available and never more than the line, and the part of the hold that is
+    still counted in reserved_quantity.
+    """
+    sellable = {}
+    for book_id, quantity, reserved in Stock.objects.filter(book_id__in=lines).values_list(
+        'book_id', 'quantity', 'reserved_quantity'
+    ):
+        hold = max(min(held.get(book_id, 0), lines[book_id], reserved), 0)
+        sellable[book_id] = (max(min(lines[book_id], quantity - reserved + hold), 0), hold)
+    return sellable
+
+
+def _record_backorders(order, shortfall):
+    """Spread {book_id: units} short over the order's items as backordered_quantity"""
+    from orders.models import OrderItem
+
+    items = []
+    for item in order.items.filter(book_id__in=shortfall).order_by('pk'):
+        item.backordered_quantity = min(item.quantity, shortfall[item.book_id])
+        shortfall[item.book_id] -= item.backordered_quantity
+        items.append(item)
+    OrderItem.objects.bulk_update(items, ['backordered_quantity'])
+
+
+@transaction.atomic
+def commit_reservations(order, performed_by=None, backorder=False):
+    """
+    Turn an order's holds into sold stock with one UPDATE.
+
+    Lines whose hold already expired are taken from available stock instead.
+    If that stock is gone InsufficientStock is raised and nothing is applied,
+    unless backorder is set: then whatever is in stock is sold, the rest is
+    recorded as OrderItem.backordered_quantity and {book_id: units short} is
+    returned. Use it once payment has been captured and the order must go
+    through.
+    """
+    lines = order_lines(order.items.all())
+    stock_ids = _lock_stocks(lines)
+
+    if order.stock_reservations.exists():
+        held = _claim(order.stock_reservations.all(), 'committed')
+    else:
+        # Orders placed before reservations were tracked only bumped reserved_quantity
+        held = lines
+    reserved_deltas = {book_id: -min(held.get(book_id, 0), quantity) for book_id, quantity in lines.items()}
+
+    shortfall = {}
+    if backorder:
+        sellable = _sellable(lines, held)
+        shortfall = {
+            book_id: quantity - sellable.get(book_id, (0, 0))[0]
+            for book_id, quantity in lines.items() if sellable.get(book_id, (0, 0))[0] < quantity
+        }
+        reserved_deltas = {book_id: -hold for book_id, (units, hold) in sellable.items()}
+        lines = {book_id: units for book_id, (units, hold) in sellable.items() if units}
+    quantity_deltas = {book_id: -quantity for book_id, quantity in lines.items()}
+    apply_stock_deltas(quantity_deltas, reserved_deltas, check_available=True)
+    if shortfall:
+        _record_backorders(order, dict(shortfall))
+
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            stock_id=stock_ids[book_id],
+            movement_type='out',
+            quantity=-quantity,  # Negative for stock out
+            reference=f"Order-{order.order_id}",
+            reason=f"Stock sold - Order {order.order_id}",
+            performed_by=performed_by,
+            auto_update_stock=False,  # Applied above in one statement
+        )
+        for book_id, quantity in sorted(lines.items())
+    ])
+    return shortfall
+
+
+@transaction.atomic
+def restock_order(order, performed_by=None):
+    """Return a confirmed order's items to stock, except units still on backorder"""
+    lines = stocked_lines(order.items.all())
+    stock_ids = _lock_stocks(lines)
+    apply_stock_deltas({book_id: quantity for book_id, quantity in lines.items() if book_id in stock_ids})
+
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            stock_id=stock_ids[book_id],
+            movement_type='returned',
+            quantity=quantity,
+            reference=f"Order-{order.order_id}-Cancelled",
+            reason="Order cancelled - stock returned",
+            performed_by=performed_by,
+            auto_update_stock=False,  # Applied above in one statement
+        )
+        for book_id, quantity in sorted(lines.items()) if book_id in stock_ids
+    ])
+
+
+@transaction.atomic
+def fill_backorders(orders=None, performed_by=None):
+    """
+    Ship backordered units from stock that has come back in.
+
+    Backordered items of orders that have not shipped yet are filled oldest
+    order first from available stock, which is taken out with one UPDATE;
+    each filled order gets a movement per book and a tracking entry.
+    Returns the number of units filled.
+    """
+    from orders.models import OrderItem, OrderTracking
+
+    items = OrderItem.objects.filter(backordered_quantity__gt=0, order__status__in=BACKORDER_STATUSES)
+    if orders is not None:
+        items = items.filter(order__in=orders)
+    stock_ids = _lock_stocks(set(items.values_list('book_id', flat=True)))
+    if not stock_ids:
+        return 0
+    available = {
+        book_id: max(quantity - reserved, 0)
+        for book_id, quantity, reserved in Stock.objects.filter(book_id__in=stock_ids).values_list(
+            'book_id', 'quantity', 'reserved_quantity'
+        )
+    }
+
+    filled_items = []
+    filled = {}  # {order: {book_id: units}}
+    for item in items.filter(book_id__in=stock_ids).select_related('order').order_by('order__created_at', 'order_id', 'pk'):
+        units = min(item.backordered_quantity, available[item.book_id])
+        if not units:
+            continue
+        available[item.book_id] -= units
+        item.backordered_quantity -= units
+        filled_items.append(item)
+        lines = filled.setdefault(item.order, {})
+        lines[item.book_id] = lines.get(item.book_id, 0) + units
+    if not filled_items:
+        return 0
+
+    taken = {}
+    for lines in filled.values():
+        for book_id, units in lines.items():
+            taken[book_id] = taken.get(book_id, 0) - units
+    apply_stock_deltas(taken, check_available=True)
+    OrderItem.objects.bulk_update(filled_items, ['backordered_quantity'])
+
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            stock_id=stock_ids[book_id],
+            movement_type='out',
+            quantity=-units,
+            reference=f"Order-{order.order_id}-Backorder",
+            reason=f"Backorder filled - Order {order.order_id}",
+            performed_by=performed_by,
+            auto_update_stock=False,  # Applied above in one statement
+        )
+        for order, lines in filled.items() for book_id, units in sorted(lines.items())
+    ])
+    OrderTracking.objects.bulk_create([
+        OrderTracking(
+            order=order,
+            status='order_confirmed',
+            description=f'{sum(lines.values())} backordered item(s) are back in stock and will ship soon.',
+        )
+        for order, lines in filled.items()
+    ])
+    return -sum(taken.values())
+
+
+def sweep_expired_reservations(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Release holds past their expiry in batches; returns units released"""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        batch = list(
+            StockReservation.objects.filter(status='held', expires_at__lte=now)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return released
+        released += release_reservations(StockReservation.objects.filter(pk__in=batch), status='expired')
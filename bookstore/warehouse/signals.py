@@ -1,14 +1,78 @@
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from .models import Stock, StockMovement
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver, Signal
+from books.models import Book, Category
+from .models import Stock
+
+# Sent with book_ids when books move between out of stock / low stock / in stock
+stock_levels_changed = Signal()
 
 @receiver(post_save, sender=Stock)
 def update_book_status_on_stock_change(sender, instance, **kwargs):
-    """Update book status when stock changes"""
+    """Update book status when stock changes (no-op unless the threshold is crossed)"""
     instance.update_book_status()
 
-@receiver(post_save, sender=StockMovement)
-def update_book_status_on_movement(sender, instance, created, **kwargs):
-    """Update book status when stock movement occurs"""
+@receiver(stock_levels_changed)
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_summaries_on_stock_change(sender, **kwargs):
+    from .summaries import invalidate_stock_summaries
+    invalidate_stock_summaries()
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_summaries_on_book_change(sender, instance, update_fields=None, **kwargs):
+    """Only changes to a book's status or category move it between summary buckets"""
+    if update_fields and not {'status', 'category'}.intersection(update_fields):
+        return
+    from .summaries import invalidate_stock_summaries
+    invalidate_stock_summaries()
+
+@receiver(stock_levels_changed)
+def refresh_opportunities_on_level_change(sender, book_ids, **kwargs):
+    from .opportunities import refresh_opportunities
+    refresh_opportunities(book_ids)
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def refresh_opportunities_on_stock_change(sender, instance, **kwargs):
+    from .opportunities import refresh_opportunities
+    book_id = instance.book_id
+    transaction.on_commit(lambda: refresh_opportunities([book_id]))
+
+@receiver(post_init, sender=Book)
+def remember_book_placement(sender, instance, **kwargs):
+    """Category and status as loaded, to tell whether a save moves the book (None when deferred)"""
+    instance._placement = (instance.__dict__.get('category_id'), instance.__dict__.get('status'))
+
+@receiver(post_save, sender=Book)
+def refresh_opportunities_on_book_change(sender, instance, created, update_fields=None, **kwargs):
+    """Only a change of category or status moves a book between opportunity buckets"""
+    if update_fields and not {'status', 'category'}.intersection(update_fields):
+        return
+    from .opportunities import refresh_opportunities, refresh_moved_book
+    book_id = instance.pk
+    old_category_id, old_status = instance._placement
+    instance._placement = (instance.category_id, instance.status)
     if created:
-        instance.stock.update_book_status()
+        transaction.on_commit(lambda: refresh_opportunities([book_id]))
+    elif old_category_id is None or old_status is None:
+        # Loaded with the fields deferred: the category it left is unknown
+        transaction.on_commit(lambda: refresh_moved_book(book_id))
+    elif (old_category_id, old_status) != instance._placement:
+        category_ids = {old_category_id, instance.category_id}
+        transaction.on_commit(lambda: refresh_moved_book(book_id, category_ids))
+
+@receiver(post_delete, sender=Book)
+def refresh_categories_on_book_delete(sender, instance, **kwargs):
+    from .opportunities import refresh_category_stock
+    category_id = instance.category_id
+    transaction.on_commit(lambda: refresh_category_stock([category_id]))
+
+@receiver(post_save, sender=Category)
+def rebuild_opportunities_on_category_change(sender, instance, created, update_fields=None, **kwargs):
+    """Activating or deactivating a category moves all of its books"""
+    if created or (update_fields and 'is_active' not in update_fields):
+        return
+    from .opportunities import rebuild_opportunities
+    transaction.on_commit(rebuild_opportunities)
@@ -0,0 +1,68 @@
+# warehouse/summaries.py - Stock level counts and the version of everything built on them
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from books.models import Book
+
+# Bumped by warehouse.signals on every stock level change
+STOCK_SUMMARY_VERSION_KEY = 'stock_summary_version'
+
+OFFERABLE_STATUSES = ['available', 'out_of_stock']
+
+# Same buckets as warehouse.inventory.stock_level, expressed over Book LEFT JOIN Stock
+OUT_OF_STOCK = Q(stock__quantity__lte=F('stock__reserved_quantity'))
+LOW_STOCK = Q(stock__quantity__lte=F('stock__reserved_quantity') + F('stock__reorder_level')) & ~OUT_OF_STOCK
+NO_STOCK_RECORD = Q(stock__isnull=True)
+
+
+def invalidate_stock_summaries():
+    try:
+        cache.incr(STOCK_SUMMARY_VERSION_KEY)
+    except ValueError:
+        cache.set(STOCK_SUMMARY_VERSION_KEY, 1, None)
+
+
+def stock_summary_version():
+    """Bumped on every stock level change; embed it in keys of caches built on stock levels"""
+    return cache.get_or_set(STOCK_SUMMARY_VERSION_KEY, 1, None)
+
+
+def category_stock_counts(category_ids=None):
+    """
+    Out/low/in-stock/no-record book counts per active category in a single
+    conditional-aggregate query over Book LEFT JOIN Stock; warehouse.opportunities
+    keeps them in CategoryStock, which is what pages should read.
+    """
+    books = Book.objects.filter(
+        category__is_active=True,
+        status__in=OFFERABLE_STATUSES,
+    )
+    if category_ids is not None:
+        books = books.filter(category_id__in=category_ids)
+    rows = books.values(
+        'category_id', 'category__name', 'category__slug'
+    ).annotate(
+        total_books=Count('id'),
+        total_quantity=Sum('stock__quantity'),
+        out_of_stock_books=Count('id', filter=OUT_OF_STOCK),
+        low_stock_books=Count('id', filter=LOW_STOCK),
+        no_stock_record=Count('id', filter=NO_STOCK_RECORD),
+    ).order_by()
+
+    return [
+        {
+            'id': row['category_id'],
+            'name': row['category__name'],
+            'slug': row['category__slug'],
+            'total_books': row['total_books'],
+            'total_quantity': row['total_quantity'] or 0,
+            'out_of_stock_books': row['out_of_stock_books'],
+            'low_stock_books': row['low_stock_books'],
+            'in_stock_books': (
+                row['total_books'] - row['out_of_stock_books']
+                - row['low_stock_books'] - row['no_stock_record']
+            ),
+            'no_stock_record': row['no_stock_record'],
+        }
+        for row in rows
+    ]
+
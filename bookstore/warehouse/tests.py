@@ -1,3 +1,355 @@
+import csv
+import io
+import sys
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from books.identifier_index import book_index
+from books.models import Book, Category
+from orders.models import Order, OrderItem, OrderTracking
+from delivery.models import Delivery
+from .audits import AuditIngestError, ingest_audit_scans
+from .inventory import apply_stock_deltas, InsufficientStock
+from .models import Stock, StockMovement, StockReservation, InventoryAudit
+from .picking import build_pick_wave, cancel_pick_wave, walk_order, NoOrdersToPick
+from .reservations import (
+    order_lines, reserve_stock, commit_reservations, release_order_reservations,
+    restock_order, fill_backorders, sweep_expired_reservations,
+)
+
+User = get_user_model()
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {i}', slug=f'book-{i}', category=category, price=10, description='A book')
+            for i in range(10)
+        ]
+        apply_stock_deltas({book.pk: 5 for book in cls.books})
+
+    def order(self, quantity, books=None):
+        order = Order.objects.create(user=self.user, subtotal=0, total_amount=0)
+        for book in books or self.books[:2]:
+            OrderItem.objects.create(order=order, book=book, quantity=quantity, price=10)
+        return order
+
+    def reserve(self, order, **kwargs):
+        return reserve_stock(order_lines(order.items.all()), order=order, **kwargs)
+
+    def levels(self, books=None):
+        """[(quantity, reserved_quantity)] in book order"""
+        return list(
+            Stock.objects.filter(book__in=books or self.books[:2]).order_by('book_id')
+            .values_list('quantity', 'reserved_quantity')
+        )
+
+    def test_hold_then_commit_sells_the_stock(self):
+        order = self.order(2)
+        self.reserve(order)
+        self.assertEqual(self.levels(), [(5, 2), (5, 2)])
+        self.assertEqual(set(order.stock_reservations.values_list('status', flat=True)), {'held'})
+
+        self.assertEqual(commit_reservations(order), {})
+        self.assertEqual(self.levels(), [(3, 0), (3, 0)])
+        self.assertEqual(set(order.stock_reservations.values_list('status', flat=True)), {'committed'})
+        self.assertEqual(
+            list(StockMovement.objects.filter(reference=f'Order-{order.order_id}').values_list('quantity', flat=True)),
+            [-2, -2],
+        )
+
+    def test_release_gives_the_hold_back_once(self):
+        order = self.order(2)
+        self.reserve(order)
+
+        self.assertEqual(release_order_reservations(order), 4)
+        self.assertEqual(self.levels(), [(5, 0), (5, 0)])
+        # Released holds are not claimed twice
+        self.assertEqual(release_order_reservations(order), 0)
+        self.assertEqual(self.levels(), [(5, 0), (5, 0)])
+
+    def test_reservation_query_count_does_not_grow_with_lines(self):
+        small, large = self.order(1, self.books[:2]), self.order(1, self.books)
+        with CaptureQueriesContext(connection) as queries:
+            self.reserve(small)
+        with self.assertNumQueries(len(queries)):
+            self.reserve(large)
+
+    def test_sweep_releases_only_expired_holds(self):
+        expired, live = self.order(1), self.order(2)
+        self.reserve(expired, hold_for=timedelta(seconds=-1))
+        self.reserve(live)
+
+        self.assertEqual(sweep_expired_reservations(batch_size=1), 2)
+        self.assertEqual(self.levels(), [(5, 2), (5, 2)])
+        self.assertEqual(set(expired.stock_reservations.values_list('status', flat=True)), {'expired'})
+        self.assertEqual(sweep_expired_reservations(), 0)
+
+    def test_short_reservation_applies_nothing(self):
+        order = self.order(3, self.books[:1])
+        OrderItem.objects.create(order=order, book=self.books[1], quantity=6, price=10)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            self.reserve(order)
+        self.assertEqual(raised.exception.book_ids, [self.books[1].pk])
+        self.assertEqual(self.levels(), [(5, 0), (5, 0)])
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_short_commit_applies_nothing(self):
+        late = self.order(3)
+        self.reserve(late, hold_for=timedelta(seconds=-1))
+        sweep_expired_reservations()
+        self.reserve(self.order(4))
+
+        with self.assertRaises(InsufficientStock):
+            commit_reservations(late)
+        self.assertEqual(self.levels(), [(5, 4), (5, 4)])
+        self.assertEqual(set(late.stock_reservations.values_list('status', flat=True)), {'expired'})
+        self.assertFalse(StockMovement.objects.filter(movement_type='out').exists())
+
+    def test_backorder_sells_what_is_left_and_records_the_rest(self):
+        late, other = self.order(3), self.order(4)
+        self.reserve(late, hold_for=timedelta(seconds=-1))
+        sweep_expired_reservations()
+        self.reserve(other)
+        commit_reservations(other)
+
+        shortfall = commit_reservations(late, backorder=True)
+        self.assertEqual(shortfall, {self.books[0].pk: 2, self.books[1].pk: 2})
+        self.assertEqual(self.levels(), [(0, 0), (0, 0)])
+        self.assertEqual(list(late.items.values_list('backordered_quantity', flat=True)), [2, 2])
+        self.assertTrue(late.is_backordered)
+
+        # Cancelling only returns the units that were taken from stock
+        restock_order(late)
+        self.assertEqual(self.levels(), [(1, 0), (1, 0)])
+
+    def test_fill_backorders_ships_returned_stock(self):
+        late, other = self.order(3), self.order(4)
+        self.reserve(late, hold_for=timedelta(seconds=-1))
+        sweep_expired_reservations()
+        self.reserve(other)
+        commit_reservations(other)
+        commit_reservations(late, backorder=True)
+        Order.objects.filter(pk=late.pk).update(status='confirmed')
+
+        apply_stock_deltas({self.books[0].pk: 5, self.books[1].pk: 1})
+        self.assertEqual(fill_backorders(), 3)
+        self.assertEqual(self.levels(), [(3, 0), (0, 0)])
+        self.assertEqual(list(late.items.order_by('book_id').values_list('backordered_quantity', flat=True)), [0, 1])
+        self.assertTrue(late.tracking_updates.filter(description__contains='back in stock').exists())
+        self.assertEqual(fill_backorders(), 0)
+
+
+class PickWaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {i}', slug=f'book-{i}', category=category, price=10, description='A book')
+            for i in range(4)
+        ]
+        locations = [('A', '2', '3'), ('A', '10', '1'), ('A', '2', '12'), ('', '', '')]
+        for book, (section, row, shelf) in zip(cls.books, locations):
+            Stock.objects.filter(book=book).update(
+                quantity=50, location_section=section, location_row=row, location_shelf=shelf,
+            )
+
+    def order(self, *lines):
+        order = Order.objects.create(user=self.user, subtotal=0, total_amount=0, status='confirmed')
+        for book, quantity, backordered in lines:
+            OrderItem.objects.create(order=order, book=book, quantity=quantity, backordered_quantity=backordered, price=10)
+        return order
+
+    def test_walk_order_visits_aisles_naturally_and_serpentine(self):
+        def line(book_id, section, row, shelf, title='Title'):
+            return {'book_id': book_id, 'title': title, 'location_section': section, 'location_row': row, 'location_shelf': shelf}
+
+        lines = [
+            line(1, 'A', '10', '1'), line(2, 'A', '2', '12'), line(3, 'A', '2', '3'),
+            line(4, 'A', '10', '9'), line(5, '', '', '', 'Zebra'), line(6, 'B', '1', '1'), line(7, 'A', '', '', 'Apple'),
+        ]
+        # A-2 up, A-10 back down, then B-1, then unlocated lines by title
+        self.assertEqual([line['book_id'] for line in walk_order(lines)], [3, 2, 4, 1, 6, 7, 5])
+
+    def test_wave_aggregates_orders_into_walk_ordered_lines(self):
+        first = self.order((self.books[0], 2, 0), (self.books[1], 1, 0))
+        second = self.order((self.books[0], 1, 0), (self.books[2], 3, 1), (self.books[3], 2, 2))
+        self.order((self.books[3], 1, 1))  # Fully backordered: nothing to pick yet
+
+        wave = build_pick_wave(self.user)
+        self.assertEqual(set(wave.orders.all()), {first, second})
+        self.assertEqual(
+            list(wave.lines.order_by('sequence').values_list('book_id', 'quantity', 'order_count')),
+            [(self.books[0].pk, 3, 2), (self.books[2].pk, 2, 1), (self.books[1].pk, 1, 1)],
+        )
+        self.assertEqual((wave.order_count, wave.line_count, wave.total_units), (2, 3, 6))
+        self.assertEqual(set(Order.objects.filter(status='processing')), {first, second})
+        self.assertEqual(OrderTracking.objects.filter(status='preparing').count(), 2)
+
+        with self.assertRaises(NoOrdersToPick):
+            build_pick_wave(self.user)
+
+    def test_cancel_puts_orders_back_in_the_queue(self):
+        order = self.order((self.books[0], 1, 0))
+        wave = build_pick_wave(self.user)
+        Delivery.objects.filter(order=order).update(status='in_transit')
+
+        self.assertTrue(cancel_pick_wave(wave))
+        order.refresh_from_db()
+        wave.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+        self.assertEqual(wave.status, 'cancelled')
+        self.assertEqual(
+            list(order.tracking_updates.values_list('status', flat=True)),
+            ['preparing', 'order_confirmed'],
+        )
+        # The Order post_save receivers ran for the move
+        self.assertEqual(Delivery.objects.get(order=order).status, 'assigned')
+
+        self.assertFalse(cancel_pick_wave(wave))
+        self.assertEqual(build_pick_wave(self.user).order_count, 1)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', email='staff@example.com', password='pass', user_type='staff')
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {i}', slug=f'book-{i}', category=category, price=10, description='A book')
+            for i in range(3)
+        ]
+        for book, quantity in ((cls.books[0], 5), (cls.books[1], 20)):
+            # Saving a movement applies it to the stock
+            StockMovement.objects.create(
+                stock=book.stock, movement_type='in', quantity=quantity, reference='Delivery-1', performed_by=cls.staff,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def csv_rows(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_stock_csv_streams_every_filtered_row(self):
+        header, *rows = self.csv_rows(reverse('warehouse:export_stock'))
+        self.assertEqual(header[:3], ['Stock ID', 'Book ID', 'Title'])
+        self.assertEqual([row[2] for row in rows], ['Book 0', 'Book 1', 'Book 2'])
+        self.assertEqual([row[5] for row in rows], ['5', '20', '0'])
+
+        header, *rows = self.csv_rows(reverse('warehouse:export_stock'), search='Book 1')
+        self.assertEqual([row[2] for row in rows], ['Book 1'])
+
+    def test_movement_csv_filters_by_type_and_date(self):
+        url = reverse('warehouse:export_movements')
+        header, *rows = self.csv_rows(url, movement_type='in', **{'from': '2000-01-01'})
+        self.assertEqual(sorted((row[3], row[6], row[7]) for row in rows), [
+            ('Book 0', '5', 'Delivery-1'), ('Book 1', '20', 'Delivery-1'),
+        ])
+        header, *rows = self.csv_rows(url, movement_type='out')
+        self.assertEqual(rows, [])
+
+    def test_bad_movement_filters_are_rejected(self):
+        url = reverse('warehouse:export_movements')
+        for params in ({'stock': 'x'}, {'movement_type': 'teleport'}, {'from': '2026-02-30'}, {'to': 'yesterday'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_stock_xlsx_has_the_same_rows(self):
+        response = self.client.get(reverse('warehouse:export_stock'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual([row[2] for row in sheet.iter_rows(min_row=2, values_only=True)], ['Book 0', 'Book 1', 'Book 2'])
+
+    def test_xlsx_without_openpyxl_falls_back_with_a_message(self):
+        with mock.patch.dict(sys.modules, {'openpyxl': None}):
+            response = self.client.get(reverse('warehouse:export_stock'), {'format': 'xlsx'})
+        self.assertRedirects(response, reverse('warehouse:stock_list'), fetch_redirect_response=False)
+
+
+class AuditIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+
+        def book(slug, quantity, **isbns):
+            book = Book.objects.create(title=slug, slug=slug, category=category, price=10, description='A book', **isbns)
+            Stock.objects.filter(book=book).update(quantity=quantity)
+            return book
+
+        cls.odyssey = book('odyssey', 5, isbn='0140449132', isbn13='9780140449136')
+        cls.iliad = book('iliad', 2, isbn13='9780000000002')
+        cls.unstocked = book('unstocked', 0, isbn13='9781111111111')
+        Stock.objects.filter(book=cls.unstocked).delete()
+
+    def setUp(self):
+        book_index.invalidate()
+        self.audit = InventoryAudit.objects.create(scheduled_date='2026-01-01')
+
+    def ingest(self, lines, **kwargs):
+        return ingest_audit_scans(self.audit, lines, **kwargs)
+
+    def test_counts_are_summed_per_book_and_problems_reported(self):
+        result = self.ingest([
+            b'ISBN,count\n',
+            '978-0-14-044913-6,3',
+            '0140449132',  # The ISBN-10 of the same book, one unit
+            '9780000000002\t2',
+            '',
+            '9999999999999 4',
+            '9781111111111',
+            'no barcode here',
+        ])
+        self.assertEqual((result.items_created, result.units_counted, result.total_variance), (2, 6, -1))
+        self.assertEqual(result.problems, [
+            (8, 'Unreadable scan "no barcode here"'),
+            ('9999999999999', 'Unknown ISBN'),
+            ('9781111111111', 'Book has no stock record'),
+        ])
+        self.assertEqual(
+            sorted(self.audit.items.values_list('stock__book__slug', 'system_quantity', 'actual_quantity', 'variance')),
+            [('iliad', 2, 2, 0), ('odyssey', 5, 4, -1)],
+        )
+        self.audit.refresh_from_db()
+        self.assertEqual(self.audit.status, 'in_progress')
+        # Counting alone leaves stock untouched
+        self.assertEqual(Stock.objects.get(book=self.odyssey).quantity, 5)
+
+    def test_adjustments_land_the_counts_once(self):
+        result = self.ingest(['9780140449136,7', '9780000000002,2'], post_adjustments=True)
+        self.assertEqual(result.adjustments, 1)
+        self.assertEqual(Stock.objects.get(book=self.odyssey).quantity, 7)
+        self.assertEqual(
+            list(StockMovement.objects.values_list('movement_type', 'quantity', 'reference')),
+            [('adjustment', 2, f'Audit-{self.audit.audit_id}')],
+        )
+
+        again = self.ingest(['9780140449136,1'], post_adjustments=True)
+        self.assertEqual((again.items_created, again.problems), (0, [('9780140449136', 'Already counted in this audit')]))
+        self.assertEqual(Stock.objects.get(book=self.odyssey).quantity, 7)
 
-# Create your tests here.
+    def test_closed_audits_take_no_scans(self):
+        self.audit.status = 'completed'
+        self.audit.save()
+        with self.assertRaises(AuditIngestError):
+            self.ingest(['9780140449136'])
+        self.assertFalse(self.audit.items.exists())
@@ -10,6 +10,8 @@ urlpatterns = [
     
     # Stock Management
     path('stock/', views.stock_list, name='stock_list'),
+    path('stock/export/', views.export_stock, name='export_stock'),
+    path('stock/movements/export/', views.export_stock_movements, name='export_movements'),
     path('stock/<int:stock_id>/', views.stock_detail, name='stock_detail'),
     path('stock/<int:stock_id>/add/', views.add_stock, name='add_stock'),
     path('stock/<int:stock_id>/remove/', views.remove_stock, name='remove_stock'),
@@ -24,6 +26,15 @@ urlpatterns = [
     # Vendor Management
     path('vendors/<int:vendor_id>/offers/', views.vendor_offers, name='vendor_offers'),
     
+    # Wave Picking
+    path('picking/', views.pick_waves, name='pick_waves'),
+    path('picking/<str:wave_id>/', views.pick_wave_detail, name='pick_wave_detail'),
+    path('picking/<str:wave_id>/json/', views.pick_wave_json, name='pick_wave_json'),
+    path('picking/<str:wave_id>/update/', views.update_pick_wave, name='update_pick_wave'),
+    
+    # Inventory Audits
+    path('audits/<str:audit_id>/ingest/', views.ingest_audit, name='ingest_audit'),
+    
     # Reports
     path('reports/low-stock/', views.low_stock_report, name='low_stock_report'),
 ]
\ No newline at end of file
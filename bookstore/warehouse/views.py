@@ -4,10 +4,20 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db.models import Sum, Count, Q, F
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseBadRequest
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_POST
 from django.db import transaction
-from .models import Stock, StockMovement, CategoryStock, InventoryAudit
+from .models import Stock, StockMovement, CategoryStock, InventoryAudit, PickWave
+from .audits import ingest_audit_scans, AuditIngestError
+from .opportunities import refresh_category_stock
+from .exports import (
+    export_response, stock_rows, movement_rows, ExportUnavailable, STOCK_EXPORT_HEADER, MOVEMENT_EXPORT_HEADER,
+)
+from .picking import (
+    build_pick_wave, complete_pick_wave, cancel_pick_wave, pick_list, orders_awaiting_pick, max_wave_orders, NoOrdersToPick,
+)
 from vendors.models import StockOffer, VendorProfile, OfferStatusNotification
 from books.models import Book, Category
 
@@ -38,13 +48,10 @@ def warehouse_dashboard(request):
         'vendor', 'book'
     ).order_by('-created_at')[:8]
     
-    # Category-wise stock with updated stats
-    category_stats = []
-    for category in Category.objects.filter(is_active=True):
-        category_stock, created = CategoryStock.objects.get_or_create(category=category)
-        if created or True:  # Always update stats for accurate display
-            category_stock.update_stats()
-        category_stats.append(category_stock)
+    # Category-wise stock, kept current by warehouse.opportunities
+    category_stats = CategoryStock.objects.filter(category__is_active=True).select_related('category').order_by('category__name')
+    if Category.objects.filter(is_active=True, category_stock__isnull=True).exists():
+        refresh_category_stock()
     
     context = {
         'total_books': total_books,
@@ -353,16 +360,12 @@ def update_stock_location(request, stock_id):
     
     return redirect('warehouse:stock_detail', stock_id=stock_id)
 
-@login_required
-@user_passes_test(is_staff_or_admin)
-def stock_list(request):
-    stocks_list = Stock.objects.select_related('book', 'book__category').order_by('book__title')
-    
-    # Filters
-    category_filter = request.GET.get('category')
-    status_filter = request.GET.get('status')
-    location_filter = request.GET.get('location')
-    search_query = request.GET.get('search')
+def filter_stock_list(stocks_list, params):
+    """Apply the stock_list filters (category, status, location, search) from GET params"""
+    category_filter = params.get('category')
+    status_filter = params.get('status')
+    location_filter = params.get('location')
+    search_query = params.get('search')
     
     if category_filter:
         stocks_list = stocks_list.filter(book__category__slug=category_filter)
@@ -397,6 +400,20 @@ def stock_list(request):
             Q(location_shelf__icontains=search_query)
         ).distinct()
     
+    return stocks_list
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+def stock_list(request):
+    stocks_list = filter_stock_list(
+        Stock.objects.select_related('book', 'book__category').order_by('book__title'),
+        request.GET,
+    )
+    category_filter = request.GET.get('category')
+    status_filter = request.GET.get('status')
+    location_filter = request.GET.get('location')
+    search_query = request.GET.get('search')
+    
     paginator = Paginator(stocks_list, 20)
     page_number = request.GET.get('page')
     stocks = paginator.get_page(page_number)
@@ -434,6 +451,75 @@ def stock_detail(request, stock_id):
     
     return render(request, 'warehouse/stock_detail.html', context)
 
+@login_required
+@user_passes_test(is_staff_or_admin)
+def export_stock(request):
+    """Stream the stock list, with the same filters as stock_list, as CSV or XLSX"""
+    stocks = filter_stock_list(Stock.objects.order_by('book__title', 'id'), request.GET)
+    filename = f"stock-{timezone.localdate():%Y%m%d}"
+    
+    try:
+        return export_response(request.GET.get('format'), filename, STOCK_EXPORT_HEADER, stock_rows(stocks))
+    except ExportUnavailable as e:
+        messages.error(request, str(e))
+        return redirect('warehouse:stock_list')
+
+def export_date(params, name):
+    """Optional YYYY-MM-DD parameter as a date; ValueError with a readable message if malformed"""
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:  # Well formed but impossible, e.g. 2026-13-45
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'Invalid "{name}" date "{value}", use YYYY-MM-DD.')
+    return parsed
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+def export_stock_movements(request):
+    """
+    Stream movement history as CSV or XLSX. Takes the stock_list filters,
+    plus an optional stock id, movement type and from/to dates.
+    """
+    movements = StockMovement.objects.order_by('created_at', 'id')
+    if any(request.GET.get(name) for name in ('category', 'status', 'location', 'search')):
+        movements = movements.filter(
+            stock__in=filter_stock_list(Stock.objects.all(), request.GET).values('pk')
+        )
+    
+    stock_id = request.GET.get('stock')
+    if stock_id:
+        if not stock_id.isdigit():
+            return HttpResponseBadRequest(f'Invalid stock id "{stock_id}".')
+        movements = movements.filter(stock_id=int(stock_id))
+    
+    movement_type = request.GET.get('movement_type')
+    if movement_type:
+        if movement_type not in dict(StockMovement.MOVEMENT_TYPES):
+            return HttpResponseBadRequest(f'Unknown movement type "{movement_type}".')
+        movements = movements.filter(movement_type=movement_type)
+    
+    try:
+        date_from = export_date(request.GET, 'from')
+        date_to = export_date(request.GET, 'to')
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if date_from:
+        movements = movements.filter(created_at__date__gte=date_from)
+    if date_to:
+        movements = movements.filter(created_at__date__lte=date_to)
+    
+    filename = f"stock-movements-{timezone.localdate():%Y%m%d}"
+    
+    try:
+        return export_response(request.GET.get('format'), filename, MOVEMENT_EXPORT_HEADER, movement_rows(movements))
+    except ExportUnavailable as e:
+        messages.error(request, str(e))
+        return redirect('warehouse:stock_list')
+
 @login_required
 @user_passes_test(is_staff_or_admin)
 def add_stock(request, stock_id):
@@ -487,15 +573,119 @@ def remove_stock(request, stock_id):
     
     return redirect('warehouse:stock_detail', stock_id=stock_id)
 
+@login_required
+@user_passes_test(is_staff_or_admin)
+def pick_waves(request):
+    """List pick waves and build a new one from the confirmed order queue"""
+    if request.method == 'POST':
+        try:
+            max_orders = int(request.POST.get('max_orders') or max_wave_orders())
+        except ValueError:
+            max_orders = max_wave_orders()
+        
+        try:
+            wave = build_pick_wave(request.user, max_orders=max(1, min(max_orders, max_wave_orders())))
+        except NoOrdersToPick as e:
+            messages.info(request, str(e))
+            return redirect('warehouse:pick_waves')
+        
+        messages.success(
+            request,
+            f'Pick wave {wave.wave_id} created: {wave.order_count} orders, {wave.line_count} pick lines, {wave.total_units} units.'
+        )
+        return redirect('warehouse:pick_wave_detail', wave_id=wave.wave_id)
+    
+    waves = PickWave.objects.select_related('created_by')
+    status_filter = request.GET.get('status')
+    if status_filter:
+        waves = waves.filter(status=status_filter)
+    
+    paginator = Paginator(waves, 25)
+    page_number = request.GET.get('page')
+    waves = paginator.get_page(page_number)
+    
+    context = {
+        'waves': waves,
+        'awaiting_orders': orders_awaiting_pick().count(),
+        'max_wave_orders': max_wave_orders(),
+        'status_filter': status_filter,
+        'status_choices': PickWave.STATUS_CHOICES,
+    }
+    
+    return render(request, 'warehouse/pick_waves.html', context)
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+def pick_wave_detail(request, wave_id):
+    """Printable pick list for a wave"""
+    wave = get_object_or_404(PickWave.objects.select_related('created_by'), wave_id=wave_id)
+    lines = wave.lines.select_related('book').order_by('sequence')
+    
+    context = {
+        'wave': wave,
+        'lines': lines,
+    }
+    
+    return render(request, 'warehouse/pick_wave_detail.html', context)
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+def pick_wave_json(request, wave_id):
+    wave = get_object_or_404(PickWave, wave_id=wave_id)
+    return JsonResponse(pick_list(wave))
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+def update_pick_wave(request, wave_id):
+    """Mark an open wave as picked, or cancel it and return its orders to the queue"""
+    wave = get_object_or_404(PickWave, wave_id=wave_id)
+    
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'complete' and complete_pick_wave(wave):
+            messages.success(request, f'Pick wave {wave.wave_id} marked as picked.')
+        elif action == 'cancel' and cancel_pick_wave(wave):
+            messages.success(request, f'Pick wave {wave.wave_id} cancelled; its orders are back in the queue.')
+        else:
+            messages.error(request, 'This pick wave can no longer be changed.')
+    
+    return redirect('warehouse:pick_wave_detail', wave_id=wave.wave_id)
+
+@login_required
+@user_passes_test(is_staff_or_admin)
+@require_POST
+def ingest_audit(request, audit_id):
+    """
+    Ingest scanner output (one ISBN per line, optionally with a count)
+    into an inventory audit, from an uploaded 'scans' file or the raw
+    request body. Pass post_adjustments=1 to correct stock immediately.
+    """
+    audit = get_object_or_404(InventoryAudit, audit_id=audit_id)
+    upload = request.FILES.get('scans')
+    lines = upload if upload is not None else request
+    post_adjustments = request.GET.get('post_adjustments') == '1' or request.POST.get('post_adjustments') == '1'
+    
+    try:
+        result = ingest_audit_scans(audit, lines, performed_by=request.user, post_adjustments=post_adjustments)
+    except AuditIngestError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, 'audit_id': audit.audit_id, **result.as_dict()})
+
 @login_required
 @user_passes_test(is_staff_or_admin)
 def low_stock_report(request):
+    # Below the static reorder level, or below the forecast reorder point
+    # (lead time demand + safety stock) for books with recent demand
     low_stock_items = Stock.objects.filter(
-        Q(quantity__lte=F('reorder_level')) & Q(quantity__gt=0)
-    ).select_related('book', 'book__category').order_by('quantity')
+        Q(quantity__lte=F('reorder_level')) |
+        Q(book__demand_forecast__daily_demand__gt=0,
+          quantity__lte=F('book__demand_forecast__reorder_point')),
+        quantity__gt=0
+    ).select_related('book', 'book__category', 'book__demand_forecast').order_by('quantity')
     
     out_of_stock_items = Stock.objects.filter(quantity=0).select_related(
-        'book', 'book__category'
+        'book', 'book__category', 'book__demand_forecast'
     ).order_by('book__title')
     
     # Get pending offers for these items